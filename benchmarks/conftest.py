@@ -0,0 +1,61 @@
+"""Fixtures for the benchmarks of cwltool, see :py:func:`measure`."""
+
+import logging
+import tracemalloc
+from collections.abc import Callable, Generator
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from cwltool.context import RuntimeContext
+from cwltool.loghandler import _logger
+
+
+@pytest.fixture(autouse=True)
+def quiet() -> Generator[None, None, None]:
+    """Only log warnings, as logging every job would be measured too."""
+    level = _logger.level
+    _logger.setLevel(logging.WARNING)
+    yield
+    _logger.setLevel(level)
+
+
+@pytest.fixture
+def runtime_context(tmp_path: Path) -> RuntimeContext:
+    """Run tools without containers, keeping their outputs in ``tmp_path``."""
+    for folder in ("tmp", "out"):
+        (tmp_path / folder).mkdir()
+    return RuntimeContext(
+        {
+            "use_container": False,
+            "move_outputs": "leave",
+            "tmpdir_prefix": str(tmp_path / "tmp" / "tmp"),
+            "tmp_outdir_prefix": str(tmp_path / "out" / "out"),
+        }
+    )
+
+
+@pytest.fixture
+def measure(benchmark: Any) -> Callable[..., Any]:
+    """
+    Benchmark a function, as well as its throughput and its peak memory use.
+
+    ``measure(function, count, unit, rounds=3)`` calls ``function`` for
+    ``rounds`` rounds, after a warm-up round, and records the number of
+    ``unit`` handled per second and the most memory allocated by one call.
+    """
+
+    def run(function: Callable[[], Any], count: int, unit: str, rounds: int = 3) -> Any:
+        result = benchmark.pedantic(function, rounds=rounds, iterations=1, warmup_rounds=1)
+        tracemalloc.start()
+        try:
+            function()
+            benchmark.extra_info["peak_memory"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        if benchmark.stats is not None:
+            benchmark.extra_info[f"{unit}_per_second"] = count / benchmark.stats.stats.mean
+        return result
+
+    return run
@@ -0,0 +1,145 @@
+"""Generate synthetic CWL documents, and their inputs, of any size."""
+
+import json
+from pathlib import Path
+from typing import Any
+
+from cwltool.utils import CWLObjectType, CWLOutputType
+
+CWL_VERSION = "v1.2"
+
+
+def write_cwl(path: Path, document: CWLObjectType) -> str:
+    """Save a CWL document as JSON, returning its path."""
+    path.write_text(json.dumps({"cwlVersion": CWL_VERSION, **document}, indent=2))
+    return str(path)
+
+
+def echo_tool() -> CWLObjectType:
+    """A tool echoing a message to its standard output."""
+    return {
+        "class": "CommandLineTool",
+        "baseCommand": "echo",
+        "inputs": {"message": {"type": "string", "inputBinding": {}}},
+        "outputs": {"echoed": "stdout"},
+    }
+
+
+def wide_scatter(width: int) -> tuple[CWLObjectType, CWLObjectType]:
+    """A workflow scattering an echo tool over ``width`` messages, and its job order."""
+    workflow: CWLObjectType = {
+        "class": "Workflow",
+        "requirements": [{"class": "ScatterFeatureRequirement"}],
+        "inputs": {"messages": "string[]"},
+        "outputs": {"echoed": {"type": "File[]", "outputSource": "echo/echoed"}},
+        "steps": {
+            "echo": {
+                "run": echo_tool(),
+                "scatter": "message",
+                "in": {"message": "messages"},
+                "out": ["echoed"],
+            }
+        },
+    }
+    return workflow, {"messages": [f"message {number}" for number in range(width)]}
+
+
+def wide_workflow(steps: int) -> tuple[CWLObjectType, CWLObjectType]:
+    """A workflow of ``steps`` independent echo steps, and its job order."""
+    workflow: CWLObjectType = {
+        "class": "Workflow",
+        "inputs": {"message": "string"},
+        "outputs": {
+            f"echoed{number}": {"type": "File", "outputSource": f"echo{number}/echoed"}
+            for number in range(steps)
+        },
+        "steps": {
+            f"echo{number}": {"run": echo_tool(), "in": {"message": "message"}, "out": ["echoed"]}
+            for number in range(steps)
+        },
+    }
+    return workflow, {"message": "hello"}
+
+
+def nested_workflow(depth: int) -> tuple[CWLObjectType, CWLObjectType]:
+    """Subworkflows nested ``depth`` deep around an echo tool, and its job order."""
+    process = echo_tool()
+    for _ in range(depth):
+        process = {
+            "class": "Workflow",
+            "inputs": {"message": "string"},
+            "outputs": {"echoed": {"type": "File", "outputSource": "nested/echoed"}},
+            "steps": {"nested": {"run": process, "in": {"message": "message"}, "out": ["echoed"]}},
+        }
+    process["requirements"] = [{"class": "SubworkflowFeatureRequirement"}]
+    return process, {"message": "hello"}
+
+
+def many_files(folder: Path, count: int) -> tuple[CWLObjectType, CWLObjectType]:
+    """A tool given ``count`` input files created in ``folder``, and its job order."""
+    folder.mkdir(parents=True, exist_ok=True)
+    files: list[CWLOutputType] = []
+    for number in range(count):
+        path = folder / f"input{number}.txt"
+        path.write_text(f"{number}\n")
+        files.append({"class": "File", "location": path.as_uri()})
+    tool: CWLObjectType = {
+        "class": "CommandLineTool",
+        "baseCommand": "echo",
+        "inputs": {"files": {"type": "File[]", "inputBinding": {}}},
+        "outputs": {"listed": "stdout"},
+    }
+    return tool, {"files": files}
+
+
+def many_outputs(count: int) -> tuple[CWLObjectType, CWLObjectType]:
+    """A tool creating ``count`` output files, collected by a glob, and its job order."""
+    tool: CWLObjectType = {
+        "class": "CommandLineTool",
+        "baseCommand": "touch",
+        "inputs": {"names": {"type": "string[]", "inputBinding": {}}},
+        "outputs": {"created": {"type": "File[]", "outputBinding": {"glob": "*.txt"}}},
+    }
+    return tool, {"names": [f"output{number}.txt" for number in range(count)]}
+
+
+def directory_listing(folder: Path, width: int, depth: int) -> tuple[CWLObjectType, CWLObjectType]:
+    """
+    A tool listing a directory of ``width`` files in each of ``depth`` nested folders.
+
+    :returns: the tool, which loads the whole listing, and its job order
+    """
+    current = folder
+    for level in range(depth):
+        current.mkdir(parents=True, exist_ok=True)
+        for number in range(width):
+            (current / f"file{level}-{number}.txt").write_text(f"{number}\n")
+        current = current / f"level{level + 1}"
+    tool: CWLObjectType = {
+        "class": "CommandLineTool",
+        "requirements": [{"class": "LoadListingRequirement", "loadListing": "deep_listing"}],
+        "baseCommand": ["ls", "-R"],
+        "inputs": {"folder": {"type": "Directory", "inputBinding": {}}},
+        "outputs": {"listing": "stdout"},
+    }
+    return tool, {"folder": {"class": "Directory", "location": folder.as_uri()}}
+
+
+def expressions(count: int) -> tuple[CWLObjectType, CWLObjectType]:
+    """A tool with ``count`` JavaScript expressions and parameter references, and its job order."""
+    arguments: list[Any] = []
+    for number in range(count):
+        arguments.append({"valueFrom": f"$(inputs.numbers[{number}] * 2)"})
+        arguments.append({"valueFrom": f"$(inputs.labels[{number}])"})
+    tool: CWLObjectType = {
+        "class": "CommandLineTool",
+        "requirements": [{"class": "InlineJavascriptRequirement"}],
+        "baseCommand": "echo",
+        "arguments": arguments,
+        "inputs": {"numbers": "int[]", "labels": "string[]"},
+        "outputs": {"echoed": "stdout"},
+    }
+    return tool, {
+        "numbers": list(range(count)),
+        "labels": [f"label{number}" for number in range(count)],
+    }
@@ -0,0 +1,106 @@
+"""
+Benchmarks of the hot paths of the engine, on synthetic workflows.
+
+Tools run without containers, and run commands such as ``echo``, so that
+the time and memory measured are spent by cwltool itself.
+"""
+
+import copy
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from cwltool.context import LoadingContext, RuntimeContext
+from cwltool.factory import Factory
+from cwltool.load_tool import load_tool
+from cwltool.process import Process
+from cwltool.utils import CWLObjectType
+
+from .generators import (
+    directory_listing,
+    expressions,
+    many_files,
+    many_outputs,
+    nested_workflow,
+    wide_scatter,
+    wide_workflow,
+    write_cwl,
+)
+
+Measure = Callable[..., Any]
+
+
+def first_job(tool: Process, job_order: CWLObjectType, runtime_context: RuntimeContext) -> Any:
+    """Bind the inputs of ``tool`` into its first job, without running it."""
+    return next(tool.job(copy.deepcopy(job_order), lambda out, status: None, runtime_context))
+
+
+@pytest.mark.parametrize(
+    "generate,size", [(wide_workflow, 100), (nested_workflow, 10)], ids=["wide", "deep"]
+)
+def test_load_tool(
+    measure: Measure,
+    tmp_path: Path,
+    generate: Callable[[int], tuple[CWLObjectType, CWLObjectType]],
+    size: int,
+) -> None:
+    """Load and validate a workflow of 100 steps, or of 10 nested subworkflows."""
+    path = write_cwl(tmp_path / "workflow.cwl", generate(size)[0])
+    measure(lambda: load_tool(path, LoadingContext()), 1, "documents")
+
+
+def test_wide_scatter(measure: Measure, tmp_path: Path, runtime_context: RuntimeContext) -> None:
+    """Expand a scatter over 100 jobs, run them, and gather their outputs."""
+    workflow, job_order = wide_scatter(100)
+    run = Factory(runtime_context=runtime_context).make(
+        write_cwl(tmp_path / "scatter.cwl", workflow)
+    )
+    measure(lambda: run(**job_order), 100, "jobs")
+
+
+def test_wide_workflow(measure: Measure, tmp_path: Path, runtime_context: RuntimeContext) -> None:
+    """Schedule and run the 100 independent steps of a workflow."""
+    workflow, job_order = wide_workflow(100)
+    run = Factory(runtime_context=runtime_context).make(write_cwl(tmp_path / "wide.cwl", workflow))
+    measure(lambda: run(**job_order), 100, "jobs")
+
+
+def test_nested_workflow(measure: Measure, tmp_path: Path, runtime_context: RuntimeContext) -> None:
+    """Run a tool at the bottom of 10 nested subworkflows."""
+    workflow, job_order = nested_workflow(10)
+    run = Factory(runtime_context=runtime_context).make(
+        write_cwl(tmp_path / "nested.cwl", workflow)
+    )
+    measure(lambda: run(**job_order), 10, "workflows")
+
+
+def test_many_files(measure: Measure, tmp_path: Path, runtime_context: RuntimeContext) -> None:
+    """Bind 2000 input files, and map their paths."""
+    tool, job_order = many_files(tmp_path / "inputs", 2000)
+    process = load_tool(write_cwl(tmp_path / "files.cwl", tool), LoadingContext())
+    measure(lambda: first_job(process, job_order, runtime_context), 2000, "files")
+
+
+def test_directory_listing(
+    measure: Measure, tmp_path: Path, runtime_context: RuntimeContext
+) -> None:
+    """Bind a directory of 2000 files in 10 nested folders, listing it deeply."""
+    tool, job_order = directory_listing(tmp_path / "folder", 200, 10)
+    process = load_tool(write_cwl(tmp_path / "listing.cwl", tool), LoadingContext())
+    measure(lambda: first_job(process, job_order, runtime_context), 2000, "files")
+
+
+def test_expressions(measure: Measure, tmp_path: Path, runtime_context: RuntimeContext) -> None:
+    """Evaluate the 100 JavaScript expressions and 100 parameter references of a command line."""
+    tool, job_order = expressions(100)
+    process = load_tool(write_cwl(tmp_path / "expressions.cwl", tool), LoadingContext())
+    measure(lambda: first_job(process, job_order, runtime_context), 200, "expressions")
+
+
+def test_collect_outputs(measure: Measure, tmp_path: Path, runtime_context: RuntimeContext) -> None:
+    """Run a tool creating 2000 files, and collect them as its output."""
+    tool, job_order = many_outputs(2000)
+    run = Factory(runtime_context=runtime_context).make(write_cwl(tmp_path / "outputs.cwl", tool))
+    measure(lambda: run(**job_order), 2000, "files")
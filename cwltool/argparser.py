@@ -66,7 +66,28 @@ def arg_parser() -> argparse.ArgumentParser:
     env_table.add_env(
         "CWL_SINGULARITY_CACHE",
         f"directory path to find already downloaded Singularity images; "
-        f"[{bt}]dockerFile[/] images will also be searched for and stored here",
+        f"[{bt}]dockerFile[/] images will also be searched for and stored here; "
+        f"images whose digest is pinned or can be found with [{bt}]skopeo[/] are "
+        f"pulled by digest and shared safely between cwltool processes",
+    )
+    env_table.add_env(
+        "CWL_SINGULARITY_CACHE_MAX_SIZE",
+        f"maximum size of the digest addressed images in [{bt}]CWL_SINGULARITY_CACHE[/] "
+        f"(e.g. [{bt}]50G[/]), above which the least recently used are removed",
+    )
+    env_table.add_env(
+        "CWL_SINGULARITY_SANDBOX",
+        f"if set, unpack each digest addressed image in [{bt}]CWL_SINGULARITY_CACHE[/] "
+        "into a sandbox directory once, shared read-only by all jobs using it",
+    )
+    env_table.add_env(
+        "CWLTOOL_NO_SCHEMA_CACHE",
+        "if set, do not read or write compiled CWL schemas in the cache directory",
+    )
+    env_table.add_env(
+        "CWLTOOL_IMAGE_CACHE_TTL",
+        "seconds for which a software container image found or pulled by any cwltool run is "
+        "trusted to still be present without checking again (default: one day, 0 disables)",
     )
     env_table.add_env(
         "ORCID",
@@ -74,8 +95,10 @@ def arg_parser() -> argparse.ArgumentParser:
     )
     env_table.add_env(
         "XDG_CACHE_HOME",
-        f"directory path to store cached HTTP(S) downloads in a [{bt}]cwltool[/] sub-folder; "
-        f"if unset, then cache downloads are stored in [{bt}]$HOME/.cache/cwltool[/]",
+        f"directory path to store cached HTTP(S) downloads, compiled schemas, and the "
+        f"registry of local software container images in a "
+        f"[{bt}]cwltool[/] sub-folder; "
+        f"if unset, then they are stored in [{bt}]$HOME/.cache/cwltool[/]",
     )
     env_table.add_env(
         "XDG_DATA_HOME",
@@ -300,6 +323,83 @@ def arg_parser() -> argparse.ArgumentParser:
         help="Add timestamps to the errors, warnings, and notifications.",
     )
 
+    monitor_group = parser.add_argument_group(title="resource usage monitoring")
+    monitor_group.add_argument(
+        "--monitor-interval",
+        type=float,
+        default=1.0,
+        metavar="SECONDS",
+        help="How often to measure the memory, CPU, and I/O used by each job. "
+        "Defaults to every second.",
+    )
+    monitor_group.add_argument(
+        "--metrics-file",
+        type=str,
+        metavar="PATH",
+        help="Append the time and resources used by each job to PATH, one JSON "
+        "object per line. At the end of the run, the jobs recorded in PATH so far "
+        "are summarized per tool, comparing what they used with what their "
+        "ResourceRequirement allocated.",
+    )
+    monitor_group.add_argument(
+        "--timing",
+        action="store_true",
+        default=False,
+        help="Time each phase of the run: loading, evaluating expressions, staging "
+        "files, running the tools, collecting and checksumming their outputs, and "
+        "moving the final outputs. At the end of the run, the time spent in each "
+        "phase is summarized per step.",
+    )
+    monitor_group.add_argument(
+        "--trace-file",
+        type=str,
+        metavar="PATH",
+        help="Write every phase timed, as with --timing, to PATH in the Chrome trace "
+        "event format, to be opened in Perfetto (https://ui.perfetto.dev).",
+    )
+    monitor_group.add_argument(
+        "--otlp-trace-file",
+        type=str,
+        metavar="PATH",
+        help="Append the workflow, each step, scatter element and job to PATH as "
+        "OpenTelemetry spans, in the OTLP JSON format, one batch of spans per line. "
+        "The spans belong to the trace in the TRACEPARENT environment variable, if set.",
+    )
+    monitor_group.add_argument(
+        "--metrics-port",
+        type=int,
+        metavar="PORT",
+        help="Serve live metrics of the run in the Prometheus text format on "
+        "http://127.0.0.1:PORT/metrics: jobs pending, running and completed, the "
+        "cores, RAM and CUDA devices allocated with --parallel, cache hits and "
+        "misses, bytes staged, and the time taken to evaluate expressions. "
+        "Use 0 for any free port.",
+    )
+    monitor_group.add_argument(
+        "--metrics-textfile",
+        type=str,
+        metavar="PATH",
+        help="Write the same metrics as --metrics-port to PATH every 10 seconds, "
+        "for the textfile collector of the Prometheus node exporter.",
+    )
+    monitor_group.add_argument(
+        "--adaptive-resources",
+        action="store_true",
+        default=False,
+        help="Remember the peak memory and CPU use of each tool, by input size, "
+        "and with --parallel grant later jobs of the same tool no more than that "
+        "(plus a safety margin), but never less than their ResourceRequirement "
+        "minimums. Packs more jobs on the host at once.",
+    )
+    monitor_group.add_argument(
+        "--resource-history",
+        type=str,
+        metavar="PATH",
+        dest="resource_history_path",
+        help="Database for --adaptive-resources. "
+        "Defaults to resource-history.sqlite in the cwltool cache directory.",
+    )
+
     envgroup = parser.add_argument_group(title="environment variables control")
     env_exclusive = envgroup.add_mutually_exclusive_group()
     env_exclusive.add_argument(
@@ -401,7 +501,9 @@ def arg_parser() -> argparse.ArgumentParser:
         "--provenance",
         help="Save provenance to specified folder as a "
         "Research Object that captures and aggregates "
-        "workflow execution and data products.",
+        "workflow execution and data products. If the name ends with "
+        ".zip, .tar.zst or .tzst, save it as an archive of that format, "
+        "compressed in parallel as the workflow runs.",
         type=str,
     )
     provgroup.add_argument(
@@ -451,6 +553,27 @@ def arg_parser() -> argparse.ArgumentParser:
         default=os.environ.get("CWL_FULL_NAME", ""),
         type=str,
     )
+    provgroup.add_argument(
+        "--provenance-data",
+        choices=["copy", "link", "reference"],
+        default="copy",
+        help="How to include the input and output files in the --provenance "
+        "Research Object: copy them (the default); hard link (or reflink) them "
+        "where possible and reference them otherwise; or only reference them "
+        "where they are. Referenced files are recorded by checksum, size and "
+        "location in the BagIt fetch.txt, to be fetched to complete the bag. "
+        "Intermediate files in the temporary directories are always copied.",
+        dest="provenance_data",
+    )
+    provgroup.add_argument(
+        "--provenance-workers",
+        type=int,
+        default=0,
+        help="Record --provenance in the background, checksumming and copying "
+        "files with this many threads, so that jobs are not held up by it. "
+        "With 0 (the default), provenance is recorded as the workflow runs.",
+        dest="provenance_workers",
+    )
 
     strictgroup = parser.add_mutually_exclusive_group()
     strictgroup.add_argument(
@@ -560,6 +683,27 @@ def arg_parser() -> argparse.ArgumentParser:
         help="Pull latest software container image even if it is locally present",
         dest="force_docker_pull",
     )
+    prefetchgroup = container_group.add_mutually_exclusive_group()
+    prefetchgroup.add_argument(
+        "--prefetch-images",
+        action="store_true",
+        default=False,
+        help="When the workflow starts, pull or build the software container images "
+        "of all its steps in the background instead of when each step becomes runnable.",
+    )
+    prefetchgroup.add_argument(
+        "--prefetch-images-only",
+        action="store_true",
+        default=False,
+        help="Pull or build the software container images of all the steps, then exit "
+        "without running the workflow. Useful to warm the image cache of a node.",
+    )
+    container_group.add_argument(
+        "--prefetch-images-max",
+        type=int,
+        default=4,
+        help="Maximum number of software container images to prefetch in parallel.",
+    )
     container_group.add_argument(
         "--no-read-only",
         action="store_true",
@@ -567,6 +711,15 @@ def arg_parser() -> argparse.ArgumentParser:
         help="Do not set root directory in the container as read-only",
         dest="no_read_only",
     )
+    container_group.add_argument(
+        "--reuse-containers",
+        action="store_true",
+        default=False,
+        help="Run the jobs of a tool in long-lived Docker or Podman containers, "
+        "one at a time, instead of starting a container for each job. Faster "
+        "for many short jobs, but jobs sharing a container are less isolated "
+        "from each other: see cwltool.container_pool for the details.",
+    )
     container_group.add_argument(
         "--default-container",
         help="Specify a default software container to use for any "
@@ -21,9 +21,11 @@ from schema_salad.utils import convert_to_dict, json_dumps
 from schema_salad.validate import validate
 
 from .errors import WorkflowException
+from .live_metrics import evaluation
 from .loghandler import _logger
 from .mutation import MutationManager
 from .stdfsaccess import StdFsAccess
+from .timing import span
 from .utils import (
     CONTENT_LIMIT,
     CWLObjectType,
@@ -158,6 +160,7 @@ class Builder(HasReqsHints):
         self.pathmapper: Optional["PathMapper"] = None
         self.prov_obj: Optional["ProvenanceProfile"] = None
         self.find_default_container: Callable[[], str] | None = None
+        self.step_name: str | None = None
         self.container_engine = container_engine
 
     def build_job_script(self, commands: list[str]) -> str | None:
@@ -336,7 +339,10 @@ class Builder(HasReqsHints):
                 for n, item in enumerate(cast(MutableSequence[CWLObjectType], datum)):
                     b2 = None
                     if binding:
-                        b2 = cast(CWLObjectType, copy.deepcopy(binding))
+                        # "datum" holds the whole array, don't copy it for every item
+                        b2 = CommentedMap(
+                            (k, copy.deepcopy(v)) for k, v in binding.items() if k != "datum"
+                        )
                         b2["datum"] = item
                     itemschema: CWLObjectType = {
                         "type": schema["items"],
@@ -685,19 +691,20 @@ class Builder(HasReqsHints):
             resources = copy.copy(resources)
             resources["cores"] = int(math.ceil(cores))
 
-        return expression.do_eval(
-            ex,
-            self.job,
-            self.requirements,
-            self.outdir,
-            self.tmpdir,
-            resources,
-            context=context,
-            timeout=self.timeout,
-            debug=self.debug,
-            js_console=self.js_console,
-            force_docker_pull=self.force_docker_pull,
-            strip_whitespace=strip_whitespace,
-            cwlVersion=self.cwlVersion,
-            container_engine=self.container_engine,
-        )
+        with span("do_eval", self.step_name), evaluation(ex):
+            return expression.do_eval(
+                ex,
+                self.job,
+                self.requirements,
+                self.outdir,
+                self.tmpdir,
+                resources,
+                context=context,
+                timeout=self.timeout,
+                debug=self.debug,
+                js_console=self.js_console,
+                force_docker_pull=self.force_docker_pull,
+                strip_whitespace=strip_whitespace,
+                cwlVersion=self.cwlVersion,
+                container_engine=self.container_engine,
+            )
@@ -33,6 +33,7 @@ from schema_salad.sourceline import SourceLine
 from schema_salad.utils import json_dumps
 from schema_salad.validate import validate_ex
 
+from . import live_metrics
 from .builder import (
     INPUT_OBJ_VOCAB,
     Builder,
@@ -55,9 +56,9 @@ from .process import (
     shortname,
     uniquename,
 )
-from .singularity import SingularityCommandLineJob
 from .stdfsaccess import StdFsAccess
-from .udocker import UDockerCommandLineJob
+from .timing import span
+from .tracing import Span, start_span
 from .update import ORDERED_VERSIONS, ORIGINAL_CWLVERSION
 from .utils import (
     CWLObjectType,
@@ -169,12 +170,19 @@ class ExpressionJob:
         self.tmpdir = tmpdir
         self.script = script
         self.prov_obj: Optional["ProvenanceProfile"] = None
+        self.trace_parent: Span | None = None
 
     def run(
         self,
         runtimeContext: RuntimeContext,
         tmpdir_lock: Union[threading.Lock, None] = None,
     ) -> None:
+        job_span = start_span(
+            runtimeContext.tracer,
+            "job",
+            self.trace_parent,
+            {"cwl.step": self.builder.step_name, "cwl.process.class": "ExpressionTool"},
+        )
         try:
             normalizeFilesDirs(self.builder.job)
             ev = self.builder.do_eval(self.script)
@@ -190,6 +198,8 @@ class ExpressionJob:
                     ev,
                 )
             )
+            if job_span is not None:
+                job_span.end("success")
             if self.output_callback:
                 self.output_callback(cast(Optional[CWLObjectType], ev), "success")
         except WorkflowException as err:
@@ -198,6 +208,8 @@ class ExpressionJob:
                 str(err),
                 exc_info=runtimeContext.debug,
             )
+            if job_span is not None:
+                job_span.end("permanentFail")
             if self.output_callback:
                 self.output_callback({}, "permanentFail")
 
@@ -210,7 +222,8 @@ class ExpressionTool(Process):
         output_callbacks: OutputCallbackType | None,
         runtimeContext: RuntimeContext,
     ) -> Generator[ExpressionJob, None, None]:
-        builder = self._init_job(job_order, runtimeContext)
+        with span("_init_job", runtimeContext.name or shortname(self.tool["id"])):
+            builder = self._init_job(job_order, runtimeContext)
 
         job = ExpressionJob(
             builder,
@@ -220,6 +233,7 @@ class ExpressionTool(Process):
             self.hints,
         )
         job.prov_obj = runtimeContext.prov_obj
+        job.trace_parent = runtimeContext.trace_span
         yield job
 
 
@@ -328,22 +342,33 @@ class CallbackJob:
         self.cachebuilder = cachebuilder
         self.outdir = jobcache
         self.prov_obj: ProvenanceProfile | None = None
+        self.trace_parent: Span | None = None
 
     def run(
         self,
         runtimeContext: RuntimeContext,
         tmpdir_lock: Union[threading.Lock, None] = None,
     ) -> None:
+        job_span = start_span(
+            runtimeContext.tracer,
+            "job",
+            self.trace_parent,
+            {
+                "cwl.tool.id": self.job.tool["id"],
+                "cwl.step": self.cachebuilder.step_name,
+                "cwl.cache_hit": True,
+            },
+        )
         if self.output_callback:
-            self.output_callback(
-                self.job.collect_output_ports(
-                    self.job.tool["outputs"],
-                    self.cachebuilder,
-                    self.outdir,
-                    getdefault(runtimeContext.compute_checksum, True),
-                ),
-                "success",
+            outputs = self.job.collect_output_ports(
+                self.job.tool["outputs"],
+                self.cachebuilder,
+                self.outdir,
+                getdefault(runtimeContext.compute_checksum, True),
             )
+            if job_span is not None:
+                job_span.end("success")
+            self.output_callback(outputs, "success")
 
 
 def check_adjust(accept_re: Pattern[str], builder: Builder, file_o: CWLObjectType) -> CWLObjectType:
@@ -438,8 +463,12 @@ class CommandLineTool(Process):
             if mpiReq is not None:
                 _logger.warning("MPIRequirement with containers is a beta feature")
             if runtimeContext.singularity:
+                from .singularity import SingularityCommandLineJob
+
                 return SingularityCommandLineJob
             elif runtimeContext.user_space_docker_cmd:
+                from .udocker import UDockerCommandLineJob
+
                 return UDockerCommandLineJob
             if runtimeContext.podman:
                 return PodmanCommandLineJob
@@ -811,13 +840,15 @@ class CommandLineTool(Process):
         workReuse, _ = self.get_requirement("WorkReuse")
         enableReuse = workReuse.get("enableReuse", True) if workReuse else True
 
-        jobname = uniquename(runtimeContext.name or shortname(self.tool.get("id", "job")))
+        step_name = runtimeContext.name or shortname(self.tool.get("id", "job"))
+        jobname = uniquename(step_name)
         if runtimeContext.cachedir and enableReuse:
             cachecontext = runtimeContext.copy()
             cachecontext.outdir = "/out"
             cachecontext.tmpdir = "/tmp"  # nosec
             cachecontext.stagedir = "/stage"
-            cachebuilder = self._init_job(job_order, cachecontext)
+            with span("_init_job", step_name):
+                cachebuilder = self._init_job(job_order, cachecontext)
             cachebuilder.pathmapper = self.make_path_mapper(
                 cachebuilder.files,
                 cachebuilder.stagedir,
@@ -932,12 +963,18 @@ class CommandLineTool(Process):
                     cachebuilder.outdir = jobcache
 
                 _logger.info("[job %s] Using cached output in %s", jobname, jobcache)
-                yield CallbackJob(self, output_callbacks, cachebuilder, jobcache)
+                if (metrics := live_metrics.current()) is not None:
+                    metrics.cache_lookup(hit=True)
+                callback_job = CallbackJob(self, output_callbacks, cachebuilder, jobcache)
+                callback_job.trace_parent = runtimeContext.trace_span
+                yield callback_job
                 # we're done with the cache so release lock
                 jobcachelock.close()
                 return
             else:
                 _logger.info("[job %s] Output of job will be cached in %s", jobname, jobcache)
+                if (metrics := live_metrics.current()) is not None:
+                    metrics.cache_lookup(hit=False)
 
                 # turn shared lock into an exclusive lock since we'll
                 # be writing the cache directory
@@ -965,9 +1002,10 @@ class CommandLineTool(Process):
                     update_status_output_callback, output_callbacks, jobcachelock
                 )
 
-        builder = self._init_job(job_order, runtimeContext)
+        with span("_init_job", step_name):
+            builder = self._init_job(job_order, runtimeContext)
 
-        reffiles = copy.deepcopy(builder.files)
+        reffiles = list(builder.files)
 
         j = self.make_job_runner(runtimeContext)(
             builder,
@@ -978,6 +1016,9 @@ class CommandLineTool(Process):
             jobname,
         )
         j.prov_obj = self.prov_obj
+        j.tool_id = self.tool["id"]
+        j.step_name = step_name
+        j.trace_parent = runtimeContext.trace_span
 
         j.successCodes = self.tool.get("successCodes", [])
         j.temporaryFailCodes = self.tool.get("temporaryFailCodes", [])
@@ -0,0 +1,289 @@
+"""
+Run many jobs in the same long-lived software container.
+
+With ``--reuse-containers``, the ``docker run`` command line built for a job
+is split into the options that concern the container as a whole (the image,
+network, user and resource limits) and those that only concern the job (its
+bind mounts, environment variables and working directory). Jobs that agree
+on the former, and whose mounted files live in the same host directories,
+share a pool of idle containers, each started once with ``docker run -d`` and
+removed when cwltool exits. A job borrows a container for itself, and runs
+in it with ``docker exec``.
+
+The parent directories of the mounted files are bind mounted once, under
+:py:data:`HOST_ROOT`, and before each job the paths it expects (its output
+directory, ``/tmp`` and its staged inputs) are replaced with symbolic links
+into them. This trades some of the isolation of a fresh container for
+startup time:
+
+- jobs in the same container see the files that earlier jobs wrote outside
+  their output and temporary directories, and any process left running,
+  as the root filesystem of a reused container is never read-only;
+- through :py:data:`HOST_ROOT`, a job can see everything next to its
+  inputs, output and temporary directories, including the directories of
+  the other jobs; pointing ``--tmpdir-prefix`` and ``--tmp-outdir-prefix``
+  into a directory only used by cwltool limits that to cwltool's own files;
+- the memory and CPU limits apply to the container, not to each job, and
+  the resources used by a job are not measured;
+- ``pwd -P`` and ``realpath`` reveal the host paths under
+  :py:data:`HOST_ROOT`;
+- the image must provide ``/bin/sh``, ``tail`` and the usual ``mkdir``,
+  ``rm`` and ``ln``.
+
+Jobs that stage files into their output directory, which cannot be done
+with symbolic links, still get a container of their own.
+"""
+
+import atexit
+import csv
+import os
+import subprocess  # nosec
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from .docker import DockerCommandLineJob
+from .errors import WorkflowException
+from .loghandler import _logger
+
+HOST_ROOT = "/.cwltool-host"
+"""Where the host directories of the mounted files are visible in a reused container."""
+
+JOB_OPTIONS = ("--env=", "--workdir=", "--user=")
+"""``docker run`` options that also apply to ``docker exec``."""
+
+DROPPED_OPTIONS = ("-i", "--rm", "--read-only=true", "--log-driver=none")
+"""``docker run`` options that do not apply to a reused container."""
+
+_LINK_SCRIPT = (
+    'while [ "$#" -gt 1 ]; do '
+    'rm -rf "$2" && { [ -z "$1" ] || { mkdir -p "$(dirname "$2")" && ln -s "$1" "$2"; }; } '
+    "|| exit 1; shift 2; done"
+)
+"""Replace each target path with a link to its source, or just remove it if the source is empty."""
+
+
+class Mount(NamedTuple):
+    """A bind mount of a job."""
+
+    source: str
+    target: str
+    writable: bool
+
+
+PoolKey = tuple[str, str, tuple[str, ...], tuple[Mount, ...]]
+"""The engine, image, container options and mounted roots shared by the jobs of a container."""
+
+
+class WarmJob(NamedTuple):
+    """A job split into the parts that can share a container and the parts that cannot."""
+
+    docker_exe: str
+    image: str
+    container_options: tuple[str, ...]
+    exec_options: tuple[str, ...]
+    mounts: tuple[Mount, ...]
+    roots: tuple[Mount, ...]
+    """The host directories to mount in the container, under :py:data:`HOST_ROOT`."""
+
+    @property
+    def key(self) -> PoolKey:
+        """What jobs must have in common to use the same containers."""
+        return (self.docker_exe, self.image, self.container_options, self.roots)
+
+
+def _parse_mount(option: str) -> Mount | None:
+    fields = next(csv.reader([option[len("--mount=") :]]))
+    values = {}
+    for field in fields:
+        name, _, value = field.partition("=")
+        values[name] = value
+    if values.get("type") != "bind" or "source" not in values or "target" not in values:
+        return None
+    return Mount(values["source"], values["target"], "readonly" not in fields)
+
+
+def mount_roots(mounts: tuple[Mount, ...]) -> tuple[Mount, ...] | None:
+    """
+    Return the directories to mount so that all ``mounts`` are reachable.
+
+    These are the parent directories of the mount sources, writable if any
+    of the mounts in them is, leaving out those already covered by another.
+    Returns ``None`` if that would need the whole host filesystem.
+    """
+    writable: dict[str, bool] = {}
+    for mount in mounts:
+        parent = os.path.dirname(os.path.normpath(mount.source))
+        if parent == os.path.dirname(parent):
+            return None
+        writable[parent] = writable.get(parent, False) or mount.writable
+    roots: list[Mount] = []
+    for parent in sorted(writable):
+        covered = any(
+            parent.startswith(root.source + os.sep) and (root.writable or not writable[parent])
+            for root in roots
+        )
+        if not covered:
+            roots.append(Mount(parent, HOST_ROOT + parent, writable[parent]))
+    return tuple(roots)
+
+
+def plan_warm_job(runtime: list[str]) -> WarmJob | None:
+    """
+    Split a ``docker run`` command line, ending with the image, for running in a reused container.
+
+    Returns ``None`` for jobs that need a container of their own.
+    """
+    if len(runtime) < 3 or runtime[1] != "run":
+        return None
+    container_options: list[str] = []
+    exec_options: list[str] = []
+    mounts: list[Mount] = []
+    for option in runtime[2:-1]:
+        if option.startswith("--mount="):
+            mount = _parse_mount(option)
+            if mount is None:
+                return None
+            mounts.append(mount)
+        elif option.startswith("--user="):
+            container_options.append(option)
+            exec_options.append(option)
+        elif option.startswith(JOB_OPTIONS):
+            exec_options.append(option)
+        elif option not in DROPPED_OPTIONS and not option.startswith("--cidfile="):
+            container_options.append(option)
+    targets = [mount.target for mount in mounts]
+    for target in targets:
+        if not os.path.isabs(target) or target == HOST_ROOT or target.startswith(HOST_ROOT + "/"):
+            return None
+        if any(target.startswith(other.rstrip("/") + "/") for other in targets):
+            _logger.debug("Not reusing a container for a job staging %s into another mount", target)
+            return None
+    roots = mount_roots(tuple(mounts))
+    if roots is None:
+        return None
+    return WarmJob(
+        runtime[0],
+        runtime[-1],
+        tuple(container_options),
+        tuple(exec_options),
+        tuple(mounts),
+        roots,
+    )
+
+
+class WarmContainer:
+    """A running container that jobs take turns to use."""
+
+    def __init__(self, docker_exe: str, cid: str) -> None:
+        """Track the container ``cid``."""
+        self.docker_exe = docker_exe
+        self.cid = cid
+        self.links: list[str] = []
+        """The paths linked for the previous job."""
+
+    def link(self, mounts: tuple[Mount, ...]) -> None:
+        """Replace the mounts of the previous job with those of the next one."""
+        targets = [mount.target for mount in mounts]
+        args = [arg for target in self.links if target not in targets for arg in ("", target)]
+        for mount in mounts:
+            args.extend((HOST_ROOT + os.path.normpath(mount.source), mount.target))
+        result = subprocess.run(  # nosec
+            [self.docker_exe, "exec", "--user=0", self.cid, "/bin/sh", "-c", _LINK_SCRIPT, "sh"]
+            + args,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise WorkflowException(
+                f"Could not prepare container {self.cid} for the next job: {result.stderr.strip()}"
+            )
+        self.links = targets
+
+    def remove(self) -> None:
+        """Stop and remove the container."""
+        subprocess.run(  # nosec
+            [self.docker_exe, "rm", "--force", self.cid],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+
+class ContainerPool:
+    """The idle containers, by :py:attr:`WarmJob.key`."""
+
+    def __init__(self) -> None:
+        """Start without any container."""
+        self._lock = threading.Lock()
+        self._idle: dict[PoolKey, list[WarmContainer]] = {}
+        self._running: list[WarmContainer] = []
+
+    def _start(self, job: WarmJob) -> WarmContainer:
+        command = [job.docker_exe, "run", "-d", "--rm", *job.container_options]
+        for root in job.roots:
+            DockerCommandLineJob.append_volume(
+                command, root.source, root.target, root.writable, skip_mkdirs=True
+            )
+        command.extend(["--entrypoint=tail", job.image, "-f", "/dev/null"])
+        _logger.debug("Starting a container to reuse: %s", command)
+        result = subprocess.run(command, capture_output=True, text=True)  # nosec
+        if result.returncode != 0:
+            raise WorkflowException(
+                f"Could not start a container to reuse: {result.stderr.strip()}"
+            )
+        container = WarmContainer(job.docker_exe, result.stdout.strip())
+        with self._lock:
+            if not self._running:
+                atexit.register(self.shutdown)
+            self._running.append(container)
+        return container
+
+    def acquire(self, job: WarmJob) -> WarmContainer:
+        """Take an idle container for the job, starting one if there is none."""
+        with self._lock:
+            idle = self._idle.get(job.key)
+            if idle:
+                return idle.pop()
+        return self._start(job)
+
+    def release(self, job: WarmJob, container: WarmContainer) -> None:
+        """Make a container available to the next job."""
+        with self._lock:
+            self._idle.setdefault(job.key, []).append(container)
+
+    def discard(self, container: WarmContainer) -> None:
+        """Remove a container that may be in an unknown state."""
+        with self._lock:
+            if container in self._running:
+                self._running.remove(container)
+        container.remove()
+
+    def shutdown(self) -> None:
+        """Remove all containers."""
+        with self._lock:
+            running, self._running = self._running, []
+            self._idle.clear()
+        for container in running:
+            container.remove()
+
+
+_POOL = ContainerPool()
+
+
+@contextmanager
+def warm_container(job: WarmJob) -> Iterator[list[str]]:
+    """Borrow a container for a job, yielding the ``docker exec`` command line to run it with."""
+    container = _POOL.acquire(job)
+    try:
+        container.link(job.mounts)
+        yield [job.docker_exe, "exec", "-i", *job.exec_options, container.cid]
+    except BaseException:
+        _POOL.discard(container)
+        raise
+    _POOL.release(job, container)
+
+
+def stop_warm_containers() -> None:
+    """Remove the containers kept for reuse."""
+    _POOL.shutdown()
@@ -27,8 +27,10 @@ if TYPE_CHECKING:
     from .cwlprov.ro import ResearchObject
     from .mutation import MutationManager
     from .process import Process
+    from .resource_history import ResourceHistory
     from .secrets import SecretStore
     from .software_requirements import DependenciesConfiguration
+    from .tracing import Span, Tracer
     from .workflow_job import WorkflowJobStep
 
 
@@ -102,6 +104,8 @@ class LoadingContext(ContextBase):
         self.do_update: bool | None = None
         self.jobdefaults: CommentedMap | None = None
         self.doc_cache: bool = True
+        self.prefetch_workers: int = 8
+        self.process_cache: dict[str, "Process"] | None = None
         self.relax_path_checks: bool = False
         self.singularity: bool = False
         self.podman: bool = False
@@ -179,6 +183,13 @@ class RuntimeContext(ContextBase):
         self.strict_cpu_limit: bool = False
         self.cidfile_dir: str | None = None
         self.cidfile_prefix: str | None = None
+        self.monitor_interval: float = 1.0
+        self.reuse_containers: bool = False
+        self.metrics_file: str | None = None
+        self.resource_history: Optional["ResourceHistory"] = None
+        self.tracer: Optional["Tracer"] = None
+        self.trace_span: Optional["Span"] = None
+        """The span of the workflow, step or scatter element the jobs are part of."""
 
         self.workflow_eval_lock: Union[threading.Condition, None] = None
         self.research_obj: ResearchObject | None = None
@@ -5,7 +5,7 @@ import os
 import pwd
 import re
 import uuid
-from collections.abc import Callable
+from collections.abc import Callable, Mapping
 from getpass import getuser
 from typing import IO, Any, Optional, TypedDict, Union
 
@@ -122,6 +122,7 @@ class Aggregate(TypedDict, total=False):
     conformsTo: str | list[str] | None
     createdOn: str | None
     createdBy: dict[str, str] | None
+    retrievedFrom: str | None
 
 
 # Aggregate.bundledAs is actually type Aggregate, but cyclic definitions are not supported
@@ -147,6 +148,38 @@ def checksum_copy(
         from .provenance_constants import Hasher
 
         checksum = Hasher()
+    _copy(src_file, dst_file, [checksum], buffersize)
+    return checksum.hexdigest().lower()
+
+
+def checksums_copy(
+    src_file: IO[Any],
+    dst_file: IO[Any] | None = None,
+    hashers: Mapping[str, Callable[[], "hashlib._Hash"]] | None = None,
+    buffersize: int = 1024 * 1024,
+) -> dict[str, str]:
+    """
+    Compute several checksums in a single pass, while copying a file.
+
+    :param hashers: the hash functions, by the name of their checksums;
+                    by default those of the BagIt manifests
+    :returns: the checksums, by name
+    """
+    if hashers is None:
+        from .provenance_constants import MANIFEST_HASHERS
+
+        hashers = MANIFEST_HASHERS
+    checksums = {name: hasher() for name, hasher in hashers.items()}
+    _copy(src_file, dst_file, list(checksums.values()), buffersize)
+    return {name: checksum.hexdigest().lower() for name, checksum in checksums.items()}
+
+
+def _copy(
+    src_file: IO[Any],
+    dst_file: IO[Any] | None,
+    checksums: list["hashlib._Hash"],
+    buffersize: int,
+) -> None:
     contents = src_file.read(buffersize)
     if dst_file and hasattr(dst_file, "name") and hasattr(src_file, "name"):
         temp_location = os.path.join(os.path.dirname(dst_file.name), str(uuid.uuid4()))
@@ -162,8 +195,8 @@ def checksum_copy(
     while contents != b"":
         if dst_file is not None:
             dst_file.write(contents)
-        checksum.update(contents)
+        for checksum in checksums:
+            checksum.update(contents)
         contents = src_file.read(buffersize)
     if dst_file is not None:
         dst_file.flush()
-    return checksum.hexdigest().lower()
@@ -0,0 +1,188 @@
+"""
+Write a research object directly as a ZIP or a zstd-compressed tar archive.
+
+Rather than saving the research object as a folder, to be archived by hand
+afterwards, the files of the research object are added to an archive as they
+are finalized: the data files as soon as they are added, while the workflow
+runs, and the metadata files once the research object is closed. The files
+are compressed on a background thread, and for ``.tar.zst`` by the threads
+of the multithreaded zstd compressor.
+
+The archive unpacks into a single folder named after the archive, as
+required of serialized BagIt bags. It is written under a temporary name
+next to its destination, and renamed into place when complete.
+"""
+
+import os
+import tarfile
+import threading
+import uuid
+import zipfile
+from abc import ABCMeta, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+from ..errors import WorkflowException
+from ..loghandler import _logger
+from ..utils import local_path, posix_path
+
+ARCHIVE_FORMATS = {".zip": "zip", ".tar.zst": "tar.zst", ".tzst": "tar.zst"}
+"""The archive formats of research objects, by file name extension."""
+
+
+def _extension(path: str) -> str | None:
+    for extension in ARCHIVE_FORMATS:
+        if path.lower().endswith(extension):
+            return extension
+    return None
+
+
+def archive_format(path: str) -> str | None:
+    """Return the archive format named by the extension of ``path``, if any."""
+    extension = _extension(path)
+    return ARCHIVE_FORMATS[extension] if extension else None
+
+
+class ResearchObjectArchive(metaclass=ABCMeta):
+    """An archive at ``path`` of the files of the research object in ``folder``."""
+
+    def __init__(self, path: str, folder: str, threads: int | None = None) -> None:
+        """Start writing the archive, zstd compressing on up to ``threads`` threads."""
+        self.path = os.path.abspath(path)
+        self.folder = folder
+        self.threads = max(1, threads or os.cpu_count() or 1)
+        name = os.path.basename(self.path)
+        self.base = name[: len(name) - len(_extension(name) or "")]
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.partial = os.path.join(
+            os.path.dirname(self.path), f".{name}.{uuid.uuid4().hex}.partial"
+        )
+        self._added: set[str] = set()
+        self._futures: list[Future[None]] = []
+        self._lock = threading.Lock()
+
+    def _arcname(self, rel_path: str) -> str:
+        return posix_path(os.path.join(self.base, local_path(rel_path)))
+
+    def add(self, rel_path: str) -> None:
+        """Add the file at ``rel_path`` in the research object, once complete, in the background."""
+        with self._lock:
+            if rel_path in self._added:
+                return
+            self._added.add(rel_path)
+            self._futures.append(self._submit(rel_path))
+
+    @abstractmethod
+    def _submit(self, rel_path: str) -> "Future[None]":
+        """Start adding the file at ``rel_path`` to the archive."""
+
+    @abstractmethod
+    def _finish(self) -> None:
+        """Complete the archive, once every file was added."""
+
+    @abstractmethod
+    def _discard(self) -> None:
+        """Stop writing the archive, leaving its removal to the caller."""
+
+    def close(self) -> None:
+        """Add the files of the research object not added yet, and move the archive into place."""
+        for dirpath, dirnames, filenames in os.walk(self.folder):
+            dirnames.sort()
+            if not dirnames and not filenames:
+                # such as the data/ folder, without data files
+                filenames = [""]
+            for filename in sorted(filenames):
+                self.add(posix_path(os.path.relpath(os.path.join(dirpath, filename), self.folder)))
+        try:
+            for future in self._futures:
+                future.result()
+            self._finish()
+        except BaseException:
+            self.abort()
+            raise
+        os.replace(self.partial, self.path)
+        _logger.info("[provenance] Research Object archived to %s", self.path)
+
+    def abort(self) -> None:
+        """Stop writing the archive, and remove it."""
+        for future in self._futures:
+            future.cancel()
+        try:
+            self._discard()
+        finally:
+            if os.path.exists(self.partial):
+                os.unlink(self.partial)
+
+
+class _ZipArchive(ResearchObjectArchive):
+    """Deflate members into a ZIP file, one at a time, from a background thread."""
+
+    def __init__(self, path: str, folder: str, threads: int | None = None) -> None:
+        super().__init__(path, folder, threads)
+        self._zip = zipfile.ZipFile(
+            self.partial, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True
+        )
+        # zipfile writes members one at a time
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cwltool-ro-archive")
+
+    def _submit(self, rel_path: str) -> "Future[None]":
+        return self._pool.submit(
+            self._zip.write,
+            os.path.join(self.folder, local_path(rel_path)),
+            self._arcname(rel_path),
+        )
+
+    def _finish(self) -> None:
+        self._pool.shutdown()
+        self._zip.close()
+
+    def _discard(self) -> None:
+        self._pool.shutdown(cancel_futures=True)
+        self._zip.close()
+
+
+class _TarZstArchive(ResearchObjectArchive):
+    """Append members to a tar stream, compressed by the threads of a zstd compressor."""
+
+    def __init__(self, path: str, folder: str, threads: int | None = None) -> None:
+        try:
+            import zstandard
+        except ImportError as err:
+            raise WorkflowException(
+                "Archiving the research object as .tar.zst requires the zstandard package, "
+                "install with: pip install cwltool[zstd]"
+            ) from err
+        super().__init__(path, folder, threads)
+        compressor = zstandard.ZstdCompressor(threads=self.threads)
+        self._stream: Any = compressor.stream_writer(open(self.partial, "wb"))
+        self._tar = tarfile.open(fileobj=self._stream, mode="w|", format=tarfile.PAX_FORMAT)
+        # tar members are written one at a time, while zstd compresses
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cwltool-ro-archive")
+
+    def _submit(self, rel_path: str) -> "Future[None]":
+        return self._pool.submit(
+            self._tar.add,
+            os.path.join(self.folder, local_path(rel_path)),
+            self._arcname(rel_path),
+            recursive=False,
+        )
+
+    def _finish(self) -> None:
+        self._pool.shutdown()
+        self._tar.close()
+        self._stream.close()
+
+    def _discard(self) -> None:
+        self._pool.shutdown(cancel_futures=True)
+        self._stream.close()
+
+
+def open_archive(path: str, folder: str, threads: int | None = None) -> ResearchObjectArchive:
+    """Start archiving the research object in ``folder`` to ``path``, by its extension."""
+    if archive_format(path) == "tar.zst":
+        return _TarZstArchive(path, folder, threads)
+    if archive_format(path) == "zip":
+        return _ZipArchive(path, folder, threads)
+    raise ValueError(
+        f"Unknown archive format of {path}, expected one of {', '.join(ARCHIVE_FORMATS)}"
+    )
@@ -0,0 +1,340 @@
+"""
+An append-only log of PROV records, written as the workflow runs.
+
+Rather than keeping every record of a run in one
+:py:class:`~prov.model.ProvDocument` until the end, the records made while
+recording each provenance event are appended to a log as one line of
+PROV-JSON, and dropped from memory. The final serializations are then
+converted from the log a chunk of records at a time, by
+:py:func:`serialize_prov_log`. The provenance of a run which did not
+complete is still in its log.
+
+Records already written can not be added attributes to; new records with the
+same identifiers are made instead, see :py:meth:`ProvLog.get_record`, which
+PROV merges with the earlier ones.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from collections import Counter
+from collections.abc import Iterator
+from typing import IO, Any, cast
+
+from prov.constants import PROV_RECORD_IDS_MAP
+from prov.identifier import Identifier
+from prov.model import ProvDocument, ProvRecord
+
+from ..loghandler import _logger
+
+CHUNK_SIZE = 10000
+"""Number of PROV records converted at a time from a provenance log."""
+
+_XML_ROOT = "<prov:document"
+_XML_END = "</prov:document>"
+
+
+class ProvLog:
+    """A provenance log at ``path``, one PROV-JSON document per line."""
+
+    def __init__(self, path: str) -> None:
+        """Append to the log at ``path``."""
+        self.path = path
+        self._file: IO[str] | None = None
+        self._prefixes: dict[str, str] = {}
+        self._written: dict[str, str] = {}
+        self._anonymous = 0
+
+    def __getstate__(self) -> dict[str, Any]:
+        """Drop the open log file when pickled."""
+        state = self.__dict__.copy()
+        state["_file"] = None
+        return state
+
+    def append(self, document: ProvDocument) -> None:
+        """Write the records of ``document``, with the namespaces not written yet."""
+        content = json.loads(str(document.serialize(format="json")))
+        line: dict[str, Any] = {}
+        prefixes = {
+            prefix: uri
+            for prefix, uri in content.pop("prefix", {}).items()
+            if self._prefixes.get(prefix) != uri
+        }
+        if prefixes:
+            self._prefixes.update(prefixes)
+            line["prefix"] = prefixes
+        bundles = content.pop("bundle", {})
+        line.update(self._records(content, self._written))
+        if bundles:
+            line["bundle"] = {
+                bundle_id: self._records(bundle, None) for bundle_id, bundle in bundles.items()
+            }
+        if not line:
+            return
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(line, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+    def _records(self, container: dict[str, Any], written: dict[str, str] | None) -> dict[str, Any]:
+        """
+        Prepare the encoded records of a document or bundle for the log.
+
+        Anonymous relations are numbered across the whole log, and the
+        records standing in for written records, but with no attributes
+        added, are left out.
+        """
+        result: dict[str, Any] = {}
+        for label, records in container.items():
+            if label == "prefix":
+                result[label] = records
+                continue
+            kept: dict[str, Any] = {}
+            for identifier, content in records.items():
+                if identifier.startswith("_:"):
+                    self._anonymous += 1
+                    identifier = f"_:id{self._anonymous}"
+                elif written is not None:
+                    elements = content if isinstance(content, list) else [content]
+                    if identifier in written:
+                        elements = [element for element in elements if element]
+                    else:
+                        written[identifier] = label
+                    if not elements:
+                        continue
+                    content = elements[0] if len(elements) == 1 else elements
+                kept[identifier] = content
+            if kept:
+                result[label] = kept
+        return result
+
+    def get_record(self, document: ProvDocument, identifier: str) -> list[ProvRecord]:
+        """
+        Find the records with ``identifier``, to add attributes to.
+
+        A record already written to the log is stood in for by a new record
+        in ``document``, without attributes, so that only the attributes
+        added to it are written.
+        """
+        records = document.get_record(cast(Identifier, identifier))
+        if records:
+            return records if isinstance(records, list) else [records]
+        name = document.valid_qualified_name(cast(Any, identifier))
+        label = self._written.get(str(name))
+        if name is None or label is None:
+            return []
+        return [document.new_record(PROV_RECORD_IDS_MAP[label], cast(Any, name))]
+
+    def close(self) -> None:
+        """Close the log file, until appended to again."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _read(path: str) -> Iterator[dict[str, Any]]:
+    """Read the lines of a provenance log."""
+    with open(path, encoding="utf-8") as log:
+        for number, line in enumerate(log, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # written up to a crash
+                _logger.warning("[provenance] Ignoring incomplete line %d of %s", number, path)
+                return
+
+
+def _merge(container: dict[str, Any], content: dict[str, Any]) -> int:
+    """Merge the records of a log line into ``container``, returning how many."""
+    count = 0
+    for label, records in content.items():
+        if label == "prefix":
+            container.setdefault(label, {}).update(records)
+        elif label == "bundle":
+            for bundle_id, bundle in records.items():
+                count += _merge(container.setdefault(label, {}).setdefault(bundle_id, {}), bundle)
+        else:
+            merged = container.setdefault(label, {})
+            for identifier, element in records.items():
+                count += 1
+                if identifier in merged:
+                    previous = merged[identifier]
+                    merged[identifier] = (
+                        previous if isinstance(previous, list) else [previous]
+                    ) + (element if isinstance(element, list) else [element])
+                else:
+                    merged[identifier] = element
+    return count
+
+
+def _prefixes(path: str) -> dict[str, str]:
+    """Collect the namespaces of all the records in a log."""
+    prefixes: dict[str, str] = {}
+    for line in _read(path):
+        prefixes.update(line.get("prefix", {}))
+    return prefixes
+
+
+def _chunks(
+    path: str, prefixes: dict[str, str], records: bool = True, bundles: bool = True
+) -> Iterator[ProvDocument]:
+    """Read a log as a sequence of documents of about :py:data:`CHUNK_SIZE` records."""
+    container: dict[str, Any] = {}
+    size = 0
+    for line in _read(path):
+        if not records:
+            line = {"bundle": line["bundle"]} if "bundle" in line else {}
+        elif not bundles:
+            line.pop("bundle", None)
+        size += _merge(container, line)
+        if size >= CHUNK_SIZE:
+            yield _decode(container, prefixes)
+            container, size = {}, 0
+    if size:
+        yield _decode(container, prefixes)
+
+
+def _decode(container: dict[str, Any], prefixes: dict[str, str]) -> ProvDocument:
+    container["prefix"] = dict(prefixes)
+    return ProvDocument.deserialize(content=json.dumps(container), format="json")
+
+
+def _empty(prefixes: dict[str, str]) -> ProvDocument:
+    return _decode({}, prefixes)
+
+
+def _write_provn(path: str, prefixes: dict[str, str], stream: IO[Any]) -> None:
+    # expressions first, then bundles, as in PROV-N documents
+    indent = "\n  "
+    stream.write("document")
+    for prefix, uri in prefixes.items():
+        if prefix == "default":
+            stream.write(f"{indent}default <{uri}>")
+        else:
+            stream.write(f"{indent}prefix {prefix} <{uri}>")
+    if prefixes:
+        stream.write(indent)
+    for document in _chunks(path, prefixes, bundles=False):
+        for record in document.records:
+            stream.write(indent + record.get_provn())
+    for document in _chunks(path, prefixes, records=False):
+        for bundle in document.bundles:
+            stream.write(indent + bundle.get_provn(1))
+    stream.write("\nendDocument")
+
+
+def _xml_parts(document: ProvDocument) -> tuple[str, str]:
+    """Split the PROV-XML of ``document`` into its root start tag and its content."""
+    xml = str(document.serialize(format="xml", indent=4))
+    start = xml.index(">", xml.index(_XML_ROOT)) + 1
+    if xml[start - 2] == "/":
+        return xml[: start - 2].rstrip() + ">", ""
+    return xml[:start], xml[start : xml.rindex(_XML_END)]
+
+
+def _write_xml(path: str, prefixes: dict[str, str], stream: IO[Any]) -> None:
+    # each chunk declares all the namespaces, so their elements are moved
+    # as they are into a single root element
+    head, _ = _xml_parts(_empty(prefixes))
+    stream.write(head)
+    for document in _chunks(path, prefixes):
+        stream.write(_xml_parts(document)[1].rstrip())
+    stream.write(f"\n{_XML_END}\n")
+
+
+def _write_rdf(path: str, prefixes: dict[str, str], stream: IO[Any], rdf_format: str) -> None:
+    # Turtle and N-Triples documents can simply be concatenated
+    for document in _chunks(path, prefixes):
+        document.serialize(stream, format="rdf", rdf_format=rdf_format)
+
+
+def _write_jsonld(path: str, prefixes: dict[str, str], stream: IO[Any]) -> None:
+    # the expanded JSON-LD of each chunk is a list of nodes and named graphs,
+    # and the default graph of the chunk is merged into the default graph
+    separator = "\n"
+    stream.write("[")
+    for document in _chunks(path, prefixes):
+        nodes = json.loads(str(document.serialize(format="rdf", rdf_format="json-ld")))
+        if isinstance(nodes, dict):
+            nodes = nodes.get("@graph", [nodes])
+        for node in nodes:
+            for member in node["@graph"] if set(node) == {"@graph"} else [node]:
+                stream.write(separator + json.dumps(member, indent=2))
+                separator = ",\n"
+    stream.write("\n]\n")
+
+
+def _write_json(path: str, prefixes: dict[str, str], stream: IO[Any]) -> None:
+    # the records of each type are written to their own temporary file, so
+    # that they can be grouped by type; only the records whose identifier is
+    # in several lines of the log wait in memory for their last line.
+    lines: Counter[tuple[str, str]] = Counter()
+    for line in _read(path):
+        for label, records in line.items():
+            if label not in ("prefix", "bundle"):
+                lines.update((label, identifier) for identifier in records)
+    pending: dict[tuple[str, str], list[Any]] = {}
+    with tempfile.TemporaryDirectory(prefix="cwlprov") as spill_dir:
+        spills: dict[str, IO[str]] = {}
+        try:
+            for line in _read(path):
+                for label, records in line.items():
+                    if label == "prefix":
+                        continue
+                    spill = spills.get(label)
+                    if spill is None:
+                        spill = spills[label] = open(
+                            os.path.join(spill_dir, label), "w+", encoding="utf-8"
+                        )
+                    for identifier, element in records.items():
+                        key = (label, identifier)
+                        if lines[key] > 1:
+                            elements = pending.setdefault(key, [])
+                            elements.extend(element if isinstance(element, list) else [element])
+                            lines[key] -= 1
+                            continue
+                        element = pending.pop(key, []) + (
+                            element if isinstance(element, list) else [element]
+                        )
+                        spill.write(",\n" if spill.tell() else "\n")
+                        spill.write(
+                            f"{json.dumps(identifier)}: "
+                            f"{json.dumps(element[0] if len(element) == 1 else element)}"
+                        )
+            stream.write('{\n"prefix": ' + json.dumps(prefixes, indent=2))
+            for label, spill in spills.items():
+                stream.write(f",\n{json.dumps(label)}: {{")
+                spill.seek(0)
+                shutil.copyfileobj(spill, stream)
+                stream.write("\n}")
+            stream.write("\n}\n")
+        finally:
+            for spill in spills.values():
+                spill.close()
+
+
+def serialize_prov_log(
+    path: str, stream: IO[Any], format: str = "json", rdf_format: str | None = None
+) -> None:
+    """
+    Convert the provenance log at ``path``, as :py:meth:`ProvDocument.serialize` would.
+
+    :param format: one of ``json``, ``provn``, ``xml`` or ``rdf``
+    :param rdf_format: ``turtle``, ``ntriples`` or ``json-ld``, for ``rdf``
+    """
+    prefixes = _prefixes(path)
+    if format == "json":
+        _write_json(path, prefixes, stream)
+    elif format == "provn":
+        _write_provn(path, prefixes, stream)
+    elif format == "xml":
+        _write_xml(path, prefixes, stream)
+    elif format == "rdf" and rdf_format == "json-ld":
+        _write_jsonld(path, prefixes, stream)
+    elif format == "rdf" and rdf_format is not None:
+        _write_rdf(path, prefixes, stream, rdf_format)
+    else:
+        raise ValueError(f"Unsupported PROV serialization {format} {rdf_format or ''}")
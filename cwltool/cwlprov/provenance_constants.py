@@ -47,6 +47,8 @@ Hasher = hashlib.sha1
 SHA1 = "sha1"
 SHA256 = "sha256"
 SHA512 = "sha512"
+# the checksums of the BagIt manifests, which always include sha1
+MANIFEST_HASHERS = {SHA1: hashlib.sha1, SHA256: hashlib.sha256, SHA512: hashlib.sha512}
 
 # TODO: Better identifiers for user, at least
 # these should be preserved in ~/.config/cwl for every execution
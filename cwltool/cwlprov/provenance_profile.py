@@ -1,6 +1,9 @@
 import copy
 import datetime
+import hashlib
+import json
 import logging
+import os
 import urllib
 import uuid
 from collections.abc import MutableMapping, MutableSequence, Sequence
@@ -16,9 +19,11 @@ from ..errors import WorkflowException
 from ..job import CommandLineJob, JobBase
 from ..loghandler import _logger
 from ..process import Process, shortname
+from ..resource_monitor import ResourceUsage
 from ..stdfsaccess import StdFsAccess
 from ..utils import CWLObjectType, JobsType, get_listing, posix_path, versionstring
 from ..workflow_job import WorkflowJob
+from .prov_log import ProvLog, serialize_prov_log
 from .provenance_constants import (
     ACCOUNT_UUID,
     CWLPROV,
@@ -63,6 +68,36 @@ def copy_job_order(job: Process | JobsType, job_order_object: CWLObjectType) ->
     return customised_job
 
 
+def content_key(value: CWLObjectType, checksum: str | None = None) -> str | None:
+    """
+    Identify a File or Directory by the names and checksums of its content.
+
+    Files have the same key when they have the same checksum, names and
+    secondaryFiles; directories when they have the same name and listing.
+
+    :param checksum: the checksum of a File not given in the File itself
+    :returns: ``None`` if a checksum, or the listing of a directory, is not known
+    """
+    content: list[Any] = [value.get("class"), value.get("basename")]
+    if value.get("class") == "File":
+        checksum = cast(str | None, value.get("checksum")) or checksum
+        if checksum is None:
+            return None
+        content += [checksum, value.get("nameroot"), value.get("nameext")]
+        children = cast(MutableSequence[CWLObjectType], value.get("secondaryFiles", []))
+    elif value.get("class") == "Directory" and "listing" in value:
+        children = cast(MutableSequence[CWLObjectType], value["listing"])
+    else:
+        return None
+    keys = [content_key(child) for child in children]
+    if None in keys:
+        return None
+    if value["class"] == "Directory":
+        keys.sort()
+    content.append(keys)
+    return hashlib.sha1(json.dumps(content).encode(ENCODING)).hexdigest()  # nosec
+
+
 class ProvenanceProfile:
     """
     Provenance profile.
@@ -97,12 +132,24 @@ class ProvenanceProfile:
             _logger.debug("[provenance] Creator Full name: %s", self.full_name)
         self.workflow_run_uuid = run_uuid or uuid.uuid4()
         self.workflow_run_uri = self.workflow_run_uuid.urn
+        # the entities of the Files and Directories declared, by content_key()
+        self._declared: dict[str, str] = {}
+        self.prov_log = ProvLog(
+            os.path.join(self.folder, PROVENANCE, f"{self.workflow_run_uuid}.cwlprov.ndjson")
+        )
+        research_object.prov_logs.add(self.prov_log.path)
         self.generate_prov_doc()
+        self._flush()
 
     def __str__(self) -> str:
         """Represent this Provenvance profile as a string."""
         return f"ProvenanceProfile <{self.workflow_run_uri}> in <{self.research_object}>"
 
+    def _flush(self) -> None:
+        """Write the records made since the last flush to the provenance log."""
+        self.prov_log.append(self.document)
+        self.document = ProvDocument(namespaces=self.document.namespaces)
+
     def generate_prov_doc(self) -> tuple[str, ProvDocument]:
         """Add basic namespaces."""
         self.cwltool_version = f"cwltool {versionstring().split()[-1]}"
@@ -183,22 +230,36 @@ class ProvenanceProfile:
         job: JobsType,
         job_order_object: CWLObjectType,
         research_obj: "ResearchObject",
+        when: datetime.datetime | None = None,
     ) -> None:
         """Evaluate the nature of job."""
         if not hasattr(process, "steps"):
             # record provenance of independent commandline tool executions
             self.prospective_prov(job)
             customised_job = copy_job_order(job, job_order_object)
-            self.used_artefacts(customised_job, self.workflow_run_uri)
+            self.used_artefacts(customised_job, self.workflow_run_uri, when=when)
             create_job(research_obj, customised_job)
         elif hasattr(job, "workflow"):
             # record provenance of workflow executions
             self.prospective_prov(job)
             customised_job = copy_job_order(job, job_order_object)
-            self.used_artefacts(customised_job, self.workflow_run_uri)
+            self.used_artefacts(customised_job, self.workflow_run_uri, when=when)
+        self._flush()
+
+    def process_run_id(self, process: Process, job: JobsType) -> str | None:
+        """Identify the run of a job, before :py:meth:`record_process_start`."""
+        if not hasattr(process, "steps"):
+            return self.workflow_run_uri
+        if not hasattr(job, "workflow"):
+            return uuid.uuid4().urn
+        return None
 
     def record_process_start(
-        self, process: Process, job: JobsType, process_run_id: str | None = None
+        self,
+        process: Process,
+        job: JobsType,
+        process_run_id: str | None = None,
+        when: datetime.datetime | None = None,
     ) -> str | None:
         if not hasattr(process, "steps"):
             process_run_id = self.workflow_run_uri
@@ -208,7 +269,9 @@ class ProvenanceProfile:
             if isinstance(job, (CommandLineJob, JobBase, WorkflowJob)):
                 name = job.name
             process_name = urllib.parse.quote(name, safe=":/,#")
-            process_run_id = self.start_process(process_name, datetime.datetime.now())
+            process_run_id = self.start_process(
+                process_name, when or datetime.datetime.now(), process_run_id
+            )
         return process_run_id
 
     def start_process(
@@ -231,6 +294,7 @@ class ProvenanceProfile:
             process_run_id, self.engine_uuid, str("wf:main/" + process_name)
         )
         self.document.wasStartedBy(process_run_id, None, self.workflow_run_uri, when, None, None)
+        self._flush()
         return process_run_id
 
     def record_process_end(
@@ -239,9 +303,53 @@ class ProvenanceProfile:
         process_run_id: str,
         outputs: CWLObjectType | MutableSequence[CWLObjectType] | None,
         when: datetime.datetime,
+        resource_usage: ResourceUsage | None = None,
     ) -> None:
-        self.generate_output_prov(outputs, process_run_id, process_name)
+        self.generate_output_prov(outputs, process_run_id, process_name, when)
+        if resource_usage is not None and resource_usage.peak_memory is not None:
+            for activity in self.prov_log.get_record(self.document, process_run_id):
+                activity.add_attributes(
+                    {
+                        CWLPROV["peakMemory"]: resource_usage.peak_memory,
+                        CWLPROV["cpuTime"]: resource_usage.cpu_time,
+                        CWLPROV["bytesRead"]: resource_usage.read_bytes,
+                        CWLPROV["bytesWritten"]: resource_usage.write_bytes,
+                    }
+                )
         self.document.wasEndedBy(process_run_id, None, self.workflow_run_uri, when)
+        self._flush()
+
+    def record_container(self, process_run_id: str, img_id: str) -> None:
+        """Record the software container image that a process was run in."""
+        container_agent = self.document.agent(
+            uuid.uuid4().urn,
+            {
+                "prov:type": PROV["SoftwareAgent"],
+                "cwlprov:image": img_id,
+                "prov:label": "Container execution of image %s" % img_id,
+            },
+        )
+        # FIXME: img_id is not a sha256 id, it might just be "debian:8"
+        # img_entity = document.entity("nih:sha-256;%s" % img_id,
+        #                  {"prov:label": "Container image %s" % img_id} )
+        # The image is the plan for this activity-agent association
+        # document.wasAssociatedWith(process_run_ID, container_agent, img_entity)
+        self.document.wasAssociatedWith(process_run_id, container_agent)
+        self._flush()
+
+    def record_nested_end(
+        self,
+        parent: "ProvenanceProfile",
+        outputs: CWLObjectType,
+        name: str,
+        when: datetime.datetime,
+    ) -> None:
+        """Record the end of a nested workflow run, with its provenance files in the parent."""
+        self.generate_output_prov(outputs, None, name, when)
+        self.document.wasEndedBy(self.workflow_run_uri, None, self.engine_uuid, when)
+        prov_ids = self.finalize_prov_profile(name)
+        # Tell parent to associate our provenance files with our wf run
+        parent.activity_has_provenance(self.workflow_run_uri, prov_ids)
 
     def declare_file(self, value: CWLObjectType) -> tuple[ProvEntity, ProvEntity, str]:
         """Construct a FileEntity for the given CWL File object."""
@@ -254,18 +362,25 @@ class ProvenanceProfile:
             csum = cast(str, value["checksum"])
             method, checksum = csum.split("$", 1)
             if method == SHA1 and self.research_object.has_data_file(checksum):
-                entity = self.document.entity("data:" + checksum)
+                # possibly added by the recorder ahead of being declared here
+                entity = self.document.entity("data:" + checksum, {PROV_TYPE: WFPROV["Artifact"]})
 
         if not entity and "location" in value:
             location = str(value["location"])
             # If we made it here, we'll have to add it to the RO
-            with self.fsaccess.open(location, "rb") as fhandle:
-                relative_path = self.research_object.add_data_file(fhandle)
-                # FIXME: This naively relies on add_data_file setting hash as filename
-                checksum = PurePath(relative_path).name
-                entity = self.document.entity("data:" + checksum, {PROV_TYPE: WFPROV["Artifact"]})
-                if "checksum" not in value:
-                    value["checksum"] = f"{SHA1}${checksum}"
+            recorder = self.research_object.recorder
+            if recorder is not None:
+                relative_path = recorder.data_file(
+                    location, self.fsaccess, cast(str | None, value.get("checksum"))
+                )
+            else:
+                with self.fsaccess.open(location, "rb") as fhandle:
+                    relative_path = self.research_object.add_data_file(fhandle, location=location)
+            # FIXME: This naively relies on add_data_file setting hash as filename
+            checksum = PurePath(relative_path).name
+            entity = self.document.entity("data:" + checksum, {PROV_TYPE: WFPROV["Artifact"]})
+            if "checksum" not in value:
+                value["checksum"] = f"{SHA1}${checksum}"
 
         if not entity and "contents" in value:
             # Anonymous file, add content as string
@@ -275,6 +390,13 @@ class ProvenanceProfile:
         if not entity or not checksum:
             raise ValueError("class:File but missing checksum/location/content: %r" % value)
 
+        # The same file, with the same names and secondaryFiles, is
+        # declared once, however many jobs use it
+        key = content_key(value, f"{SHA1}${checksum}")
+        declared = self._declared_entity(value, key)
+        if declared is not None:
+            return declared, entity, checksum
+
         # Track filename and extension, this is generally useful only for
         # secondaryFiles. Note that multiple uses of a file might thus record
         # different names for the same entity, so we'll
@@ -313,15 +435,39 @@ class ProvenanceProfile:
                 other_attributes={PROV["type"]: CWLPROV["SecondaryFile"]},
             )
 
+        if key is not None:
+            self._declared[key] = file_id
         return file_entity, entity, checksum
 
+    def _declared_entity(self, value: CWLObjectType, key: str | None) -> ProvEntity | None:
+        """Find the entity already declared for the content of ``value``, and identify with it."""
+        if key is None or key not in self._declared:
+            return None
+        records = self.prov_log.get_record(self.document, self._declared[key])
+        if not records:
+            return None
+        self._identify_declared(value, key)
+        return cast(ProvEntity, records[0])
+
+    def _identify_declared(self, value: CWLObjectType, key: str | None) -> None:
+        """Give ``value``, and its secondaryFiles or listing, the @id of their entities."""
+        if key in self._declared:
+            value["@id"] = self._declared[key]
+        for child in cast(
+            MutableSequence[CWLObjectType], value.get("secondaryFiles", value.get("listing", []))
+        ):
+            self._identify_declared(child, content_key(child))
+
     def declare_directory(self, value: CWLObjectType) -> ProvEntity:
         """Register any nested files/directories."""
-        # FIXME: Calculate a hash-like identifier for directory
-        # so we get same value if it's the same filenames/hashes
-        # in a different location.
-        # For now, mint a new UUID to identify this directory, but
+        # A directory with the same name and listing as one declared before,
+        # by checksums, is declared once; otherwise, and for directories
+        # not listed yet, mint a new UUID to identify this directory, but
         # attempt to keep it inside the value dictionary
+        key = content_key(value)
+        declared = self._declared_entity(value, key)
+        if declared is not None:
+            return declared
         dir_id = cast(str, value.setdefault("@id", uuid.uuid4().urn))
 
         # New annotation file to keep the ORE Folder listing
@@ -420,6 +566,8 @@ class ProvenanceProfile:
             coll.add_asserted_type(PROV["EmptyCollection"])
             coll.add_asserted_type(PROV["EmptyDictionary"])
         self.research_object.add_uri(coll.identifier.uri)
+        if key is not None:
+            self._declared[key] = dir_id
         return coll
 
     def declare_string(self, value: str) -> tuple[ProvEntity, str]:
@@ -438,9 +586,9 @@ class ProvenanceProfile:
         """Create data artefact entities for all file objects."""
         if isinstance(value, MutableMapping) and "@id" in value:
             # Already processed this value, but it might not be in this PROV
-            entities = self.document.get_record(value["@id"])
+            entities = self.prov_log.get_record(self.document, value["@id"])
             if entities:
-                return cast(list[ProvEntity], entities)[0]
+                return cast(ProvEntity, entities[0])
             # else, unknown in PROV, re-add below as if it's fresh
 
         match value:
@@ -556,11 +704,12 @@ class ProvenanceProfile:
         job_order: CWLObjectType | list[CWLObjectType],
         process_run_id: str,
         name: str | None = None,
+        when: datetime.datetime | None = None,
     ) -> None:
         """Add used() for each data artefact."""
         if isinstance(job_order, list):
             for entry in job_order:
-                self.used_artefacts(entry, process_run_id, name)
+                self.used_artefacts(entry, process_run_id, name, when)
         else:
             # FIXME: Use workflow name in packed.cwl, "main" is wrong for nested workflows
             base = "main"
@@ -573,26 +722,28 @@ class ProvenanceProfile:
                     self.document.used(
                         process_run_id,
                         entity,
-                        datetime.datetime.now(),
+                        when or datetime.datetime.now(),
                         None,
                         {"prov:role": prov_role},
                     )
                 except OSError:
                     pass
+            self._flush()
 
     def generate_output_prov(
         self,
         final_output: CWLObjectType | MutableSequence[CWLObjectType] | None,
         process_run_id: str | None,
         name: str | None,
+        when: datetime.datetime | None = None,
     ) -> None:
         """Call wasGeneratedBy() for each output,copy the files into the RO."""
         if isinstance(final_output, MutableSequence):
             for entry in final_output:
-                self.generate_output_prov(entry, process_run_id, name)
+                self.generate_output_prov(entry, process_run_id, name, when)
         elif final_output is not None:
             # Timestamp should be created at the earliest
-            timestamp = datetime.datetime.now()
+            timestamp = when or datetime.datetime.now()
 
             # For each output, find/register the corresponding
             # entity (UUID) and document it as generated in
@@ -612,6 +763,7 @@ class ProvenanceProfile:
                 self.document.wasGeneratedBy(
                     entity, process_run_id, timestamp, None, {"prov:role": role}
                 )
+            self._flush()
 
     def prospective_prov(self, job: JobsType) -> None:
         """Create prospective prov recording as wfdesc prov:Plan."""
@@ -660,6 +812,7 @@ class ProvenanceProfile:
             (PROV["has_provenance"], prov_id) for prov_id in prov_ids
         ]
         self.document.activity(activity, other_attributes=attribs)
+        self._flush()
         # Tip: we can't use https://www.w3.org/TR/prov-links/#term-mention
         # as prov:mentionOf() is only for entities, not activities
         uris = [i.uri for i in prov_ids]
@@ -687,41 +840,34 @@ class ProvenanceProfile:
         # list of prov identifiers of provenance files
         prov_ids = []
 
-        # https://www.w3.org/TR/prov-xml/
-        with write_bag_file(self.research_object, basename + ".xml") as provenance_file:
-            self.document.serialize(provenance_file, format="xml", indent=4)
-            prov_ids.append(self.provenance_ns[filename + ".xml"])
-
-        # https://www.w3.org/TR/prov-n/
-        with write_bag_file(self.research_object, basename + ".provn") as provenance_file:
-            self.document.serialize(provenance_file, format="provn", indent=2)
-            prov_ids.append(self.provenance_ns[filename + ".provn"])
-
-        # https://www.w3.org/Submission/prov-json/
-        with write_bag_file(self.research_object, basename + ".json") as provenance_file:
-            self.document.serialize(provenance_file, format="json", indent=2)
-            prov_ids.append(self.provenance_ns[filename + ".json"])
-
-        # "rdf" aka https://www.w3.org/TR/prov-o/
-        # which can be serialized to ttl/nt/jsonld (and more!)
-
-        # https://www.w3.org/TR/turtle/
-        with write_bag_file(self.research_object, basename + ".ttl") as provenance_file:
-            self.document.serialize(provenance_file, format="rdf", rdf_format="turtle")
-            prov_ids.append(self.provenance_ns[filename + ".ttl"])
-
-        # https://www.w3.org/TR/n-triples/
-        with write_bag_file(self.research_object, basename + ".nt") as provenance_file:
-            self.document.serialize(provenance_file, format="rdf", rdf_format="ntriples")
-            prov_ids.append(self.provenance_ns[filename + ".nt"])
-
-        # https://www.w3.org/TR/json-ld/
-        # TODO: Use a nice JSON-LD context
-        # see also https://eprints.soton.ac.uk/395985/
-        # 404 Not Found on https://provenance.ecs.soton.ac.uk/prov.jsonld :(
-        with write_bag_file(self.research_object, basename + ".jsonld") as provenance_file:
-            self.document.serialize(provenance_file, format="rdf", rdf_format="json-ld")
-            prov_ids.append(self.provenance_ns[filename + ".jsonld"])
+        # The records are converted from the provenance log a chunk at a time
+        self._flush()
+        self.prov_log.close()
+
+        for extension, prov_format, rdf_format in (
+            # https://www.w3.org/TR/prov-xml/
+            ("xml", "xml", None),
+            # https://www.w3.org/TR/prov-n/
+            ("provn", "provn", None),
+            # https://www.w3.org/Submission/prov-json/
+            ("json", "json", None),
+            # "rdf" aka https://www.w3.org/TR/prov-o/
+            # which can be serialized to ttl/nt/jsonld (and more!)
+            # https://www.w3.org/TR/turtle/
+            ("ttl", "rdf", "turtle"),
+            # https://www.w3.org/TR/n-triples/
+            ("nt", "rdf", "ntriples"),
+            # https://www.w3.org/TR/json-ld/
+            # TODO: Use a nice JSON-LD context
+            # see also https://eprints.soton.ac.uk/395985/
+            # 404 Not Found on https://provenance.ecs.soton.ac.uk/prov.jsonld :(
+            ("jsonld", "rdf", "json-ld"),
+        ):
+            with write_bag_file(self.research_object, f"{basename}.{extension}") as provenance_file:
+                serialize_prov_log(
+                    self.prov_log.path, provenance_file, prov_format, rdf_format=rdf_format
+                )
+            prov_ids.append(self.provenance_ns[f"{filename}.{extension}"])
 
         _logger.debug("[provenance] added provenance: %s", prov_ids)
         return prov_ids
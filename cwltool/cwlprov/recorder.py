@@ -0,0 +1,186 @@
+"""
+Record provenance in the background, off the critical path of the workflow.
+
+Recording provenance means checksumming, and usually copying, every input
+and output file, which would otherwise delay the start of the next job
+while large files are hashed. With a :py:class:`ProvenanceRecorder`,
+provenance events are instead queued as the workflow runs, then applied to
+the PROV documents in order by a single thread, while a pool of threads
+hashes and copies the files of the queued events concurrently.
+
+The CWL objects of an event are copied when it is queued, so that the
+workflow can carry on using them, after giving them the ``@id`` they would
+have been given when recorded: the same objects used by later events are
+then recognised as the same PROV entities.
+"""
+
+import copy
+import queue
+import threading
+import uuid
+from collections.abc import Callable, Iterator, MutableMapping, MutableSequence
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any
+
+from ..loghandler import _logger
+from ..stdfsaccess import StdFsAccess
+from .provenance_constants import SHA1
+
+if TYPE_CHECKING:
+    from .ro import ResearchObject
+
+MAX_PENDING_EVENTS = 1000
+"""Number of queued events above which the workflow waits for provenance to catch up."""
+
+
+def _assign_ids(value: Any) -> None:
+    """Give ``@id`` to the CWL objects which would get one when declared in PROV."""
+    if isinstance(value, MutableMapping):
+        value.setdefault("@id", uuid.uuid4().urn)
+        if value.get("class") == "File":
+            children: Any = value.get("secondaryFiles", [])
+        elif value.get("class") == "Directory":
+            children = value.get("listing", [])
+        else:
+            children = [child for key, child in value.items() if key != "@id"]
+        for child in children:
+            _assign_ids(child)
+    elif isinstance(value, MutableSequence):
+        for child in value:
+            _assign_ids(child)
+
+
+def _snapshot(arg: Any) -> Any:
+    """Copy a job order or output object, identifying its values first."""
+    if isinstance(arg, MutableSequence):
+        return [_snapshot(entry) for entry in arg]
+    if isinstance(arg, MutableMapping):
+        for value in arg.values():
+            _assign_ids(value)
+        return copy.deepcopy(arg)
+    return arg
+
+
+def _files(value: Any) -> Iterator[MutableMapping[str, Any]]:
+    """Find the File objects that would be declared along with ``value``."""
+    if isinstance(value, MutableMapping):
+        if value.get("class") == "File":
+            yield value
+            children: Any = value.get("secondaryFiles", [])
+        elif value.get("class") == "Directory":
+            children = value.get("listing", [])
+        else:
+            children = value.values()
+        for child in children:
+            yield from _files(child)
+    elif isinstance(value, MutableSequence):
+        for child in value:
+            yield from _files(child)
+
+
+class ProvenanceRecorder:
+    """Apply provenance events in order on a background thread, hashing files on ``workers``."""
+
+    def __init__(self, research_object: "ResearchObject", workers: int) -> None:
+        """Start the threads recording provenance into ``research_object``."""
+        self.research_object = research_object
+        self.error: BaseException | None = None
+        self._events: queue.Queue[tuple[Callable[..., object], tuple[Any, ...]] | None] = (
+            queue.Queue(maxsize=MAX_PENDING_EVENTS)
+        )
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="cwltool-provenance"
+        )
+        self._data_files: dict[tuple[str, str | None], Future[str]] = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run, name="cwltool-provenance-recorder", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while (item := self._events.get()) is not None:
+            event, args = item
+            try:
+                if self.error is None:
+                    event(*args)
+            except BaseException as err:  # noqa: B036
+                _logger.exception("[provenance] Could not record %s", event.__name__)
+                self.error = err
+            finally:
+                self._events.task_done()
+        self._events.task_done()
+
+    def record(self, event: Callable[..., object], *args: Any) -> None:
+        """
+        Queue ``event(*args)``, after all the events queued before it.
+
+        Blocks while too many events are queued already.
+
+        :raises: the error of a previous event, as provenance can no
+                 longer be recorded
+        """
+        if self.error is not None:
+            raise self.error
+        args = tuple(_snapshot(arg) for arg in args)
+        for arg in args:
+            for file in _files(arg):
+                self._prefetch(file)
+        self._events.put((event, args))
+
+    def _prefetch(self, file: MutableMapping[str, Any]) -> None:
+        location = file.get("location")
+        if not isinstance(location, str) or location.startswith("_:"):
+            return
+        checksum = file.get("checksum")
+        if isinstance(checksum, str):
+            method, _, digest = checksum.partition("$")
+            if method == SHA1 and self.research_object.has_data_file(digest):
+                return
+        self.data_file(location, self.research_object.fsaccess, checksum, wait=False)
+
+    def data_file(
+        self,
+        location: str,
+        fsaccess: StdFsAccess,
+        checksum: str | None = None,
+        wait: bool = True,
+    ) -> str:
+        """
+        Add the file at ``location`` to the research object, once.
+
+        :param checksum: the checksum of the file, if known, to tell apart
+                         different content at the same location
+        :returns: the path of the file in the research object, unless not
+                  waiting for it to be added
+        """
+        with self._lock:
+            future = self._data_files.get((location, checksum))
+            if future is None:
+                future = self._pool.submit(self._add_data_file, location, fsaccess)
+                self._data_files[(location, checksum)] = future
+        return future.result() if wait else ""
+
+    def _add_data_file(self, location: str, fsaccess: StdFsAccess) -> str:
+        with fsaccess.open(location, "rb") as fhandle:
+            return self.research_object.add_data_file(fhandle, location=location)
+
+    def flush(self) -> None:
+        """
+        Wait until all the queued events are recorded.
+
+        :raises: the error of an event that could not be recorded
+        """
+        self._events.join()
+        with self._lock:
+            futures = list(self._data_files.values())
+        wait(futures)
+        if self.error is not None:
+            raise self.error
+
+    def close(self) -> None:
+        """Record the queued events, and stop. Errors are only logged."""
+        if self._thread.is_alive():
+            self._events.put(None)
+            self._thread.join()
+        self._pool.shutdown()
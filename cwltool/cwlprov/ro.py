@@ -5,15 +5,17 @@ import hashlib
 import os
 import shutil
 import tempfile
+import threading
 import urllib
 import uuid
-from collections.abc import MutableMapping, MutableSequence
+from collections.abc import Callable, MutableMapping, MutableSequence, Sequence
 from pathlib import Path, PurePosixPath
 from socket import getfqdn
 from typing import IO, TYPE_CHECKING, Any, Optional, cast
 
 import prov.model as provM
 from prov.model import ProvDocument
+from schema_salad.ref_resolver import file_uri, uri_file_path
 
 from ..loghandler import _logger
 from ..stdfsaccess import StdFsAccess
@@ -21,11 +23,13 @@ from ..utils import (
     CWLObjectType,
     CWLOutputType,
     create_tmp_dir,
+    link_file,
     local_path,
     posix_path,
     versionstring,
 )
-from . import Aggregate, Annotation, AuthoredBy, _valid_orcid, _whoami, checksum_copy
+from . import Aggregate, Annotation, AuthoredBy, _valid_orcid, _whoami, checksums_copy
+from .archive import ResearchObjectArchive, open_archive
 from .provenance_constants import (
     ACCOUNT_UUID,
     CWLPROV,
@@ -39,8 +43,6 @@ from .provenance_constants import (
     PROVENANCE,
     SCHEMA,
     SHA1,
-    SHA256,
-    SHA512,
     SNAPSHOT,
     TEXT_PLAIN,
     USER_UUID,
@@ -48,6 +50,7 @@ from .provenance_constants import (
     WORKFLOW,
     Hasher,
 )
+from .recorder import ProvenanceRecorder
 
 if TYPE_CHECKING:
     from .provenance_profile import ProvenanceProfile  # pylint: disable=unused-import
@@ -62,15 +65,44 @@ class ResearchObject:
         temp_prefix_ro: str = "tmp",
         orcid: str = "",
         full_name: str = "",
+        data_mode: str = "copy",
+        temporary_prefixes: Sequence[str] = (),
+        workers: int = 0,
+        archive: str | None = None,
     ) -> None:
-        """Initialize the ResearchObject."""
+        """
+        Initialize the ResearchObject.
+
+        :param data_mode: how to include the workflow data: ``copy`` it into
+                          the RO, ``link`` it if on the same filesystem, or
+                          ``reference`` it where it is; data that is not
+                          copied or linked is listed in the BagIt ``fetch.txt``
+        :param temporary_prefixes: where the files removed at the end of the
+                                   run are, which are always copied
+        :param workers: the number of threads checksumming and copying data
+                        files, while provenance is recorded in the background;
+                        with 0, provenance is recorded as the workflow runs
+        :param archive: the ZIP or ``.tar.zst`` file to archive the RO to, as
+                        its files are added; see :py:func:`close_ro`
+        """
         self.temp_prefix = temp_prefix_ro
+        self.data_mode = data_mode
+        self.temporary_prefixes = tuple(temporary_prefixes)
         self.orcid = "" if not orcid else _valid_orcid(orcid)
         self.full_name = full_name
         self.folder = create_tmp_dir(temp_prefix_ro)
+        self.archive: ResearchObjectArchive | None = None
+        if archive is not None:
+            try:
+                self.archive = open_archive(archive, self.folder)
+            except BaseException:
+                shutil.rmtree(self.folder, ignore_errors=True)
+                raise
         self.closed = False
         # map of filename "data/de/alsdklkas": 12398123 bytes
         self.bagged_size: dict[str, int] = {}
+        # map of filename "data/de/alsdklkas" to the URL it can be fetched from
+        self.fetched: dict[str, str] = {}
         self.tagfiles: set[str] = set()
         self._file_provenance: dict[str, Aggregate] = {}
         self._external_aggregates: list[Aggregate] = []
@@ -83,9 +115,18 @@ class ResearchObject:
         self.base_uri = f"arcp://uuid,{self.ro_uuid}/"
         self.cwltool_version = f"cwltool {versionstring().split()[-1]}"
         self.has_manifest = False
+        # the BagIt manifests being written, by file name
+        self._manifests: dict[str, IO[str]] = {}
+        # the PROV logs of the workflow runs, see ProvLog
+        self.prov_logs: set[str] = set()
         self.relativised_input_object: CWLObjectType = {}
+        # guards the bookkeeping of data files, which may be added concurrently
+        self._lock = threading.RLock()
 
         self._initialize()
+        self.recorder: ProvenanceRecorder | None = None
+        if workers:
+            self.recorder = ProvenanceRecorder(self, workers)
         _logger.debug("[provenance] Temporary research object: %s", self.folder)
 
     def initialize_provenance(
@@ -116,6 +157,34 @@ class ResearchObject:
             run_uuid=run_uuid,
         )
 
+    def __getstate__(self) -> dict[str, Any]:
+        """Leave out the lock, open files and threads when pickling (for Toil)."""
+        self._flush_manifests()
+        state = dict(self.__dict__)
+        del state["_lock"]
+        state["_manifests"] = {}
+        state["recorder"] = None
+        state["archive"] = None
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        """Restore a pickled research object, which records provenance as the workflow runs."""
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def record(self, event: Callable[..., object], *args: Any) -> None:
+        """Call ``event(*args)`` to record provenance, in the background if possible."""
+        if self.recorder is not None:
+            self.recorder.record(event, *args)
+        else:
+            event(*args)
+
+    def flush(self) -> None:
+        """Wait for the provenance recorded in the background, and write out the manifests."""
+        if self.recorder is not None:
+            self.recorder.flush()
+        self._flush_manifests()
+
     def self_check(self) -> None:
         """Raise ValueError if this RO is closed."""
         if self.closed:
@@ -236,25 +305,12 @@ class ResearchObject:
     def add_tagfile(self, path: str, timestamp: datetime.datetime | None = None) -> None:
         """Add tag files to our research object."""
         self.self_check()
-        checksums = {}
         # Read file to calculate its checksum
         if os.path.isdir(path):
             return
             # FIXME: do the right thing for directories
         with open(path, "rb") as tag_file:
-            # FIXME: Should have more efficient open_tagfile() that
-            # does all checksums in one go while writing through,
-            # adding checksums after closing.
-            # Below probably OK for now as metadata files
-            # are not too large..?
-
-            checksums[SHA1] = checksum_copy(tag_file, hasher=hashlib.sha1)
-
-            tag_file.seek(0)
-            checksums[SHA256] = checksum_copy(tag_file, hasher=hashlib.sha256)
-
-            tag_file.seek(0)
-            checksums[SHA512] = checksum_copy(tag_file, hasher=hashlib.sha512)
+            checksums = checksums_copy(tag_file)
 
         rel_path = posix_path(os.path.relpath(path, self.folder))
         self.tagfiles.add(rel_path)
@@ -288,6 +344,7 @@ class ResearchObject:
                 "cwl": 'text/x+yaml; charset="UTF-8"',
                 "provn": 'text/provenance-notation; charset="UTF-8"',
                 "nt": "application/n-triples",
+                "ndjson": "application/x-ndjson",
             }
             conforms_to: dict[str | None, str] = {
                 "provn": "http://www.w3.org/TR/2013/REC-prov-n-20130430/",
@@ -364,6 +421,8 @@ class ResearchObject:
                 pass
             if path in self._content_types:
                 aggregate_dict["mediatype"] = self._content_types[path]
+            if path in self.fetched:
+                aggregate_dict["retrievedFrom"] = self.fetched[path]
 
             aggregates.append(aggregate_dict)
 
@@ -529,51 +588,107 @@ class ResearchObject:
 
     def has_data_file(self, sha1hash: str) -> bool:
         """Confirm the presence of the given file in the RO."""
-        folder = os.path.join(self.folder, DATA, sha1hash[0:2])
-        hash_path = os.path.join(folder, sha1hash)
-        return os.path.isfile(hash_path)
+        rel_path = posix_path(os.path.join(DATA, sha1hash[0:2], sha1hash))
+        return rel_path in self.fetched or os.path.isfile(
+            os.path.join(self.folder, local_path(rel_path))
+        )
+
+    def _can_reference(self, location: str) -> bool:
+        """Check if the data at ``location`` will still be there after the run."""
+        if location.startswith("file://"):
+            location = uri_file_path(location)
+        elif "://" in location:
+            return True
+        return not os.path.abspath(location).startswith(self.temporary_prefixes)
+
+    def _add_data_reference(self, from_fp: IO[Any], location: str) -> str:
+        """Checksum a file, and link it into data/ or list it in fetch.txt."""
+        checksum = Hasher()
+        size = 0
+        while contents := from_fp.read(1024 * 1024):
+            checksum.update(contents)
+            size += len(contents)
+        sha1 = checksum.hexdigest().lower()
+        rel_path = posix_path(os.path.join(DATA, sha1[0:2], sha1))
+        with self._lock:
+            if rel_path not in self.bagged_size:
+                self._add_data_location(rel_path, sha1, size, location)
+        return rel_path
+
+    def _add_data_location(self, rel_path: str, sha1: str, size: int, location: str) -> None:
+        source = location
+        if location.startswith("file://"):
+            source = uri_file_path(location)
+        elif "://" not in location:
+            location = file_uri(os.path.abspath(location))
+        if self.data_mode == "link" and "://" not in source:
+            path = os.path.join(self.folder, local_path(rel_path))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if link_file(source, path):
+                self._add_to_bagit(rel_path, sha1=sha1)
+                return
+        self.fetched[rel_path] = location
+        self.bagged_size[rel_path] = size
+        self.add_to_manifest(rel_path, {SHA1: sha1})
+        _logger.debug("[provenance] Referenced data file %s as %s", location, rel_path)
 
     def add_data_file(
         self,
         from_fp: IO[Any],
         timestamp: datetime.datetime | None = None,
         content_type: str | None = None,
+        location: str | None = None,
     ) -> str:
-        """Copy inputs to data/ folder."""
-        self.self_check()
-        tmp_dir, tmp_prefix = os.path.split(self.temp_prefix)
-        with tempfile.NamedTemporaryFile(prefix=tmp_prefix, dir=tmp_dir, delete=False) as tmp:
-            checksum = checksum_copy(from_fp, tmp)
-
-        # Calculate hash-based file path
-        folder = os.path.join(self.folder, DATA, checksum[0:2])
-        path = os.path.join(folder, checksum)
-        # os.rename assumed safe, as our temp file should
-        # be in same file system as our temp folder
-        if not os.path.isdir(folder):
-            os.makedirs(folder)
-        os.rename(tmp.name, path)
-
-        # Relative posix path
-        rel_path = posix_path(os.path.relpath(path, self.folder))
+        """
+        Copy inputs to data/ folder.
 
-        # Register in bagit checksum
-        if Hasher == hashlib.sha1:
-            self._add_to_bagit(rel_path, sha1=checksum)
+        :param location: where the data was read from; unless the data mode
+                         of this RO is ``copy``, the data is linked or
+                         referenced there instead of copied
+        """
+        self.self_check()
+        if (
+            location is not None
+            and self.data_mode != "copy"
+            and Hasher == hashlib.sha1
+            and self._can_reference(location)
+        ):
+            rel_path = self._add_data_reference(from_fp, location)
         else:
-            _logger.warning("[provenance] Unknown hash method %s for bagit manifest", Hasher)
-            # Inefficient, bagit support need to checksum again
-            self._add_to_bagit(rel_path)
-        _logger.debug("[provenance] Added data file %s", path)
+            tmp_dir, tmp_prefix = os.path.split(self.temp_prefix)
+            # the sha1 of the bagit manifest is computed in the same pass
+            hashers: dict[str, Callable[[], "hashlib._Hash"]] = {SHA1: hashlib.sha1}
+            if Hasher != hashlib.sha1:
+                hashers["data"] = Hasher
+            with tempfile.NamedTemporaryFile(prefix=tmp_prefix, dir=tmp_dir, delete=False) as tmp:
+                checksums = checksums_copy(from_fp, tmp, hashers)
+            checksum = checksums.pop("data", checksums[SHA1])
+
+            # Calculate hash-based file path
+            folder = os.path.join(self.folder, DATA, checksum[0:2])
+            path = os.path.join(folder, checksum)
+            # os.rename assumed safe, as our temp file should
+            # be in same file system as our temp folder
+            os.makedirs(folder, exist_ok=True)
+            os.rename(tmp.name, path)
+
+            # Relative posix path
+            rel_path = posix_path(os.path.relpath(path, self.folder))
+
+            # Register in bagit checksum
+            self._add_to_bagit(rel_path, **checksums)
+            _logger.debug("[provenance] Added data file %s", path)
         if timestamp is not None:
             createdOn, createdBy = self._self_made(timestamp)
-            self._file_provenance[rel_path] = cast(
-                Aggregate, {"createdOn": createdOn, "createdBy": createdBy}
-            )
+            with self._lock:
+                self._file_provenance[rel_path] = cast(
+                    Aggregate, {"createdOn": createdOn, "createdBy": createdBy}
+                )
         _logger.debug("[provenance] Relative path for data file %s", rel_path)
 
         if content_type is not None:
-            self._content_types[rel_path] = content_type
+            with self._lock:
+                self._content_types[rel_path] = content_type
         return rel_path
 
     def _self_made(
@@ -601,15 +716,35 @@ class ResearchObject:
             manifest = "tagmanifest"
 
         # Add checksums to corresponding manifest files
-        for method, hash_value in checksums.items():
-            # File not in manifest because we bailed out on
-            # existence in bagged_size above
-            manifestpath = os.path.join(self.folder, f"{manifest}-{method.lower()}.txt")
-            # encoding: match Tag-File-Character-Encoding: UTF-8
-            with open(manifestpath, "a", encoding=ENCODING, newline="\n") as checksum_file:
+        with self._lock:
+            for method, hash_value in checksums.items():
+                filename = f"{manifest}-{method.lower()}.txt"
+                checksum_file = self._manifests.get(filename)
+                if checksum_file is None:
+                    # kept open, and buffered, until the RO is finalized;
+                    # encoding: match Tag-File-Character-Encoding: UTF-8
+                    checksum_file = self._manifests[filename] = open(
+                        os.path.join(self.folder, filename), "a", encoding=ENCODING, newline="\n"
+                    )
                 line = f"{hash_value}  {rel_path}\n"
-                _logger.debug("[provenance] Added to %s: %s", manifestpath, line)
+                _logger.debug("[provenance] Added to %s: %s", filename, line)
                 checksum_file.write(line)
+            if manifest == "manifest" and self.archive is not None and rel_path not in self.fetched:
+                # data files are complete once in the manifest
+                self.archive.add(rel_path)
+
+    def _flush_manifests(self) -> None:
+        """Write out the lines buffered for the manifests."""
+        with self._lock:
+            for checksum_file in self._manifests.values():
+                checksum_file.flush()
+
+    def _close_manifests(self) -> None:
+        """Close the manifests, once all the files are added."""
+        with self._lock:
+            for checksum_file in self._manifests.values():
+                checksum_file.close()
+            self._manifests.clear()
 
     def _add_to_bagit(self, rel_path: str, **checksums: str) -> None:
         """Compute file size and checksums and adds to bagit manifest."""
@@ -619,19 +754,20 @@ class ResearchObject:
         if not os.path.exists(lpath):
             raise OSError(f"File {rel_path} does not exist within RO: {lpath}")
 
-        if rel_path in self.bagged_size:
-            # Already added, assume checksum OK
-            return
-        self.bagged_size[rel_path] = os.path.getsize(lpath)
+        with self._lock:
+            if rel_path in self.bagged_size:
+                # Already added, assume checksum OK
+                return
+            self.bagged_size[rel_path] = os.path.getsize(lpath)
 
-        if SHA1 not in checksums:
-            # ensure we always have sha1
-            checksums = dict(checksums)
-            with open(lpath, "rb") as file_path:
-                # FIXME: Need sha-256 / sha-512 as well for Research Object BagIt profile?
-                checksums[SHA1] = checksum_copy(file_path, hasher=hashlib.sha1)
+            if SHA1 not in checksums:
+                # ensure we always have sha1
+                checksums = dict(checksums)
+                with open(lpath, "rb") as file_path:
+                    # FIXME: Need sha-256 / sha-512 as well for Research Object BagIt profile?
+                    checksums.update(checksums_copy(file_path, hashers={SHA1: hashlib.sha1}))
 
-        self.add_to_manifest(rel_path, checksums)
+            self.add_to_manifest(rel_path, checksums)
 
     def _relativise_files(
         self,
@@ -659,8 +795,9 @@ class ResearchObject:
                     # Register in RO; but why was this not picked
                     # up by used_artefacts?
                     _logger.info("[provenance] Adding to RO %s", structure["location"])
-                    with self.fsaccess.open(cast(str, structure["location"]), "rb") as fp:
-                        relative_path = self.add_data_file(fp)
+                    location = cast(str, structure["location"])
+                    with self.fsaccess.open(location, "rb") as fp:
+                        relative_path = self.add_data_file(fp, location=location)
                         checksum = PurePosixPath(relative_path).name
                         structure["checksum"] = f"{SHA1}${checksum}"
                 # RO-relative path as new location
@@ -18,6 +18,7 @@ from schema_salad.utils import json_dumps
 
 from ..loghandler import _logger
 from ..utils import CWLObjectType, local_path, posix_path
+from .archive import archive_format, open_archive
 from .provenance_constants import (
     CWLPROV,
     CWLPROV_VERSION,
@@ -182,16 +183,35 @@ def _write_bag_info(research_object: "ResearchObject") -> None:
         # as identifier for the RO/bagit (a prov:Entity). However the arcp base URI is good.
         info_file.write("External-Identifier: %s\n" % research_object.base_uri)
 
-        # Calculate size of data/ (assuming no external fetch.txt files)
+        # Calculate size of data/, including the files to fetch
         total_size = sum(research_object.bagged_size.values())
         num_files = len(research_object.bagged_size)
         info_file.write("Payload-Oxum: %d.%d\n" % (total_size, num_files))
     _logger.debug("[provenance] Generated bagit metadata: %s", research_object.folder)
 
 
+def _write_fetch(research_object: "ResearchObject") -> None:
+    with write_bag_file(research_object, "fetch.txt") as fetch_file:
+        for rel_path, url in sorted(research_object.fetched.items()):
+            size = research_object.bagged_size[rel_path]
+            fetch_file.write(f"{url.replace(' ', '%20')} {size} {rel_path}\n")
+    _logger.debug(
+        "[provenance] Listed %d data files to fetch in %s",
+        len(research_object.fetched),
+        research_object.folder,
+    )
+
+
 def _finalize(research_object: "ResearchObject") -> None:
+    # the provenance logs, also of the runs that did not complete
+    for prov_log in sorted(research_object.prov_logs):
+        if os.path.isfile(prov_log):
+            research_object.add_tagfile(prov_log)
     _write_ro_manifest(research_object)
     _write_bag_info(research_object)
+    if research_object.fetched:
+        _write_fetch(research_object)
+    research_object._close_manifests()
     if not research_object.has_manifest:
         (Path(research_object.folder) / "manifest-sha1.txt").touch()
 
@@ -199,31 +219,51 @@ def _finalize(research_object: "ResearchObject") -> None:
 def close_ro(research_object: "ResearchObject", save_to: str | None = None) -> None:
     """Close the Research Object, optionally saving to specified folder.
 
+    If 'saveTo' ends with ``.zip``, ``.tar.zst`` or ``.tzst``, the Research
+    Object is saved as an archive of that format instead, see
+    :py:mod:`cwltool.cwlprov.archive`.
+
     Closing will remove any temporary files used by this research object.
     After calling this method, this ResearchObject instance can no longer
     be used, except for no-op calls to .close().
 
     The 'saveTo' folder should not exist - if it does, it will be deleted.
+    An existing archive is replaced.
 
     It is safe to call this function multiple times without the
     'saveTo' argument, e.g. within a try..finally block to
     ensure the temporary files of this Research Object are removed.
     """
+    if research_object.recorder is not None:
+        # after the events still queued, if the workflow did not complete
+        research_object.recorder.close()
     if save_to is None:
         if not research_object.closed:
+            research_object._close_manifests()
+            if research_object.archive is not None:
+                research_object.archive.abort()
             _logger.debug("[provenance] Deleting temporary %s", research_object.folder)
             shutil.rmtree(research_object.folder, ignore_errors=True)
     else:
         save_to = os.path.abspath(save_to)
         _logger.info("[provenance] Finalizing Research Object")
         _finalize(research_object)  # write manifest etc.
-        # TODO: Write as archive (.zip or .tar) based on extension?
-
-        if os.path.isdir(save_to):
-            _logger.info("[provenance] Deleting existing %s", save_to)
-            shutil.rmtree(save_to)
-        shutil.move(research_object.folder, save_to)
-        _logger.info("[provenance] Research Object saved to %s", save_to)
+        archive = research_object.archive
+        if archive is not None and archive.path != save_to:
+            archive.abort()
+            archive = None
+        if archive is None and archive_format(save_to):
+            archive = open_archive(save_to, research_object.folder)
+        if archive is not None:
+            # the data files are in the archive already
+            archive.close()
+            shutil.rmtree(research_object.folder, ignore_errors=True)
+        else:
+            if os.path.isdir(save_to):
+                _logger.info("[provenance] Deleting existing %s", save_to)
+                shutil.rmtree(save_to)
+            shutil.move(research_object.folder, save_to)
+            _logger.info("[provenance] Research Object saved to %s", save_to)
         research_object.folder = save_to
     research_object.closed = True
 
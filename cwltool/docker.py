@@ -2,6 +2,7 @@
 
 import csv
 import datetime
+import hashlib
 import json
 import math
 import os
@@ -19,6 +20,13 @@ from .builder import Builder
 from .context import RuntimeContext
 from .docker_id import docker_vm_id
 from .errors import WorkflowException
+from .image_cache import (
+    ImageRecord,
+    SingleFlight,
+    image_identity,
+    lookup_image,
+    record_image,
+)
 from .job import ContainerCommandLineJob
 from .loghandler import _logger
 from .pathmapper import MapperEnt, PathMapper
@@ -26,6 +34,7 @@ from .utils import CWLObjectType, create_tmp_dir, ensure_writable
 
 _IMAGES: set[str] = set()
 _IMAGES_LOCK = threading.Lock()
+_ACQUISITIONS: SingleFlight[bool] = SingleFlight()
 __docker_machine_mounts: list[str] | None = None
 __docker_machine_mounts_lock = threading.Lock()
 
@@ -77,6 +86,146 @@ def _check_docker_machine_path(path: str | None) -> None:
         )
 
 
+def get_image(
+    docker_exec: str,
+    docker_requirement: dict[str, str],
+    pull_image: bool,
+    force_pull: bool,
+    tmp_outdir_prefix: str,
+) -> bool:
+    """
+    Retrieve a Docker container image using the ``docker_exec`` engine.
+
+    Concurrent requests for the same image, from this or other cwltool
+    processes on the host, wait for a single inspect/pull/build instead
+    of each running their own, whatever the other fields of their
+    DockerRequirement. Images that any cwltool process found or
+    pulled recently are trusted to still be present, see
+    :py:func:`~cwltool.image_cache.lookup_image`.
+
+    :returns: True upon success
+    """
+    if "dockerImageId" not in docker_requirement and "dockerPull" in docker_requirement:
+        docker_requirement["dockerImageId"] = docker_requirement["dockerPull"]
+
+    with _IMAGES_LOCK:
+        if docker_requirement["dockerImageId"] in _IMAGES:
+            return True
+
+    if not force_pull and lookup_image(docker_exec, _registry_reference(docker_requirement)):
+        with _IMAGES_LOCK:
+            _IMAGES.add(docker_requirement["dockerImageId"])
+        return True
+
+    found = _ACQUISITIONS.run(
+        f"{docker_exec} {image_identity(docker_requirement)}",
+        lambda: _acquire_image(
+            docker_exec, docker_requirement, pull_image, force_pull, tmp_outdir_prefix
+        ),
+    )
+
+    if found:
+        with _IMAGES_LOCK:
+            _IMAGES.add(docker_requirement["dockerImageId"])
+
+    return found
+
+
+def _registry_reference(docker_requirement: dict[str, str]) -> str:
+    """Identify an image in the image registry; built images also by their Dockerfile."""
+    reference = docker_requirement["dockerImageId"]
+    if "dockerFile" in docker_requirement:
+        dockerfile = docker_requirement["dockerFile"].encode("utf-8")
+        reference += "#sha256=" + hashlib.sha256(dockerfile).hexdigest()
+    return reference
+
+
+def _acquire_image(
+    docker_exec: str,
+    docker_requirement: dict[str, str],
+    pull_image: bool,
+    force_pull: bool,
+    tmp_outdir_prefix: str,
+) -> bool:
+    found = False
+    record = ImageRecord()
+
+    if (docker_image_id := docker_requirement.get("dockerImageId")) is not None:
+        try:
+            manifest = json.loads(
+                str(
+                    subprocess.check_output([docker_exec, "inspect", docker_image_id]),  # nosec
+                    "utf-8",
+                )
+            )
+            found = manifest is not None
+            if found and manifest and "Id" in manifest[0]:
+                record["digest"] = manifest[0]["Id"]
+        except (OSError, subprocess.CalledProcessError, UnicodeError):
+            pass
+
+    cmd: list[str] = []
+    if "dockerFile" in docker_requirement:
+        dockerfile_dir = create_tmp_dir(tmp_outdir_prefix)
+        with open(os.path.join(dockerfile_dir, "Dockerfile"), "w") as dfile:
+            dfile.write(docker_requirement["dockerFile"])
+        cmd = [
+            docker_exec,
+            "build",
+            "--tag=%s" % str(docker_requirement["dockerImageId"]),
+            dockerfile_dir,
+        ]
+        _logger.info(str(cmd))
+        subprocess.check_call(cmd, stdout=sys.stderr)  # nosec
+        found = True
+
+    if (force_pull or not found) and pull_image:
+        if "dockerPull" in docker_requirement:
+            cmd = [docker_exec, "pull", str(docker_requirement["dockerPull"])]
+            _logger.info(str(cmd))
+            subprocess.check_call(cmd, stdout=sys.stderr)  # nosec
+            found = True
+        elif "dockerLoad" in docker_requirement:
+            cmd = [docker_exec, "load"]
+            _logger.info(str(cmd))
+            if os.path.exists(docker_requirement["dockerLoad"]):
+                _logger.info(
+                    "Loading docker image from %s",
+                    docker_requirement["dockerLoad"],
+                )
+                with open(docker_requirement["dockerLoad"], "rb") as dload:
+                    loadproc = subprocess.Popen(cmd, stdin=dload, stdout=sys.stderr)  # nosec
+            else:
+                loadproc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=sys.stderr)  # nosec
+                assert loadproc.stdin is not None  # nosec
+                _logger.info("Sending GET request to %s", docker_requirement["dockerLoad"])
+                req = requests.get(docker_requirement["dockerLoad"], stream=True, timeout=60)
+                size = 0
+                for chunk in req.iter_content(1024 * 1024):
+                    size += len(chunk)
+                    _logger.info("\r%i bytes", size)
+                    loadproc.stdin.write(chunk)
+                loadproc.stdin.close()
+            rcode = loadproc.wait()
+            if rcode != 0:
+                raise WorkflowException("Docker load returned non-zero exit status %i" % (rcode))
+            found = True
+        elif "dockerImport" in docker_requirement:
+            cmd = [
+                docker_exec,
+                "import",
+                str(docker_requirement["dockerImport"]),
+                str(docker_requirement["dockerImageId"]),
+            ]
+            _logger.info(str(cmd))
+            subprocess.check_call(cmd, stdout=sys.stderr)  # nosec
+            found = True
+
+    if found:
+        record_image(docker_exec, _registry_reference(docker_requirement), record)
+    return found
+
+
 class DockerCommandLineJob(ContainerCommandLineJob):
     """Runs a :py:class:`~cwltool.job.CommandLineJob` in a software container using the Docker engine."""
 
@@ -105,95 +254,9 @@ class DockerCommandLineJob(ContainerCommandLineJob):
 
         :returns: True upon success
         """
-        found = False
-
-        if "dockerImageId" not in docker_requirement and "dockerPull" in docker_requirement:
-            docker_requirement["dockerImageId"] = docker_requirement["dockerPull"]
-
-        with _IMAGES_LOCK:
-            if docker_requirement["dockerImageId"] in _IMAGES:
-                return True
-
-        if (docker_image_id := docker_requirement.get("dockerImageId")) is not None:
-            try:
-                manifest = json.loads(
-                    str(
-                        subprocess.check_output(
-                            [self.docker_exec, "inspect", docker_image_id]
-                        ),  # nosec
-                        "utf-8",
-                    )
-                )
-                found = manifest is not None
-            except (OSError, subprocess.CalledProcessError, UnicodeError):
-                pass
-
-        cmd: list[str] = []
-        if "dockerFile" in docker_requirement:
-            dockerfile_dir = create_tmp_dir(tmp_outdir_prefix)
-            with open(os.path.join(dockerfile_dir, "Dockerfile"), "w") as dfile:
-                dfile.write(docker_requirement["dockerFile"])
-            cmd = [
-                self.docker_exec,
-                "build",
-                "--tag=%s" % str(docker_requirement["dockerImageId"]),
-                dockerfile_dir,
-            ]
-            _logger.info(str(cmd))
-            subprocess.check_call(cmd, stdout=sys.stderr)  # nosec
-            found = True
-
-        if (force_pull or not found) and pull_image:
-            if "dockerPull" in docker_requirement:
-                cmd = [self.docker_exec, "pull", str(docker_requirement["dockerPull"])]
-                _logger.info(str(cmd))
-                subprocess.check_call(cmd, stdout=sys.stderr)  # nosec
-                found = True
-            elif "dockerLoad" in docker_requirement:
-                cmd = [self.docker_exec, "load"]
-                _logger.info(str(cmd))
-                if os.path.exists(docker_requirement["dockerLoad"]):
-                    _logger.info(
-                        "Loading docker image from %s",
-                        docker_requirement["dockerLoad"],
-                    )
-                    with open(docker_requirement["dockerLoad"], "rb") as dload:
-                        loadproc = subprocess.Popen(cmd, stdin=dload, stdout=sys.stderr)  # nosec
-                else:
-                    loadproc = subprocess.Popen(  # nosec
-                        cmd, stdin=subprocess.PIPE, stdout=sys.stderr
-                    )
-                    assert loadproc.stdin is not None  # nosec
-                    _logger.info("Sending GET request to %s", docker_requirement["dockerLoad"])
-                    req = requests.get(docker_requirement["dockerLoad"], stream=True, timeout=60)
-                    size = 0
-                    for chunk in req.iter_content(1024 * 1024):
-                        size += len(chunk)
-                        _logger.info("\r%i bytes", size)
-                        loadproc.stdin.write(chunk)
-                    loadproc.stdin.close()
-                rcode = loadproc.wait()
-                if rcode != 0:
-                    raise WorkflowException(
-                        "Docker load returned non-zero exit status %i" % (rcode)
-                    )
-                found = True
-            elif "dockerImport" in docker_requirement:
-                cmd = [
-                    self.docker_exec,
-                    "import",
-                    str(docker_requirement["dockerImport"]),
-                    str(docker_requirement["dockerImageId"]),
-                ]
-                _logger.info(str(cmd))
-                subprocess.check_call(cmd, stdout=sys.stderr)  # nosec
-                found = True
-
-        if found:
-            with _IMAGES_LOCK:
-                _IMAGES.add(docker_requirement["dockerImageId"])
-
-        return found
+        return get_image(
+            self.docker_exec, docker_requirement, pull_image, force_pull, tmp_outdir_prefix
+        )
 
     def get_from_requirements(
         self,
@@ -26,6 +26,8 @@ from .loghandler import _logger
 from .mutation import MutationManager
 from .process import Process, cleanIntermediate, relocateOutputs
 from .task_queue import TaskQueue
+from .timing import span
+from .tracing import start_span
 from .update import ORIGINAL_CWLVERSION
 from .utils import CWLObjectType, JobsType
 from .workflow import Workflow
@@ -102,6 +104,14 @@ class JobExecutor(metaclass=ABCMeta):
         runtime_context.mutation_manager = MutationManager()
         runtime_context.toplevel = True
         runtime_context.workflow_eval_lock = threading.Condition(threading.RLock())
+        run_span = start_span(
+            runtime_context.tracer,
+            "run",
+            runtime_context.trace_span,
+            {"cwl.process.id": process.tool["id"], "cwl.process.class": process.tool["class"]},
+        )
+        if run_span is not None:
+            runtime_context.trace_span = run_span
 
         job_reqs: list[CWLObjectType] | None = None
         if "https://w3id.org/cwl/cwl#requirements" in job_order_object:
@@ -134,20 +144,31 @@ class JobExecutor(metaclass=ABCMeta):
             for req in job_reqs:
                 process.requirements.append(req)
 
-        self.run_jobs(process, job_order_object, logger, runtime_context)
+        try:
+            self.run_jobs(process, job_order_object, logger, runtime_context)
+        except BaseException:
+            if run_span is not None:
+                run_span.end("permanentFail")
+            raise
+        if runtime_context.research_obj is not None:
+            # before the outputs are moved, and the intermediate ones removed
+            runtime_context.research_obj.flush()
         if runtime_context.validate_only is True:
+            if run_span is not None:
+                run_span.end()
             return (None, "ValidationSuccess")
 
         if self.final_output and self.final_output[0] is not None and finaloutdir is not None:
-            self.final_output[0] = relocateOutputs(
-                self.final_output[0],
-                finaloutdir,
-                self.output_dirs,
-                runtime_context.move_outputs,
-                runtime_context.make_fs_access(""),
-                getdefault(runtime_context.compute_checksum, True),
-                path_mapper=runtime_context.path_mapper,
-            )
+            with span("relocateOutputs"):
+                self.final_output[0] = relocateOutputs(
+                    self.final_output[0],
+                    finaloutdir,
+                    self.output_dirs,
+                    runtime_context.move_outputs,
+                    runtime_context.make_fs_access(""),
+                    getdefault(runtime_context.compute_checksum, True),
+                    path_mapper=runtime_context.path_mapper,
+                )
 
         if runtime_context.rm_tmpdir:
             if not runtime_context.cachedir:
@@ -159,6 +180,9 @@ class JobExecutor(metaclass=ABCMeta):
                 )
             cleanIntermediate(output_dirs)
 
+        if run_span is not None:
+            run_span.end(self.final_status[0] if self.final_status else "permanentFail")
+
         if self.final_output and self.final_status:
             if (
                 runtime_context.research_obj is not None
@@ -217,7 +241,7 @@ class SingleJobExecutor(JobExecutor):
                         job.builder = runtime_context.builder
                     if job.outdir is not None:
                         self.output_dirs.add(job.outdir)
-                    if runtime_context.research_obj is not None:
+                    if (research_obj := runtime_context.research_obj) is not None:
                         if not isinstance(process, Workflow):
                             prov_obj = process.provenance_object
                         else:
@@ -225,13 +249,14 @@ class SingleJobExecutor(JobExecutor):
                         if prov_obj:
                             runtime_context.prov_obj = prov_obj
                             prov_obj.fsaccess = runtime_context.make_fs_access("")
-                            prov_obj.evaluate(
-                                process,
-                                job,
-                                job_order_object,
-                                runtime_context.research_obj,
+                            now = datetime.datetime.now()
+                            research_obj.record(
+                                prov_obj.evaluate, process, job, job_order_object, research_obj, now
+                            )
+                            process_run_id = prov_obj.process_run_id(process, job)
+                            research_obj.record(
+                                prov_obj.record_process_start, process, job, process_run_id, now
                             )
-                            process_run_id = prov_obj.record_process_start(process, job)
                             runtime_context = runtime_context.copy()
                         runtime_context.process_run_id = process_run_id
                     if runtime_context.validate_only is True:
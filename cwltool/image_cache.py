@@ -0,0 +1,210 @@
+"""Coordinate and remember the acquisition of software container images."""
+
+import hashlib
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Iterator, Mapping
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Generic, TypedDict, TypeVar
+
+from .loghandler import _logger
+from .utils import upgrade_lock, user_cache_dir
+
+_T = TypeVar("_T")
+
+IMAGE_FIELDS = ("dockerPull", "dockerLoad", "dockerFile", "dockerImport", "dockerImageId")
+"""The fields of a DockerRequirement that tell which image it needs."""
+
+IMAGE_REGISTRY_TTL = 24 * 60 * 60
+"""Default number of seconds before a registered image is verified again."""
+
+
+class ImageRecord(TypedDict, total=False):
+    """What is known about a locally available image."""
+
+    verified: float
+    """When the image was last seen, in seconds since the epoch."""
+    digest: str
+    """The image ID or digest reported by the container engine."""
+    path: str
+    """The local image file (e.g. a Singularity SIF) or sandbox directory."""
+    requirement: dict[str, str]
+    """The DockerRequirement as rewritten by the engine to point at the local image."""
+    version: str
+    """For container engine executables: the output of ``--version``."""
+
+
+def image_identity(docker_requirement: Mapping[str, str]) -> str:
+    """
+    Identify the image needed by a DockerRequirement, ignoring its other fields.
+
+    Requirements differing only in ``class`` or ``dockerOutputDirectory``
+    name the same image, and so share its acquisition. A ``dockerFile`` is
+    identified by the hash of its content.
+    """
+    identity = {
+        field: str(docker_requirement[field])
+        for field in IMAGE_FIELDS
+        if field in docker_requirement
+    }
+    if "dockerFile" in identity:
+        dockerfile = identity["dockerFile"].encode("utf-8")
+        identity["dockerFile"] = "sha256:" + hashlib.sha256(dockerfile).hexdigest()
+    return json.dumps(identity, sort_keys=True)
+
+
+def image_lock_dir() -> str:
+    """Return the default directory for cross-process image acquisition locks."""
+    return os.path.join(user_cache_dir(), "image-locks")
+
+
+@contextmanager
+def host_image_lock(lock_dir: str, key: str) -> Iterator[None]:
+    """
+    Hold an exclusive, host wide lock for acquiring the image named by ``key``.
+
+    The lock is an ``flock`` on a file in ``lock_dir`` so that separate
+    cwltool processes sharing an image cache wait for each other instead of
+    pulling or building the same image at the same time.
+    """
+    os.makedirs(lock_dir, exist_ok=True)
+    lock_path = os.path.join(lock_dir, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".lock")
+    with open(lock_path, "a") as lock_file:
+        upgrade_lock(lock_file)
+        yield
+
+
+class SingleFlight(Generic[_T]):
+    """
+    Run at most one acquisition per image at a time.
+
+    The first caller for a given key runs the acquisition while holding a
+    :py:func:`host_image_lock`; concurrent callers with the same key in this
+    process wait for, and share, its result (or exception).
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty set of in-flight acquisitions."""
+        self._lock = threading.Lock()
+        self._inflight: dict[str, Future[_T]] = {}
+
+    def run(self, key: str, acquire: Callable[[], _T], lock_dir: str | None = None) -> _T:
+        """Return the result of ``acquire()``, shared with concurrent callers for ``key``."""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if future is None:
+                future = self._inflight[key] = Future()
+        if not leader:
+            _logger.debug("Waiting for concurrent acquisition of image %s", key)
+            return future.result()
+        try:
+            with host_image_lock(lock_dir or image_lock_dir(), key):
+                result = acquire()
+        except BaseException as err:
+            future.set_exception(err)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+
+def image_registry_path() -> str:
+    """Return the location of the on-disk registry of locally available images."""
+    return os.path.join(user_cache_dir(), "images.json")
+
+
+def image_registry_ttl() -> float:
+    """
+    Return how long, in seconds, a registry entry is trusted without checking again.
+
+    Set by ``$CWLTOOL_IMAGE_CACHE_TTL``; 0 disables the registry.
+    """
+    ttl = os.environ.get("CWLTOOL_IMAGE_CACHE_TTL")
+    if ttl is None:
+        return IMAGE_REGISTRY_TTL
+    try:
+        return float(ttl)
+    except ValueError:
+        _logger.warning("Ignoring invalid CWLTOOL_IMAGE_CACHE_TTL %r", ttl)
+        return IMAGE_REGISTRY_TTL
+
+
+def _read_image_registry(path: str) -> dict[str, ImageRecord]:
+    try:
+        with open(path) as registry:
+            records = json.load(registry)
+    except (OSError, ValueError):
+        return {}
+    return records if isinstance(records, dict) else {}
+
+
+def _registry_key(engine: str, reference: str) -> str:
+    """
+    Key a registry entry on where the image is stored as well as on the image.
+
+    The registry may be shared by several hosts, through a shared home
+    directory, and an engine's images are local to its host, or to the
+    daemon named by ``$DOCKER_HOST`` or ``$CONTAINER_HOST``.
+    """
+    endpoint = os.environ.get("DOCKER_HOST") or os.environ.get("CONTAINER_HOST") or ""
+    return " ".join((engine, socket.gethostname(), endpoint, reference))
+
+
+def lookup_image(engine: str, reference: str) -> ImageRecord | None:
+    """
+    Return the registry entry for an image, if it was verified recently enough on this host.
+
+    :param engine: the container engine (``docker``, ``podman``, ``singularity``, …)
+    :param reference: the image name, or another key identifying the image
+    """
+    ttl = image_registry_ttl()
+    if ttl <= 0:
+        return None
+    record = _read_image_registry(image_registry_path()).get(_registry_key(engine, reference))
+    if record is None or time.time() - record.get("verified", 0) >= ttl:
+        return None
+    return record
+
+
+def record_image(engine: str, reference: str, record: ImageRecord) -> None:
+    """
+    Remember that an image is available locally, for other cwltool processes.
+
+    Expired entries are dropped while the registry is rewritten. Failing to
+    update the registry is not an error.
+    """
+    ttl = image_registry_ttl()
+    if ttl <= 0:
+        return
+    path = image_registry_path()
+    now = time.time()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".lock", "a") as lock_file:
+            upgrade_lock(lock_file)
+            records = {
+                key: value
+                for key, value in _read_image_registry(path).items()
+                if now - value.get("verified", 0) < ttl
+            }
+            entry: ImageRecord = {**record, "verified": now}
+            records[_registry_key(engine, reference)] = entry
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as registry:
+                    json.dump(records, registry, sort_keys=True)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+    except OSError as err:
+        _logger.debug("Could not update the image registry %s: %s", path, err)
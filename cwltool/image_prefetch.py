@@ -0,0 +1,153 @@
+"""Acquire the software container images of a whole workflow ahead of time."""
+
+import shutil
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from .command_line_tool import CommandLineTool
+from .context import RuntimeContext
+from .docker import get_image
+from .errors import WorkflowException
+from .image_cache import image_identity
+from .loghandler import _logger
+from .process import Process
+from .procgenerator import ProcessGenerator
+from .workflow import Workflow
+
+
+def _walk_processes(process: Process) -> Iterator[Process]:
+    yield process
+    if isinstance(process, Workflow):
+        for step in process.steps:
+            yield from _walk_processes(step.embedded_tool)
+    elif isinstance(process, ProcessGenerator):
+        yield from _walk_processes(process.embedded_tool)
+
+
+def image_name(docker_requirement: dict[str, str]) -> str:
+    """Return a human readable name for the image of a DockerRequirement."""
+    for field in ("dockerImageId", "dockerPull", "dockerLoad", "dockerImport"):
+        if field in docker_requirement:
+            return docker_requirement[field]
+    return "<dockerFile>"
+
+
+def container_requirements(
+    process: Process, runtime_context: RuntimeContext
+) -> list[dict[str, str]]:
+    """
+    List the distinct container images needed by every CommandLineTool in a process.
+
+    Includes ``DockerRequirement`` hints and, for tools without one, the
+    ``--default-container`` or the BioContainers image matching their
+    ``SoftwareRequirement``. The requirements are those the jobs will use,
+    so that a job starting while its image is being prefetched waits for
+    that prefetch.
+    """
+    seen: set[str] = set()
+    requirements: list[dict[str, str]] = []
+    for tool in _walk_processes(process):
+        if not isinstance(tool, CommandLineTool):
+            continue
+        docker_req, _ = tool.get_requirement("DockerRequirement")
+        requirement: dict[str, str] = {}
+        if docker_req is not None:
+            requirement = {key: str(value) for key, value in docker_req.items()}
+        elif runtime_context.find_default_container is not None:
+            default_container = runtime_context.find_default_container(tool)
+            if default_container:
+                requirement = {"class": "DockerRequirement", "dockerPull": default_container}
+        if not requirement:
+            continue
+        key = image_identity(requirement)
+        if key not in seen:
+            seen.add(key)
+            requirements.append(requirement)
+    return requirements
+
+
+def acquire_image(docker_requirement: dict[str, str], runtime_context: RuntimeContext) -> bool:
+    """
+    Pull, load, build, or convert a single image with the selected container engine.
+
+    :raises WorkflowException: if the container engine is not available
+    """
+    requirement = dict(docker_requirement)
+    if runtime_context.singularity:
+        if not shutil.which("singularity"):
+            raise WorkflowException("singularity executable is not available")
+        from .singularity import SingularityCommandLineJob
+
+        return SingularityCommandLineJob.get_image(
+            requirement,
+            runtime_context.pull_image,
+            runtime_context.tmp_outdir_prefix,
+            runtime_context.force_docker_pull,
+            sandbox_base_path=runtime_context.image_base_path,
+        )
+    docker_exec = "podman" if runtime_context.podman else "docker"
+    if not shutil.which(docker_exec):
+        raise WorkflowException(f"{docker_exec} executable is not available")
+    return get_image(
+        docker_exec,
+        requirement,
+        runtime_context.pull_image,
+        runtime_context.force_docker_pull,
+        runtime_context.tmp_outdir_prefix,
+    )
+
+
+class ImagePrefetcher:
+    """
+    Acquire all the container images of a process concurrently, in the background.
+
+    Jobs that need an image which is still being fetched wait for that
+    fetch instead of starting their own (see :py:class:`~cwltool.image_cache.SingleFlight`).
+    Failures are only logged: the job that needs the image will try again
+    and report the error.
+    """
+
+    def __init__(
+        self, process: Process, runtime_context: RuntimeContext, max_workers: int = 4
+    ) -> None:
+        """Start fetching the images used by ``process``."""
+        self.requirements: list[dict[str, str]] = []
+        if runtime_context.use_container:
+            if runtime_context.user_space_docker_cmd:
+                _logger.warning("Prefetching images is not supported with user space docker.")
+            else:
+                self.requirements = container_requirements(process, runtime_context)
+        self._runtime_context = runtime_context
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="cwltool-image-prefetch"
+        )
+        self._futures: list[Future[bool]] = [
+            self._pool.submit(self._acquire, requirement) for requirement in self.requirements
+        ]
+
+    def _acquire(self, requirement: dict[str, str]) -> bool:
+        name = image_name(requirement)
+        _logger.info("Prefetching software container image %s", name)
+        try:
+            found = acquire_image(requirement, self._runtime_context)
+        except Exception as err:
+            _logger.warning(
+                "Could not prefetch software container image %s: %s",
+                name,
+                err,
+                exc_info=self._runtime_context.debug,
+            )
+            return False
+        if not found:
+            _logger.warning("Software container image %s not found", name)
+        return found
+
+    def wait(self) -> bool:
+        """Wait for all the images; return True if every one of them was acquired."""
+        wait(self._futures)
+        self._pool.shutdown()
+        return all(future.result() for future in self._futures)
+
+    def cancel(self) -> None:
+        """Stop starting new fetches; fetches already running are left to finish."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -1,6 +1,5 @@
 import datetime
 import functools
-import itertools
 import logging
 import math
 import os
@@ -13,27 +12,37 @@ import subprocess  # nosec
 import sys
 import threading
 import time
-import uuid
 from abc import ABCMeta, abstractmethod
-from collections.abc import Callable, Iterable, Mapping, MutableMapping, MutableSequence
+from collections.abc import Callable, Iterable, Mapping, MutableMapping
 from re import Match
 from threading import Timer
-from typing import IO, TYPE_CHECKING, Optional, TextIO, Union, cast
+from typing import IO, TYPE_CHECKING, TextIO, Union, cast
 
 import psutil
-from prov.model import PROV
 from schema_salad.sourceline import SourceLine
 from schema_salad.utils import json_dump, json_dumps
 
-from . import env_to_stdout, run_job
+from . import env_to_stdout, live_metrics, run_job
 from .builder import Builder
 from .context import RuntimeContext
 from .cuda import cuda_check
 from .errors import UnsupportedRequirement, WorkflowException
+from .job_metrics import JobMetrics, record_job_metrics
 from .loghandler import _logger
 from .pathmapper import MapperEnt, PathMapper
 from .process import stage_files
+from .resource_history import input_size_bucket
+from .resource_monitor import (
+    ResourceUsage,
+    container_cgroup,
+    container_pid,
+    process_cgroup,
+    resource_sampler,
+    wait_for_cidfile,
+)
 from .secrets import SecretStore
+from .timing import span
+from .tracing import Span, start_span
 from .utils import (
     CWLObjectType,
     CWLOutputType,
@@ -42,10 +51,12 @@ from .utils import (
     OutputCallbackType,
     bytes2str_in_dicts,
     create_tmp_dir,
+    disk_usage,
     ensure_non_writable,
     ensure_writable,
     processes_to_kill,
 )
+from .volume_plan import plan_volumes
 
 if TYPE_CHECKING:
     from .cwlprov.provenance_profile import (
@@ -150,6 +161,13 @@ class JobBase(HasReqsHints, metaclass=ABCMeta):
         self.timelimit: int | None = None
         self.networkaccess: bool = False
         self.mpi_procs: int | None = None
+        self.resource_usage: ResourceUsage | None = None
+        self.tool_id: str = ""
+        self.step_name: str | None = None
+        self.setup_started: float | None = None
+        self.trace_parent: Span | None = None
+        self.trace_span: Span | None = None
+        self.ended: bool = False
 
     def __repr__(self) -> str:
         """Represent this Job object."""
@@ -164,6 +182,29 @@ class JobBase(HasReqsHints, metaclass=ABCMeta):
         pass
 
     def _setup(self, runtimeContext: RuntimeContext) -> None:
+        self.setup_started = time.monotonic()
+        self.trace_span = start_span(
+            runtimeContext.tracer,
+            "job",
+            self.trace_parent,
+            {
+                "cwl.tool.id": self.tool_id,
+                "cwl.job.name": self.name,
+                "cwl.step": self.step_name,
+                "cwl.cache_hit": False if runtimeContext.cachedir else None,
+            },
+        )
+        metrics = live_metrics.current()
+        staged_bytes = (
+            self._staged_bytes() if self.trace_span is not None or metrics is not None else 0
+        )
+        if metrics is not None:
+            metrics.job_started(staged_bytes)
+        if self.trace_span is not None:
+            self.trace_span.set_attribute("cwl.staged_bytes", staged_bytes)
+            for key, value in self.builder.resources.items():
+                if key != "exitCode" and isinstance(value, (int, float)):
+                    self.trace_span.set_attribute(f"cwl.resources.{key}", value)
         cuda_req, _ = self.builder.get_requirement("http://commonwl.org/cwltool#CUDARequirement")
         if cuda_req:
             count = cuda_check(cuda_req, math.ceil(self.builder.resources["cudaDeviceCount"]))
@@ -272,8 +313,12 @@ class JobBase(HasReqsHints, metaclass=ABCMeta):
                 and runtimeContext.prov_obj is not None
                 and isinstance(job_order, (list, dict))
             ):
-                runtimeContext.prov_obj.used_artefacts(
-                    job_order, runtimeContext.process_run_id, str(self.name)
+                runtimeContext.research_obj.record(
+                    runtimeContext.prov_obj.used_artefacts,
+                    job_order,
+                    runtimeContext.process_run_id,
+                    str(self.name),
+                    datetime.datetime.now(),
                 )
             else:
                 _logger.warning(
@@ -282,6 +327,9 @@ class JobBase(HasReqsHints, metaclass=ABCMeta):
                     "{}".format(runtimeContext)
                 )
         outputs: CWLObjectType = {}
+        started: datetime.datetime | None = None
+        run_time: tuple[float, float] | None = None
+        collection_time: float | None = None
         try:
             stdin_path = None
             if self.stdin is not None:
@@ -319,21 +367,27 @@ class JobBase(HasReqsHints, metaclass=ABCMeta):
             builder: Builder | None = getattr(self, "builder", None)
             if builder is not None:
                 job_script_contents = builder.build_job_script(commands)
-            rcode = _job_popen(
-                commands,
-                stdin_path=stdin_path,
-                stdout_path=stdout_path,
-                stderr_path=stderr_path,
-                env=env,
-                cwd=self.outdir,
-                make_job_dir=lambda: runtimeContext.create_outdir(),
-                job_script_contents=job_script_contents,
-                timelimit=self.timelimit,
-                name=self.name,
-                monitor_function=monitor_function,
-                default_stdout=runtimeContext.default_stdout,
-                default_stderr=runtimeContext.default_stderr,
-            )
+            started = datetime.datetime.now()
+            run_start = time.monotonic()
+            with span("_job_popen", self.step_name):
+                rcode = _job_popen(
+                    commands,
+                    stdin_path=stdin_path,
+                    stdout_path=stdout_path,
+                    stderr_path=stderr_path,
+                    env=env,
+                    cwd=self.outdir,
+                    make_job_dir=lambda: runtimeContext.create_outdir(),
+                    job_script_contents=job_script_contents,
+                    timelimit=self.timelimit,
+                    name=self.name,
+                    monitor_function=monitor_function,
+                    default_stdout=runtimeContext.default_stdout,
+                    default_stderr=runtimeContext.default_stderr,
+                )
+            run_time = (run_start, time.monotonic())
+            if self.trace_span is not None:
+                self.trace_span.set_attribute("process.exit_code", rcode)
 
             if rcode in self.successCodes:
                 processStatus = "success"
@@ -371,8 +425,10 @@ class JobBase(HasReqsHints, metaclass=ABCMeta):
             runtimeContext.log_dir_handler(
                 self.outdir, self.base_path_logs, stdout_path, stderr_path
             )
-            outputs = self.collect_outputs(self.outdir, rcode)
+            with span("collect_output_ports", self.step_name):
+                outputs = self.collect_outputs(self.outdir, rcode)
             outputs = bytes2str_in_dicts(outputs)  # type: ignore
+            collection_time = time.monotonic() - run_time[1]
         except OSError as e:
             if e.errno == 2:
                 if runtime:
@@ -407,11 +463,13 @@ class JobBase(HasReqsHints, metaclass=ABCMeta):
             and runtimeContext.process_run_id is not None
         ):
             # creating entities for the outputs produced by each step (in the provenance document)
-            self.prov_obj.record_process_end(
+            runtimeContext.research_obj.record(
+                self.prov_obj.record_process_end,
                 str(self.name),
                 runtimeContext.process_run_id,
                 outputs,
                 datetime.datetime.now(),
+                self.resource_usage,
             )
         if processStatus != "success":
             _logger.warning("[job %s] completed %s", self.name, processStatus)
@@ -421,6 +479,24 @@ class JobBase(HasReqsHints, metaclass=ABCMeta):
         if _logger.isEnabledFor(logging.DEBUG):
             _logger.debug("[job %s] outputs %s", self.name, json_dumps(outputs, indent=4))
 
+        if runtimeContext.metrics_file:
+            self._record_metrics(
+                runtimeContext.metrics_file, processStatus, started, run_time, collection_time
+            )
+        if (
+            runtimeContext.resource_history is not None
+            and processStatus == "success"
+            and run_time is not None
+            and self.resource_usage is not None
+            and self.resource_usage.peak_memory is not None
+        ):
+            runtimeContext.resource_history.record(
+                self.tool_id,
+                input_size_bucket(self.builder.job),
+                self.resource_usage.peak_memory / 2**20,
+                self.resource_usage.cpu_time / max(run_time[1] - run_time[0], 1e-3),
+            )
+
         if self.generatemapper is not None and runtimeContext.secret_store is not None:
             # Delete any runtime-generated files containing secrets.
             for _, p in self.generatemapper.items():
@@ -438,6 +514,8 @@ class JobBase(HasReqsHints, metaclass=ABCMeta):
         if runtimeContext.workflow_eval_lock is None:
             raise WorkflowException("runtimeContext.workflow_eval_lock must not be None")
 
+        self._record_end(processStatus)
+
         if self.output_callback:
             with runtimeContext.workflow_eval_lock:
                 self.output_callback(outputs, processStatus)
@@ -454,6 +532,64 @@ class JobBase(HasReqsHints, metaclass=ABCMeta):
             _logger.debug("[job %s] Removing temporary directory %s", self.name, self.tmpdir)
             shutil.rmtree(self.tmpdir, True)
 
+    def _record_end(self, processStatus: str) -> None:
+        """End the span of the job and count it as completed, once."""
+        if self.ended:
+            return
+        self.ended = True
+        if self.trace_span is not None:
+            if self.resource_usage is not None:
+                self.trace_span.set_attribute("cwl.peak_memory", self.resource_usage.peak_memory)
+            self.trace_span.end(processStatus)
+        if (metrics := live_metrics.current()) is not None:
+            metrics.job_completed(processStatus)
+
+    def _staged_bytes(self) -> int:
+        """Return the total size of the input files staged, as far as known locally."""
+        total = 0
+        for _, entry in self.pathmapper.items():
+            if entry.type == "File" and entry.staged:
+                try:
+                    total += os.stat(entry.resolved).st_size
+                except OSError:
+                    continue
+        return total
+
+    def _record_metrics(
+        self,
+        path: str,
+        processStatus: str,
+        started: datetime.datetime | None,
+        run_time: tuple[float, float] | None,
+        collection_time: float | None,
+    ) -> None:
+        """Append the time and resources used by this job to a ``--metrics-file``."""
+        metrics: JobMetrics = {
+            "name": self.name,
+            "tool_id": self.tool_id,
+            "status": processStatus,
+            "outdir_bytes": disk_usage(self.outdir),
+            "tmpdir_bytes": disk_usage(self.tmpdir),
+            "resources": {
+                key: value
+                for key, value in self.builder.resources.items()
+                if key != "exitCode" and isinstance(value, (int, float))
+            },
+        }
+        if started is not None and run_time is not None:
+            metrics["started"] = started.isoformat()
+            metrics["wall_time"] = run_time[1] - run_time[0]
+            if self.setup_started is not None:
+                metrics["staging_time"] = run_time[0] - self.setup_started
+        if collection_time is not None:
+            metrics["collection_time"] = collection_time
+        if self.resource_usage is not None and self.resource_usage.peak_memory is not None:
+            metrics["peak_memory"] = self.resource_usage.peak_memory
+            metrics["cpu_time"] = self.resource_usage.cpu_time
+            metrics["read_bytes"] = self.resource_usage.read_bytes
+            metrics["write_bytes"] = self.resource_usage.write_bytes
+        record_job_metrics(path, metrics)
+
     @abstractmethod
     def _required_env(self) -> dict[str, str]:
         """Variables required by the CWL spec (HOME, TMPDIR, etc).
@@ -517,47 +653,32 @@ class JobBase(HasReqsHints, metaclass=ABCMeta):
         # Set on ourselves
         self.environment = env
 
-    def process_monitor(self, sproc: "subprocess.Popen[str]") -> None:
-        """Watch a process, logging its max memory usage."""
-        monitor = psutil.Process(sproc.pid)
-        # Value must be list rather than integer to utilise pass-by-reference in python
-        memory_usage: MutableSequence[int | None] = [None]
-
-        mem_tm: "Optional[Timer]" = None
+    def process_monitor(self, sproc: "subprocess.Popen[str]", interval: float = 1.0) -> None:
+        """Watch a process, recording the resources used by it and its descendants."""
+        sampler = resource_sampler(interval)
+        usage = self.resource_usage = sampler.watch_process(sproc.pid)
+        try:
+            sproc.wait()
+        finally:
+            sampler.unwatch(usage)
+        self._log_resource_usage()
 
-        def get_tree_mem_usage(memory_usage: MutableSequence[int | None]) -> None:
-            nonlocal mem_tm
-            try:
-                with monitor.oneshot():
-                    children = monitor.children()
-                    rss = monitor.memory_info().rss
-                    while len(children):
-                        rss += sum(process.memory_info().rss for process in children)
-                        children = list(
-                            itertools.chain(*(process.children() for process in children))
-                        )
-                    if memory_usage[0] is None or rss > memory_usage[0]:
-                        memory_usage[0] = rss
-                mem_tm = Timer(interval=1, function=get_tree_mem_usage, args=(memory_usage,))
-                mem_tm.daemon = True
-                mem_tm.start()
-            except psutil.NoSuchProcess:
-                if mem_tm is not None:
-                    mem_tm.cancel()
-
-        mem_tm = Timer(interval=1, function=get_tree_mem_usage, args=(memory_usage,))
-        mem_tm.daemon = True
-        mem_tm.start()
-        sproc.wait()
-        mem_tm.cancel()
-        if memory_usage[0] is not None:
+    def _log_resource_usage(self) -> None:
+        usage = self.resource_usage
+        if usage is None or usage.peak_memory is None:
+            _logger.debug("Could not collect memory usage, job ended before monitoring began.")
+            return
+        _logger.info(
+            "[job %s] Max memory used: %iMiB", self.name, round(usage.peak_memory / (2**20))
+        )
+        if usage.cpu_time or usage.read_bytes or usage.write_bytes:
             _logger.info(
-                "[job %s] Max memory used: %iMiB",
+                "[job %s] CPU time: %.1fs, disk read: %iMiB, disk written: %iMiB",
                 self.name,
-                round(memory_usage[0] / (2**20)),
+                usage.cpu_time,
+                round(usage.read_bytes / (2**20)),
+                round(usage.write_bytes / (2**20)),
             )
-        else:
-            _logger.debug("Could not collect memory usage, job ended before monitoring began.")
 
 
 class CommandLineJob(JobBase):
@@ -574,29 +695,36 @@ class CommandLineJob(JobBase):
             if not os.path.exists(self.tmpdir):
                 os.makedirs(self.tmpdir)
 
-        self._setup(runtimeContext)
+        try:
+            self._setup(runtimeContext)
+
+            with span("stage_files", self.step_name):
+                stage_files(
+                    self.pathmapper,
+                    ignore_writable=True,
+                    symlink=True,
+                    secret_store=runtimeContext.secret_store,
+                )
+                if self.generatemapper is not None:
+                    stage_files(
+                        self.generatemapper,
+                        ignore_writable=self.inplace_update,
+                        symlink=True,
+                        secret_store=runtimeContext.secret_store,
+                    )
+                    relink_initialworkdir(
+                        self.generatemapper,
+                        self.outdir,
+                        self.builder.outdir,
+                        inplace_update=self.inplace_update,
+                    )
+        except BaseException:
+            self._record_end("permanentFail")
+            raise
 
-        stage_files(
-            self.pathmapper,
-            ignore_writable=True,
-            symlink=True,
-            secret_store=runtimeContext.secret_store,
+        monitor_function = functools.partial(
+            self.process_monitor, interval=runtimeContext.monitor_interval
         )
-        if self.generatemapper is not None:
-            stage_files(
-                self.generatemapper,
-                ignore_writable=self.inplace_update,
-                symlink=True,
-                secret_store=runtimeContext.secret_store,
-            )
-            relink_initialworkdir(
-                self.generatemapper,
-                self.outdir,
-                self.builder.outdir,
-                inplace_update=self.inplace_update,
-            )
-
-        monitor_function = functools.partial(self.process_monitor)
 
         self._execute([], self.environment, runtimeContext, monitor_function)
 
@@ -725,7 +853,27 @@ class ContainerCommandLineJob(JobBase, metaclass=ABCMeta):
     ) -> None:
         """Append volume mappings to the runtime option list."""
         container_outdir = self.builder.outdir
+        planned: set[str] = set()
+        plan = plan_volumes(pathmapper, self.builder.stagedir)
+        if plan is not None:
+            planned = plan.targets
+            link_tree = plan.create_link_tree(
+                tmpdir_prefix,
+                [vol for vol in pathmapper if vol.staged and vol.target not in planned],
+            )
+            if link_tree is not None:
+                self.append_volume(runtime, link_tree, self.builder.stagedir)
+            for source, target in plan.directories:
+                self.append_volume(runtime, source, target)
+            _logger.info(
+                "[job %s] Staging %d inputs with %d bind mounts instead of one each",
+                self.name,
+                len(planned),
+                plan.mounts,
+            )
         for key, vol in (itm for itm in pathmapper.items() if itm[1].staged):
+            if vol.target in planned:
+                continue
             host_outdir_tgt: str | None = None
             if vol.target.startswith(container_outdir + "/"):
                 host_outdir_tgt = os.path.join(self.outdir, vol.target[len(container_outdir) + 1 :])
@@ -782,15 +930,16 @@ class ContainerCommandLineJob(JobBase, metaclass=ABCMeta):
         else:
             try:
                 if docker_req is not None and runtimeContext.use_container:
-                    img_id = str(
-                        self.get_from_requirements(
-                            docker_req,
-                            runtimeContext.pull_image,
-                            runtimeContext.force_docker_pull,
-                            runtimeContext.tmp_outdir_prefix,
-                            runtimeContext.image_base_path,
+                    with span("get_from_requirements", self.step_name):
+                        img_id = str(
+                            self.get_from_requirements(
+                                docker_req,
+                                runtimeContext.pull_image,
+                                runtimeContext.force_docker_pull,
+                                runtimeContext.tmp_outdir_prefix,
+                                runtimeContext.image_base_path,
+                            )
                         )
-                    )
                 if img_id is None:
                     if self.builder.find_default_container:
                         default_container = self.builder.find_default_container()
@@ -805,21 +954,8 @@ class ContainerCommandLineJob(JobBase, metaclass=ABCMeta):
                     and img_id is not None
                     and runtimeContext.process_run_id is not None
                 ):
-                    container_agent = self.prov_obj.document.agent(
-                        uuid.uuid4().urn,
-                        {
-                            "prov:type": PROV["SoftwareAgent"],
-                            "cwlprov:image": img_id,
-                            "prov:label": "Container execution of image %s" % img_id,
-                        },
-                    )
-                    # FIXME: img_id is not a sha256 id, it might just be "debian:8"
-                    # img_entity = document.entity("nih:sha-256;%s" % img_id,
-                    #                  {"prov:label": "Container image %s" % img_id} )
-                    # The image is the plan for this activity-agent association
-                    # document.wasAssociatedWith(process_run_ID, container_agent, img_entity)
-                    self.prov_obj.document.wasAssociatedWith(
-                        runtimeContext.process_run_id, container_agent
+                    self.prov_obj.research_object.record(
+                        self.prov_obj.record_container, runtimeContext.process_run_id, img_id
                     )
             except Exception as err:
                 container = "Singularity" if runtimeContext.singularity else "Docker"
@@ -836,25 +972,42 @@ class ContainerCommandLineJob(JobBase, metaclass=ABCMeta):
                         "--user-space-docker-cmd.: {1}".format(container, err)
                     ) from err
 
-        self._setup(runtimeContext)
-
-        # Copy as don't want to modify our env
-        env = dict(os.environ)
-        runtime, cidfile = self.create_runtime(env, runtimeContext)
-
-        runtime.append(str(img_id))
-        monitor_function = None
-        if cidfile:
-            monitor_function = functools.partial(
-                self.docker_monitor,
-                cidfile,
-                runtimeContext.tmpdir_prefix,
-                not bool(runtimeContext.cidfile_dir),
-                "podman" if runtimeContext.podman else "docker",
-            )
-        elif runtimeContext.user_space_docker_cmd:
-            monitor_function = functools.partial(self.process_monitor)
-        self._execute(runtime, env, runtimeContext, monitor_function)
+        try:
+            self._setup(runtimeContext)
+
+            # Copy as don't want to modify our env
+            env = dict(os.environ)
+            with span("create_runtime", self.step_name):
+                runtime, cidfile = self.create_runtime(env, runtimeContext)
+
+            runtime.append(str(img_id))
+            if runtimeContext.reuse_containers and cidfile:
+                # only Docker and Podman jobs have a container ID file
+                from .container_pool import plan_warm_job, warm_container
+
+                warm_job = plan_warm_job(runtime)
+                if warm_job is not None:
+                    with warm_container(warm_job) as exec_runtime:
+                        self._execute(exec_runtime, env, runtimeContext, None)
+                    return
+            monitor_function = None
+            if cidfile:
+                monitor_function = functools.partial(
+                    self.docker_monitor,
+                    cidfile,
+                    runtimeContext.tmpdir_prefix,
+                    not bool(runtimeContext.cidfile_dir),
+                    "podman" if runtimeContext.podman else "docker",
+                    interval=runtimeContext.monitor_interval,
+                )
+            elif runtimeContext.user_space_docker_cmd:
+                monitor_function = functools.partial(
+                    self.process_monitor, interval=runtimeContext.monitor_interval
+                )
+            self._execute(runtime, env, runtimeContext, monitor_function)
+        except BaseException:
+            self._record_end("permanentFail")
+            raise
 
     def docker_monitor(
         self,
@@ -863,32 +1016,59 @@ class ContainerCommandLineJob(JobBase, metaclass=ABCMeta):
         cleanup_cidfile: bool,
         docker_exe: str,
         process: "subprocess.Popen[str]",
+        interval: float = 1.0,
     ) -> None:
-        """Record memory usage of the running Docker container."""
-        # Todo: consider switching to `docker create` / `docker start`
-        # instead of `docker run` as `docker create` outputs the container ID
-        # to stdout, but the container is frozen, thus allowing us to start the
-        # monitoring process without dealing with the cidfile or too-fast
-        # container execution
-        cid: str | None = None
-        while cid is None:
-            time.sleep(1)
-            # This is needed to avoid a race condition where the job
-            # was so fast that it already finished when it arrives here
-            if process.returncode is None:
-                process.poll()
-            if process.returncode is not None:
-                if cleanup_cidfile:
-                    try:
-                        os.remove(cidfile)
-                    except OSError as exc:
-                        _logger.warning("Ignored error cleaning up %s cidfile: %s", docker_exe, exc)
+        """
+        Record the resource usage of the running software container.
+
+        Memory, CPU, and I/O are read from the container's cgroup every
+        ``interval`` seconds. When the cgroup can't be found (e.g. on hosts
+        without cgroup v2) only the memory use reported by ``docker stats``
+        is recorded.
+        """
+        try:
+            cid = wait_for_cidfile(cidfile, process)
+            if cid is None:
+                _logger.debug("Could not collect memory usage, job ended before monitoring began.")
                 return
-            try:
-                with open(cidfile) as cidhandle:
-                    cid = cidhandle.readline().strip()
-            except OSError:
-                cid = None
+            cgroup = container_cgroup(cid)
+            if cgroup is None:
+                pid = container_pid(docker_exe, cid)
+                cgroup = process_cgroup(pid) if pid is not None else None
+            if cgroup is None:
+                _logger.debug(
+                    "Could not find the cgroup of %s container %s, falling back to %s stats",
+                    docker_exe,
+                    cid,
+                    docker_exe,
+                )
+                self.resource_usage = ResourceUsage()
+                self._docker_stats_monitor(cid, docker_exe, process, self.resource_usage)
+            else:
+                sampler = resource_sampler(interval)
+                self.resource_usage = sampler.watch_cgroup(cgroup)
+                try:
+                    process.wait()
+                finally:
+                    sampler.unwatch(self.resource_usage)
+            self._log_resource_usage()
+        finally:
+            if cleanup_cidfile:
+                try:
+                    os.remove(cidfile)
+                except FileNotFoundError:
+                    pass
+                except OSError as exc:
+                    _logger.warning("Ignored error cleaning up %s cidfile: %s", docker_exe, exc)
+
+    def _docker_stats_monitor(
+        self,
+        cid: str,
+        docker_exe: str,
+        process: "subprocess.Popen[str]",
+        usage: ResourceUsage,
+    ) -> None:
+        """Record the peak memory use of a container, as a percentage reported by ``docker stats``."""
         max_mem = psutil.virtual_memory().total
         try:
             cmds = [docker_exe, "stats"]
@@ -909,25 +1089,17 @@ class ContainerCommandLineJob(JobBase, metaclass=ABCMeta):
                 stats_result, _ = stats_proc.communicate()
         except OSError as exc:
             _logger.warning("Ignored error with %s stats: %s", docker_exe, exc)
+            process.wait()
             return
-        max_mem_percent: float = 0.0
-        mem_percent: float = 0.0
-        for line in stats_result:
+        for line in stats_result.splitlines():
             if not line:
                 continue
             try:
                 mem_percent = float(re.sub(CONTROL_CODE_RE, "", line).replace("%", ""))
-                if mem_percent > max_mem_percent:
-                    max_mem_percent = mem_percent
             except ValueError as exc:
                 _logger.debug("%s stats parsing error in line %s: %s", docker_exe, line, exc)
-        _logger.info(
-            "[job %s] Max memory used: %iMiB",
-            self.name,
-            int((max_mem_percent / 100 * max_mem) / (2**20)),
-        )
-        if cleanup_cidfile and os.path.exists(cidfile):
-            os.remove(cidfile)
+                continue
+            usage.add(int(mem_percent / 100 * max_mem))
 
 
 def _job_popen(
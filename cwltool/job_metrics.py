@@ -0,0 +1,153 @@
+"""Record the resources used by each job and compare them with what was requested."""
+
+import json
+import math
+import threading
+from collections.abc import Iterable, Iterator
+from typing import TypedDict, cast
+
+from .loghandler import _logger
+
+RAM_HEADROOM = 1.2
+"""Suggested ``ramMin`` is the highest peak memory use seen times this factor."""
+
+
+class JobMetrics(TypedDict, total=False):
+    """The measurements of a single job, one line of a ``--metrics-file``."""
+
+    name: str
+    tool_id: str
+    status: str
+    started: str
+    """When the tool was started, in ISO 8601 format."""
+    wall_time: float
+    """Seconds the tool ran for, excluding staging and output collection."""
+    cpu_time: float
+    """CPU seconds used by the tool and all its descendants."""
+    peak_memory: int
+    """Highest memory (RSS) use, in bytes."""
+    read_bytes: int
+    write_bytes: int
+    outdir_bytes: int
+    """Size of the output directory once the job finished."""
+    tmpdir_bytes: int
+    """Size of the temporary directory once the job finished."""
+    staging_time: float
+    """Seconds spent setting up the job and staging its inputs."""
+    collection_time: float
+    """Seconds spent collecting the outputs."""
+    resources: dict[str, float]
+    """The resources allocated to the job: ``cores``, ``ram`` (MiB), ``outdirSize``, …"""
+
+
+_WRITE_LOCK = threading.Lock()
+
+
+def record_job_metrics(path: str, metrics: JobMetrics) -> None:
+    """Append the metrics of a job to a JSON lines file."""
+    line = json.dumps(metrics, sort_keys=True) + "\n"
+    try:
+        with _WRITE_LOCK, open(path, "a", encoding="utf-8") as handle:
+            handle.write(line)
+    except OSError as err:
+        _logger.warning("Could not write job metrics to %s: %s", path, err)
+
+
+def load_job_metrics(path: str) -> Iterator[JobMetrics]:
+    """Read the job metrics previously written to ``path``, skipping invalid lines."""
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                metrics = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(metrics, dict):
+                yield cast(JobMetrics, metrics)
+
+
+class ToolUsage:
+    """The resource usage of all successful jobs of one tool, against their allocation."""
+
+    def __init__(self, tool_id: str) -> None:
+        """Start with no jobs."""
+        self.tool_id = tool_id
+        self.jobs = 0
+        self.failed = 0
+        self.ram = 0.0
+        """Largest allocated RAM, in MiB."""
+        self.cores = 0.0
+        """Largest allocated number of cores."""
+        self.peak_memory = 0
+        """Highest memory use, in bytes."""
+        self.cores_used = 0.0
+        """Highest average number of cores busy over the run time of a job."""
+
+    def add(self, metrics: JobMetrics) -> None:
+        """Include a job."""
+        if metrics.get("status", "success") != "success":
+            self.failed += 1
+            return
+        self.jobs += 1
+        resources = metrics.get("resources", {})
+        self.ram = max(self.ram, resources.get("ram", 0))
+        self.cores = max(self.cores, resources.get("cores", 0))
+        self.peak_memory = max(self.peak_memory, metrics.get("peak_memory", 0))
+        wall_time = metrics.get("wall_time", 0)
+        if wall_time > 0:
+            self.cores_used = max(self.cores_used, metrics.get("cpu_time", 0) / wall_time)
+
+    @property
+    def suggested_ram(self) -> int:
+        """A ``ramMin`` in MiB that covers every job seen, with some headroom."""
+        return math.ceil(self.peak_memory / 2**20 * RAM_HEADROOM)
+
+    @property
+    def suggested_cores(self) -> int:
+        """A ``coresMin`` that covers the average use of every job seen."""
+        return max(1, math.ceil(self.cores_used))
+
+
+def summarize_job_metrics(records: Iterable[JobMetrics]) -> list[ToolUsage]:
+    """Group job metrics by tool, sorted by tool ID."""
+    tools: dict[str, ToolUsage] = {}
+    for metrics in records:
+        tool_id = metrics.get("tool_id", "")
+        if tool_id not in tools:
+            tools[tool_id] = ToolUsage(tool_id)
+        tools[tool_id].add(metrics)
+    return [tools[tool_id] for tool_id in sorted(tools)]
+
+
+def format_resource_report(tools: Iterable[ToolUsage]) -> str:
+    """
+    Tabulate measured against allocated resources, per tool.
+
+    Tools with a suggested ``ramMin`` or ``coresMin`` below their allocation
+    can be given a smaller ``ResourceRequirement``.
+    """
+    header = ("tool", "jobs", "ram MiB", "peak MiB", "ramMin?", "cores", "used", "coresMin?")
+    rows = [header]
+    for tool in tools:
+        if not tool.jobs:
+            rows.append((tool.tool_id, f"0 ({tool.failed} failed)", "", "", "", "", "", ""))
+            continue
+        rows.append(
+            (
+                tool.tool_id,
+                str(tool.jobs) + (f" ({tool.failed} failed)" if tool.failed else ""),
+                f"{tool.ram:g}",
+                f"{tool.peak_memory / 2**20:.0f}",
+                str(tool.suggested_ram),
+                f"{tool.cores:g}",
+                f"{tool.cores_used:.2f}",
+                str(tool.suggested_cores),
+            )
+        )
+    widths = [max(len(row[column]) for row in rows) for column in range(len(header))]
+    return "\n".join(
+        "  ".join(
+            cell.ljust(width) if column == 0 else cell.rjust(width)
+            for column, (cell, width) in enumerate(zip(row, widths))
+        ).rstrip()
+        for row in rows
+    )
@@ -0,0 +1,300 @@
+"""
+Expose live metrics of the runs in progress, in the Prometheus text format.
+
+Metrics are off unless enabled, by ``--metrics-port`` or ``--metrics-textfile``,
+or by calling :py:func:`enable`. They are then counted for the whole process,
+as the jobs start and finish, and served on ``http://127.0.0.1:PORT/metrics``
+or written periodically to a file for the textfile collector of the node
+exporter.
+
+The resources allocated by a :py:class:`~cwltool.executors.MultithreadedJobExecutor`,
+and its pending jobs, are read from the executor being watched when the
+metrics are collected.
+"""
+
+import contextlib
+import math
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+from cwl_utils.expression import needs_parsing
+
+from .loghandler import _logger
+
+if TYPE_CHECKING:
+    from .executors import JobExecutor
+
+TEXTFILE_INTERVAL = 10.0
+"""Seconds between two writes of the ``--metrics-textfile``."""
+
+EVALUATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+"""Upper bounds, in seconds, of the histogram of expression evaluation times."""
+
+
+class LiveMetrics:
+    """The counters of this process, and the executor to read gauges from."""
+
+    def __init__(self) -> None:
+        """Start with nothing counted."""
+        self.executor: JobExecutor | None = None
+        self.jobs_started = 0
+        self.jobs_completed: dict[str, int] = {}
+        """By final status."""
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.staged_bytes = 0
+        self.evaluations = [0] * (len(EVALUATION_BUCKETS) + 1)
+        """Number of expressions evaluated, by histogram bucket, the last one unbounded."""
+        self.evaluation_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def job_started(self, staged_bytes: int) -> None:
+        """Count a job starting, with the size of its staged inputs."""
+        with self._lock:
+            self.jobs_started += 1
+            self.staged_bytes += staged_bytes
+
+    def job_completed(self, status: str) -> None:
+        """Count a job completed, successfully or not."""
+        with self._lock:
+            self.jobs_completed[status] = self.jobs_completed.get(status, 0) + 1
+
+    def cache_lookup(self, hit: bool) -> None:
+        """Count a job looked up in the ``--cachedir``."""
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    def evaluated(self, seconds: float) -> None:
+        """Count an expression evaluated."""
+        bucket = 0
+        while bucket < len(EVALUATION_BUCKETS) and seconds > EVALUATION_BUCKETS[bucket]:
+            bucket += 1
+        with self._lock:
+            self.evaluations[bucket] += 1
+            self.evaluation_seconds += seconds
+
+    def render(self) -> str:
+        """Collect the metrics, in the Prometheus text exposition format."""
+        lines: list[str] = []
+
+        def metric(name: str, kind: str, help_text: str, samples: list[tuple[str, float]]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, value in samples:
+                lines.append(f"{name}{suffix} {_format_value(value)}")
+
+        with self._lock:
+            completed = sorted(self.jobs_completed.items())
+            running = self.jobs_started - sum(self.jobs_completed.values())
+            metric(
+                "cwltool_jobs_running", "gauge", "Jobs started and not completed.", [("", running)]
+            )
+            metric(
+                "cwltool_jobs_completed_total",
+                "counter",
+                "Jobs completed, by final status.",
+                [(_labels(status=status), count) for status, count in completed],
+            )
+            metric(
+                "cwltool_cache_hits_total",
+                "counter",
+                "Jobs whose outputs were found in the cache.",
+                [("", self.cache_hits)],
+            )
+            metric(
+                "cwltool_cache_misses_total",
+                "counter",
+                "Jobs looked up in the cache and run.",
+                [("", self.cache_misses)],
+            )
+            metric(
+                "cwltool_staged_bytes_total",
+                "counter",
+                "Size of the input files staged for the jobs started.",
+                [("", self.staged_bytes)],
+            )
+            cumulative = 0
+            buckets: list[tuple[str, float]] = []
+            for bound, count in zip((*EVALUATION_BUCKETS, math.inf), self.evaluations):
+                cumulative += count
+                buckets.append(("_bucket" + _labels(le=_format_value(bound)), cumulative))
+            metric(
+                "cwltool_expression_evaluation_seconds",
+                "histogram",
+                "Time taken to evaluate parameter references and JavaScript expressions.",
+                buckets + [("_sum", self.evaluation_seconds), ("_count", cumulative)],
+            )
+
+        executor = self.executor
+        pending = getattr(executor, "pending_jobs", None)
+        if pending is not None:
+            metric(
+                "cwltool_jobs_pending",
+                "gauge",
+                "Jobs waiting for resources to be allocated.",
+                [("", len(pending))],
+            )
+        for resource, unit in (("cores", ""), ("ram", "_mebibytes"), ("cuda", "_devices")):
+            allocated = getattr(executor, f"allocated_{resource}", None)
+            available = getattr(executor, f"max_{resource}", None)
+            if allocated is None or available is None:
+                continue
+            metric(
+                f"cwltool_allocated_{resource}{unit}",
+                "gauge",
+                f"The {resource} allocated to the jobs running.",
+                [("", allocated)],
+            )
+            metric(
+                f"cwltool_max_{resource}{unit}",
+                "gauge",
+                f"The {resource} that can be allocated to jobs.",
+                [("", available)],
+            )
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels: str) -> str:
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels.items()
+    )
+    return "{" + ",".join('%s="%s"' % label for label in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+_metrics: LiveMetrics | None = None
+_DISABLED: contextlib.nullcontext[None] = contextlib.nullcontext()
+
+
+def enable() -> LiveMetrics:
+    """Start counting, for the whole process."""
+    global _metrics
+    if _metrics is None:
+        _metrics = LiveMetrics()
+    return _metrics
+
+
+def disable() -> None:
+    """Stop counting."""
+    global _metrics
+    _metrics = None
+
+
+def current() -> LiveMetrics | None:
+    """The metrics being counted, if enabled."""
+    return _metrics
+
+
+class _EvaluationTimer:
+    def __init__(self, metrics: LiveMetrics) -> None:
+        self.metrics = metrics
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.metrics.evaluated(time.perf_counter() - self.start)
+
+
+def evaluation(ex: Any) -> contextlib.AbstractContextManager[None]:
+    """Time the evaluation of ``ex``, if counting and it is an expression."""
+    metrics = _metrics
+    if metrics is None or not needs_parsing(ex):
+        return _DISABLED
+    return _EvaluationTimer(metrics)
+
+
+def _do_get(handler: Any) -> None:
+    """Answer a request to the metrics server."""
+    metrics = _metrics
+    if handler.path.split("?")[0] != "/metrics" or metrics is None:
+        handler.send_error(404)
+        return
+    body = metrics.render().encode("utf-8")
+    handler.send_response(200)
+    handler.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def _log_message(handler: Any, format: str, *args: Any) -> None:
+    _logger.debug("[metrics] %s", format % args)
+
+
+class MetricsServer:
+    """Serve the metrics on ``http://127.0.0.1:port/metrics``, from a background thread."""
+
+    def __init__(self, port: int) -> None:
+        """Start serving."""
+        # only imported when serving metrics, as it is slow to import
+        import http.server
+
+        handler = type(
+            "MetricsHandler",
+            (http.server.BaseHTTPRequestHandler,),
+            {"do_GET": _do_get, "log_message": _log_message},
+        )
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="cwltool-metrics", daemon=True
+        )
+        self.thread.start()
+        _logger.info(
+            "[metrics] Serving metrics on http://127.0.0.1:%d/metrics", self.server.server_port
+        )
+
+    def close(self) -> None:
+        """Stop serving."""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class MetricsTextfile:
+    """Rewrite the metrics to ``path`` periodically, from a background thread."""
+
+    def __init__(self, path: str, interval: float = TEXTFILE_INTERVAL) -> None:
+        """Start writing."""
+        self.path = os.path.abspath(path)
+        self.interval = interval
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="cwltool-metrics", daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self) -> None:
+        """Write the metrics, replacing the file at once so it is never read half written."""
+        metrics = _metrics
+        if metrics is None:
+            return
+        partial = f"{self.path}.{os.getpid()}.partial"
+        try:
+            with open(partial, "w", encoding="utf-8") as handle:
+                handle.write(metrics.render())
+            os.replace(partial, self.path)
+        except OSError as err:
+            _logger.warning("[metrics] Could not write metrics to %s: %s", self.path, err)
+
+    def close(self) -> None:
+        """Stop, writing the final metrics."""
+        self._stop.set()
+        self.thread.join()
+        self.write()
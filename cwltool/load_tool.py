@@ -8,6 +8,7 @@ import re
 import urllib
 import uuid
 from collections.abc import MutableMapping, MutableSequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from functools import partial
 from typing import Any, Union, cast
 
@@ -31,6 +32,7 @@ from .context import LoadingContext
 from .errors import GraphTargetMissingException
 from .loghandler import _logger
 from .process import Process, get_schema, shortname
+from .timing import span
 from .update import ALLUPDATES
 from .utils import CWLObjectType, ResolverType, visit_class
 
@@ -141,6 +143,75 @@ def fetch_document(
     raise ValidationException("Must be URI or object: '%s'" % argsworkflow)
 
 
+def _find_run_references(
+    document: Any,
+    base_url: str,
+    fetcher: Fetcher,
+    references: set[str],
+) -> None:
+    """Collect the document URIs of all ``run`` fields which are references."""
+    match document:
+        case MutableSequence():
+            for entry in document:
+                _find_run_references(entry, base_url, fetcher, references)
+        case MutableMapping():
+            if isinstance(run := document.get("run"), str):
+                references.add(urllib.parse.urldefrag(fetcher.urljoin(base_url, run))[0])
+            for value in document.values():
+                _find_run_references(value, base_url, fetcher, references)
+
+
+def prefetch_run_documents(
+    loader: Loader,
+    workflowobj: CommentedMap | CommentedSeq,
+    fileuri: str,
+    max_workers: int,
+) -> None:
+    """
+    Fetch and parse the documents referenced by ``run`` fields concurrently.
+
+    The documents are stored in the index of the loader, exactly as
+    :py:meth:`Loader.fetch` would do when the workflow steps are constructed,
+    so that construction doesn't wait on I/O one document at a time.
+    References in the fetched documents are followed as they arrive.
+    Documents already in the index are not descended into.
+
+    Errors are only logged; the same error will be reported with
+    more context when the step referencing the document is loaded.
+    """
+    references: set[str] = set()
+    _find_run_references(workflowobj, fileuri, loader.fetcher, references)
+    seen = {fileuri}
+    supported_schemes = loader.fetcher.supported_schemes()
+
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="cwltool-prefetch"
+    ) as executor:
+        pending: dict[Future[IdxResultType], str] = {}
+
+        def submit(urls: set[str]) -> None:
+            for url in sorted(urls - seen):
+                seen.add(url)
+                if url in loader.idx or urllib.parse.urlsplit(url).scheme not in supported_schemes:
+                    continue
+                future = executor.submit(loader.fetch, url, content_types=CWL_CONTENT_TYPES)
+                pending[future] = url
+
+        submit(references)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = pending.pop(future)
+                try:
+                    document = future.result()
+                except Exception as err:  # pylint: disable=broad-except
+                    _logger.debug("Unable to prefetch %s: %s", url, err)
+                    continue
+                references = set()
+                _find_run_references(document, url, loader.fetcher, references)
+                submit(references)
+
+
 def _convert_stdstreams_to_files(
     workflowobj: CWLObjectType | MutableSequence[CWLObjectType | str | int] | str,
 ) -> None:
@@ -470,6 +541,15 @@ def resolve_and_validate_document(
 
     loadingContext.loader = document_loader
 
+    if (
+        loadingContext.prefetch_workers > 1
+        and loadingContext.doc_cache
+        and not loadingContext.skip_resolve_all
+    ):
+        prefetch_run_documents(
+            document_loader, workflowobj, fileuri, loadingContext.prefetch_workers
+        )
+
     if cwlVersion == "v1.0":
         _add_blank_ids(workflowobj)
 
@@ -603,15 +683,16 @@ def load_tool(
     argsworkflow: str | CWLObjectType,
     loadingContext: LoadingContext | None = None,
 ) -> Process:
-    loadingContext, workflowobj, uri = fetch_document(argsworkflow, loadingContext)
+    with span("load_tool"):
+        loadingContext, workflowobj, uri = fetch_document(argsworkflow, loadingContext)
 
-    loadingContext, uri = resolve_and_validate_document(
-        loadingContext,
-        workflowobj,
-        uri,
-    )
+        loadingContext, uri = resolve_and_validate_document(
+            loadingContext,
+            workflowobj,
+            uri,
+        )
 
-    return make_tool(uri, loadingContext)
+        return make_tool(uri, loadingContext)
 
 
 def resolve_overrides(
@@ -17,7 +17,7 @@ import warnings
 from codecs import getwriter
 from collections.abc import Callable, Mapping, MutableMapping, MutableSequence, Sized
 from importlib.resources import files
-from typing import IO, Any, Union, cast
+from typing import IO, TYPE_CHECKING, Any, Union, cast
 
 import argcomplete
 import coloredlogs
@@ -37,18 +37,9 @@ from schema_salad.utils import (
     yaml_no_ts,
 )
 
-from . import CWL_CONTENT_TYPES, workflow
+from . import CWL_CONTENT_TYPES, live_metrics, timing, workflow
 from .argparser import arg_parser, generate_parser, get_default_args
 from .context import LoadingContext, RuntimeContext, getdefault
-from .cwlprov.ro import ResearchObject  # , WritableBagFile
-from .cwlprov.writablebagfile import (  # change this later
-    WritableBagFile,
-    close_ro,
-    create_job,
-    open_log_file_for_activity,
-    packed_workflow,
-)
-from .cwlrdf import printdot, printrdf
 from .errors import (
     ArgumentException,
     GraphTargetMissingException,
@@ -70,7 +61,6 @@ from .load_tool import (
 from .loghandler import _logger, configure_logging, defaultStreamHandler
 from .mpi import MpiConfig
 from .mutation import MutationManager
-from .pack import pack
 from .process import (
     CWL_IANA,
     Process,
@@ -85,7 +75,6 @@ from .procgenerator import ProcessGenerator
 from .resolver import ga4gh_tool_registries, tool_resolver
 from .secrets import SecretStore
 from .stdfsaccess import StdFsAccess
-from .subgraph import get_process, get_step, get_subgraph
 from .update import ALLUPDATES, UPDATES
 from .utils import (
     DEFAULT_TMP_PREFIX,
@@ -101,6 +90,13 @@ from .utils import (
 )
 from .workflow import Workflow
 
+if TYPE_CHECKING:
+    # Provenance (prov, bagit), graph printing (rdflib serializers, pydot),
+    # packing and subgraph extraction are only imported when the
+    # corresponding command line options are used, to keep startup fast.
+    from .cwlprov.writablebagfile import WritableBagFile
+    from .tracing import Tracer
+
 docker_exe: str
 
 
@@ -617,6 +613,8 @@ def print_pack(
     uri: str,
 ) -> str:
     """Return a CWL serialization of the CWL document in JSON."""
+    from .pack import pack
+
     packed = pack(loadingContext, uri)
     if len(cast(Sized, packed["$graph"])) > 1:
         target = packed
@@ -677,7 +675,7 @@ class ProvLogFormatter(logging.Formatter):
         return with_msecs
 
 
-ProvOut = Union[io.TextIOWrapper, WritableBagFile]
+ProvOut = Union[io.TextIOWrapper, "WritableBagFile"]
 
 
 def setup_provenance(
@@ -688,12 +686,27 @@ def setup_provenance(
     if not args.compute_checksum:
         _logger.error("--provenance incompatible with --no-compute-checksum")
         raise ArgumentException()
-    ro = ResearchObject(
-        getdefault(runtimeContext.make_fs_access, StdFsAccess)(""),
-        temp_prefix_ro=args.tmpdir_prefix,
-        orcid=args.orcid,
-        full_name=args.cwl_full_name,
-    )
+    from .cwlprov.archive import archive_format
+    from .cwlprov.ro import ResearchObject
+    from .cwlprov.writablebagfile import open_log_file_for_activity
+
+    try:
+        ro = ResearchObject(
+            getdefault(runtimeContext.make_fs_access, StdFsAccess)(""),
+            temp_prefix_ro=args.tmpdir_prefix,
+            orcid=args.orcid,
+            full_name=args.cwl_full_name,
+            data_mode=args.provenance_data,
+            temporary_prefixes=(
+                os.path.abspath(args.tmpdir_prefix),
+                os.path.abspath(args.tmp_outdir_prefix),
+            ),
+            workers=args.provenance_workers,
+            archive=args.provenance if archive_format(args.provenance) else None,
+        )
+    except WorkflowException as err:
+        _logger.error(str(err))
+        raise ArgumentException() from err
     runtimeContext.research_obj = ro
     log_file_io = open_log_file_for_activity(ro, ro.engine_uuid)
     prov_log_handler = logging.StreamHandler(log_file_io)
@@ -786,6 +799,8 @@ def choose_target(
     loading_context: LoadingContext,
 ) -> Process | None:
     """Walk the Workflow, extract the subset matches all the args.targets."""
+    from .subgraph import get_subgraph
+
     if loading_context.loader is None:
         raise Exception("loading_context.loader cannot be None")
 
@@ -822,6 +837,8 @@ def choose_step(
     loading_context: LoadingContext,
 ) -> Process | None:
     """Walk the given Workflow and extract just args.single_step."""
+    from .subgraph import get_step
+
     if loading_context.loader is None:
         raise Exception("loading_context.loader cannot be None")
 
@@ -854,6 +871,8 @@ def choose_process(
     loadingContext: LoadingContext,
 ) -> Process | None:
     """Walk the given Workflow and extract just args.single_process."""
+    from .subgraph import get_process
+
     if loadingContext.loader is None:
         raise Exception("loadingContext.loader cannot be None")
 
@@ -972,6 +991,9 @@ def main(
     _logger.removeHandler(defaultStreamHandler)
     workflowobj = None
     prov_log_handler: logging.StreamHandler[ProvOut] | None = None
+    timings: timing.Timings | None = None
+    tracer: Union["Tracer", None] = None
+    metrics_exporters: list[live_metrics.MetricsServer | live_metrics.MetricsTextfile] = []
     global docker_exe
 
     user_agent = "cwltool"
@@ -1053,9 +1075,17 @@ def main(
         if args.mpi_config_file is not None:
             runtimeContext.mpi_config = MpiConfig.load(args.mpi_config_file)
 
+        if args.timing or args.trace_file:
+            timings = timing.enable(trace=bool(args.trace_file))
+
+        if args.otlp_trace_file:
+            from .tracing import open_tracer
+
+            tracer = runtimeContext.tracer = open_tracer(args.otlp_trace_file)
+
         setup_schema(args, custom_schema_callback)
 
-        prov_log_stream: io.TextIOWrapper | WritableBagFile | None = None
+        prov_log_stream: Union[io.TextIOWrapper, "WritableBagFile", None] = None
         if args.provenance:
             try:
                 prov_log_stream, prov_log_handler = setup_provenance(args, runtimeContext, argsl)
@@ -1091,14 +1121,15 @@ def main(
                     load_overrides(file_uri(os.path.abspath(args.overrides)), tool_file_uri)
                 )
 
-            loadingContext, workflowobj, uri = fetch_document(uri, loadingContext)
+            with timing.span("load_tool"):
+                loadingContext, workflowobj, uri = fetch_document(uri, loadingContext)
 
-            loadingContext, uri = resolve_and_validate_document(
-                loadingContext,
-                workflowobj,
-                uri,
-                preprocess_only=(args.print_pre or args.pack),
-            )
+                loadingContext, uri = resolve_and_validate_document(
+                    loadingContext,
+                    workflowobj,
+                    uri,
+                    preprocess_only=(args.print_pre or args.pack),
+                )
 
             if loadingContext.loader is None:
                 raise Exception("Impossible code path.")
@@ -1113,6 +1144,8 @@ def main(
                 return 0
 
             if args.provenance and runtimeContext.research_obj:
+                from .cwlprov.writablebagfile import packed_workflow
+
                 # Can't really be combined with args.pack at same time
                 packed_workflow(runtimeContext.research_obj, print_pack(loadingContext, uri))
 
@@ -1128,7 +1161,8 @@ def main(
                 return 0
 
             try:
-                tool = make_tool(uri, loadingContext)
+                with timing.span("load_tool"):
+                    tool = make_tool(uri, loadingContext)
             except GraphTargetMissingException as main_missing_exc:
                 if args.validate:
                     logging.warning(
@@ -1151,6 +1185,8 @@ def main(
                 return 0
 
             if args.print_rdf:
+                from .cwlrdf import printrdf
+
                 print(
                     printrdf(
                         tool, loadingContext.loader.ctx, args.rdf_serializer, job_order_object
@@ -1160,6 +1196,8 @@ def main(
                 return 0
 
             if args.print_dot:
+                from .cwlrdf import printdot
+
                 printdot(tool, loadingContext.loader.ctx, stdout)
                 return 0
 
@@ -1246,6 +1284,13 @@ def main(
         runtimeContext.secret_store = getdefault(runtimeContext.secret_store, SecretStore())
         runtimeContext.make_fs_access = getdefault(runtimeContext.make_fs_access, StdFsAccess)
 
+        if args.adaptive_resources:
+            from .resource_history import ResourceHistory, resource_history_path
+
+            runtimeContext.resource_history = ResourceHistory(
+                args.resource_history_path or resource_history_path()
+            )
+
         if not executor:
             if args.parallel:
                 temp_executor = MultithreadedJobExecutor(max_parallel=args.parallel_max)
@@ -1256,6 +1301,17 @@ def main(
         else:
             real_executor = executor
 
+        if args.metrics_port is not None or args.metrics_textfile:
+            live_metrics.enable().executor = real_executor
+            if args.metrics_port is not None:
+                try:
+                    metrics_exporters.append(live_metrics.MetricsServer(args.metrics_port))
+                except OSError as err:
+                    _logger.error("Cannot serve metrics on port %d: %s", args.metrics_port, err)
+                    return 1
+            if args.metrics_textfile:
+                metrics_exporters.append(live_metrics.MetricsTextfile(args.metrics_textfile))
+
         try:
             runtimeContext.basedir = input_basedir
 
@@ -1271,6 +1327,31 @@ def main(
                 tool, job_order_object = tool.result(tfjob_order, tfout, runtimeContext)
                 if not job_order_object:
                     job_order_object = None
+
+            conf_file = getattr(args, "beta_dependency_resolvers_configuration", None)  # str
+            use_conda_dependencies = getattr(args, "beta_conda_dependencies", None)  # str
+
+            if conf_file or use_conda_dependencies:
+                from .software_requirements import DependenciesConfiguration
+
+                runtimeContext.job_script_provider = DependenciesConfiguration(args)
+            else:
+                runtimeContext.find_default_container = functools.partial(
+                    find_default_container,
+                    default_container=runtimeContext.default_container,
+                    use_biocontainers=args.beta_use_biocontainers,
+                    container_image_cache_path=args.beta_dependencies_directory,
+                )
+
+            if args.prefetch_images_only:
+                from .image_prefetch import ImagePrefetcher, image_name
+
+                prefetcher = ImagePrefetcher(tool, runtimeContext, args.prefetch_images_max)
+                if not prefetcher.wait():
+                    return 1
+                print("\n".join(sorted(map(image_name, prefetcher.requirements))), file=stdout)
+                return 0
+
             try:
                 initialized_job_order_object = init_job_order(
                     job_order_object,
@@ -1296,31 +1377,50 @@ def main(
             del args.workflow
             del args.job_order
 
-            conf_file = getattr(args, "beta_dependency_resolvers_configuration", None)  # str
-            use_conda_dependencies = getattr(args, "beta_conda_dependencies", None)  # str
-
-            if conf_file or use_conda_dependencies:
-                from .software_requirements import DependenciesConfiguration
-
-                runtimeContext.job_script_provider = DependenciesConfiguration(args)
-            else:
-                runtimeContext.find_default_container = functools.partial(
-                    find_default_container,
-                    default_container=runtimeContext.default_container,
-                    use_biocontainers=args.beta_use_biocontainers,
-                    container_image_cache_path=args.beta_dependencies_directory,
-                )
             runtimeContext.validate_only = args.validate
             runtimeContext.validate_stdout = stdout
 
-            out, status = real_executor(
-                tool, initialized_job_order_object, runtimeContext, logger=_logger
-            )
+            image_prefetcher = None
+            if args.prefetch_images and not args.validate:
+                from .image_prefetch import ImagePrefetcher
+
+                image_prefetcher = ImagePrefetcher(tool, runtimeContext, args.prefetch_images_max)
+
+            try:
+                out, status = real_executor(
+                    tool, initialized_job_order_object, runtimeContext, logger=_logger
+                )
+            finally:
+                if image_prefetcher is not None:
+                    image_prefetcher.cancel()
             if runtimeContext.validate_only is True:
                 return 0
 
+            if args.metrics_file and os.path.exists(args.metrics_file):
+                from .job_metrics import (
+                    format_resource_report,
+                    load_job_metrics,
+                    summarize_job_metrics,
+                )
+
+                _logger.info(
+                    "Resources used per tool, as recorded in %s:\n%s",
+                    args.metrics_file,
+                    format_resource_report(
+                        summarize_job_metrics(load_job_metrics(args.metrics_file))
+                    ),
+                )
+
+            if timings is not None and args.timing:
+                _logger.info(
+                    "Time spent per step and phase:\n%s",
+                    timing.format_timing_report(timings.summary()),
+                )
+
             if out is not None:
                 if runtimeContext.research_obj is not None:
+                    from .cwlprov.writablebagfile import create_job
+
                     create_job(runtimeContext.research_obj, out, True)
 
                     def remove_at_id(doc: CWLObjectType) -> None:
@@ -1397,6 +1497,20 @@ def main(
             return 1
 
     finally:
+        if timings is not None:
+            timing.disable()
+            if args and args.trace_file:
+                timing.write_chrome_trace(timings, args.trace_file)
+        if tracer is not None:
+            tracer.shutdown()
+        if metrics_exporters:
+            for exporter in metrics_exporters:
+                exporter.close()
+            live_metrics.disable()
+        if runtimeContext and runtimeContext.reuse_containers:
+            from .container_pool import stop_warm_containers
+
+            stop_warm_containers()
         if (
             args
             and runtimeContext
@@ -1426,6 +1540,8 @@ def main(
                 # Why not use prov_log_handler.stream ? That is not part of the
                 # public API for logging.StreamHandler
                 prov_log_handler.close()
+            from .cwlprov.writablebagfile import close_ro
+
             close_ro(research_obj, args.provenance)
         _logger.removeHandler(err_handler)
         _logger.addHandler(defaultStreamHandler)
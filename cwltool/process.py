@@ -1,15 +1,21 @@
 """Classes and methods relevant for all CWL Process types."""
 
 import abc
+import contextlib
 import copy
+import copyreg
 import functools
 import hashlib
+import importlib.metadata
 import json
 import logging
 import math
 import os
+import pickle  # nosec
 import shutil
 import stat
+import sys
+import tempfile
 import textwrap
 import urllib.parse
 import uuid
@@ -36,7 +42,7 @@ from schema_salad.avro.schema import (
     make_avsc_object,
 )
 from schema_salad.exceptions import ValidationException
-from schema_salad.ref_resolver import Loader, file_uri, uri_file_path
+from schema_salad.ref_resolver import Loader, NormDict, file_uri, uri_file_path
 from schema_salad.schema import load_schema, make_avro_schema, make_valid_avro
 from schema_salad.sourceline import SourceLine, strip_dup_lineno
 from schema_salad.utils import convert_to_dict
@@ -50,6 +56,7 @@ from .mpi import MPIRequirementName
 from .pathmapper import MapperEnt, PathMapper
 from .secrets import SecretStore
 from .stdfsaccess import StdFsAccess
+from .timing import span
 from .update import INTERNAL_VERSION, ORDERED_VERSIONS, ORIGINAL_CWLVERSION
 from .utils import (
     CWLObjectType,
@@ -61,10 +68,12 @@ from .utils import (
     adjustDirObjs,
     aslist,
     cmp_like_py2,
+    copy_cwl_object,
     ensure_writable,
     get_listing,
     normalizeFilesDirs,
     random_outdir,
+    user_cache_dir,
     visit_class,
 )
 from .validate_js import validate_js_expressions
@@ -173,9 +182,104 @@ def use_custom_schema(version: str, name: str, text: str) -> None:
         del SCHEMA_CACHE[version]
 
 
+def _restore_normdict(normalize: Callable[[str], str], items: dict[str, Any]) -> NormDict:
+    normdict = NormDict(normalize)
+    # keys were already normalized when the NormDict was pickled
+    dict.update(normdict, items)
+    return normdict
+
+
+def _reduce_normdict(
+    normdict: NormDict,
+) -> tuple[Callable[..., NormDict], tuple[Callable[[str], str], dict[str, Any]]]:
+    return _restore_normdict, (normdict.normalize, dict(normdict))
+
+
+# NormDict sets "normalize" in __init__, which pickle skips when rebuilding dict
+# subclasses, so the index of a Loader would not survive a round trip without this.
+copyreg.pickle(NormDict, _reduce_normdict)
+
+
+def _schema_pickle_path(version: str, cache: dict[str, str | Graph | bool]) -> str | None:
+    """
+    Compute where the compiled schema for these sources is stored.
+
+    The file name is derived from the schema sources (including any custom
+    schema) and the versions of Python and schema-salad, so a change to any
+    of them results in a different file. Returns None if the on-disk schema
+    cache has been disabled with ``CWLTOOL_NO_SCHEMA_CACHE``.
+    """
+    if os.environ.get("CWLTOOL_NO_SCHEMA_CACHE"):
+        return None
+    checksum = hashlib.sha256()
+    checksum.update(sys.version.encode("utf-8"))
+    try:
+        checksum.update(importlib.metadata.version("schema-salad").encode("utf-8"))
+    except importlib.metadata.PackageNotFoundError:
+        return None
+    for key in sorted(cache):
+        value = cache[key]
+        if isinstance(value, str):
+            checksum.update(key.encode("utf-8"))
+            checksum.update(b"\0")
+            checksum.update(value.encode("utf-8"))
+            checksum.update(b"\0")
+    return os.path.join(
+        user_cache_dir(),
+        "schemas",
+        f"{version.replace('/', '_')}-{checksum.hexdigest()}.pickle",
+    )
+
+
+def _load_schema_pickle(
+    path: str,
+) -> tuple[Loader, Names | SchemaParseException, CWLObjectType, Loader] | None:
+    try:
+        with open(path, "rb") as handle:
+            return cast(
+                tuple[Loader, Union[Names, SchemaParseException], CWLObjectType, Loader],
+                pickle.load(handle),  # nosec
+            )
+    except FileNotFoundError:
+        return None
+    except Exception as err:  # pylint: disable=broad-except
+        _logger.debug("Ignoring unusable compiled schema %s: %s", path, err)
+        return None
+
+
+def _store_schema_pickle(
+    path: str,
+    schema: tuple[Loader, Names | SchemaParseException, CWLObjectType, Loader],
+) -> None:
+    cache_dir = os.path.dirname(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # write to a temporary file first so that concurrent cwltool processes
+        # never see a partially written schema
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    except OSError as err:
+        _logger.debug("Unable to store compiled schema %s: %s", path, err)
+        return
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            pickle.dump(schema, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception as err:  # pylint: disable=broad-except
+        _logger.debug("Unable to store compiled schema %s: %s", path, err)
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+
+
 def get_schema(
     version: str,
 ) -> tuple[Loader, Names | SchemaParseException, CWLObjectType, Loader]:
+    """
+    Load the CWL schema for the given version.
+
+    Schemas are kept in :py:data:`SCHEMA_CACHE` for the life of the process
+    and compiled (pickled) forms are kept in the per-user cache directory so
+    that subsequent cwltool processes can skip processing the schema.
+    """
     if version in SCHEMA_CACHE:
         return SCHEMA_CACHE[version]
 
@@ -203,13 +307,19 @@ def get_schema(
 
     if version in custom_schemas:
         cache[custom_schemas[version][0]] = custom_schemas[version][1]
-        SCHEMA_CACHE[version] = load_schema(custom_schemas[version][0], cache=cache)
+        schema_ref = custom_schemas[version][0]
     else:
-        SCHEMA_CACHE[version] = load_schema(
-            "https://w3id.org/cwl/CommonWorkflowLanguage.yml", cache=cache
-        )
+        schema_ref = "https://w3id.org/cwl/CommonWorkflowLanguage.yml"
+
+    pickle_path = _schema_pickle_path(version, cache)
+    schema = _load_schema_pickle(pickle_path) if pickle_path else None
+    if schema is None:
+        schema = load_schema(schema_ref, cache=cache)
+        if pickle_path:
+            _store_schema_pickle(pickle_path, schema)
+    SCHEMA_CACHE[version] = schema
 
-    return SCHEMA_CACHE[version]
+    return schema
 
 
 def shortname(inputid: str) -> str:
@@ -417,7 +527,7 @@ def fill_in_defaults(
             if job.get(fieldname) is not None:
                 pass
             elif job.get(fieldname) is None and "default" in inp:
-                job[fieldname] = copy.deepcopy(inp["default"])
+                job[fieldname] = copy_cwl_object(inp["default"])
             elif job.get(fieldname) is None and "null" in aslist(inp["type"]):
                 job[fieldname] = None
             else:
@@ -731,7 +841,7 @@ class Process(HasReqsHints, metaclass=abc.ABCMeta):
                 % (self.metadata.get("cwlVersion"), INTERNAL_VERSION)
             )
 
-        job = copy.deepcopy(joborder)
+        job = copy_cwl_object(joborder)
 
         make_fs_access = getdefault(runtime_context.make_fs_access, StdFsAccess)
         fs_access = make_fs_access(runtime_context.basedir)
@@ -908,6 +1018,7 @@ hints:
             cwl_version,
             self.container_engine,
         )
+        builder.step_name = runtime_context.name or shortname(self.tool["id"])
 
         bindings.extend(
             builder.bind_input(
@@ -959,8 +1070,10 @@ hints:
         # "bindings" in place (because Builder expects it to be
         # mutated in place, sigh, I'm sorry) with its contents sorted,
         # supporting different versions of Python and ruamel.yaml with
-        # different behaviors/bugs in CommentedSeq.
-        bindings_copy = copy.deepcopy(bindings)
+        # different behaviors/bugs in CommentedSeq.  The binding
+        # mappings themselves are not modified by sorting, so a shallow
+        # copy is enough.
+        bindings_copy = list(bindings)
         del bindings[:]
         bindings.extend(sorted(bindings_copy, key=key))
 
@@ -1030,6 +1143,10 @@ hints:
 
         request_evaluated = cast(dict[str, Union[int, float]], request)
         if runtimeContext.select_resources is not None:
+            if runtimeContext.resource_history is not None:
+                runtimeContext.resource_history.adjust(
+                    self.tool["id"], builder.job, request_evaluated
+                )
             # Call select resources hook
             return runtimeContext.select_resources(request_evaluated, runtimeContext)
 
@@ -1364,17 +1481,18 @@ def scandeps(
 
 def compute_checksums(fs_access: StdFsAccess, fileobj: CWLObjectType) -> None:
     if "checksum" not in fileobj:
-        checksum = hashlib.sha1()  # nosec
-        location = cast(str, fileobj["location"])
-        if "contents" in fileobj:
-            contents = cast(str, fileobj["contents"]).encode("utf-8")
-            checksum.update(contents)
-            fileobj["size"] = len(contents)
-        else:
-            with fs_access.open(location, "rb") as f:
-                contents = f.read(1024 * 1024)
-                while contents != b"":
-                    checksum.update(contents)
+        with span("compute_checksums"):
+            checksum = hashlib.sha1()  # nosec
+            location = cast(str, fileobj["location"])
+            if "contents" in fileobj:
+                contents = cast(str, fileobj["contents"]).encode("utf-8")
+                checksum.update(contents)
+                fileobj["size"] = len(contents)
+            else:
+                with fs_access.open(location, "rb") as f:
                     contents = f.read(1024 * 1024)
-            fileobj["size"] = fs_access.size(location)
-        fileobj["checksum"] = "sha1$%s" % checksum.hexdigest()
+                    while contents != b"":
+                        checksum.update(contents)
+                        contents = f.read(1024 * 1024)
+                fileobj["size"] = fs_access.size(location)
+            fileobj["checksum"] = "sha1$%s" % checksum.hexdigest()
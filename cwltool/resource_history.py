@@ -0,0 +1,149 @@
+"""Predict the resources needed by a job from what earlier jobs of the same tool used."""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+
+from .loghandler import _logger
+from .utils import CWLObjectType, user_cache_dir, visit_class
+
+HISTORY_MARGIN = 1.25
+"""Predictions are the highest usage seen, times this factor."""
+
+HISTORY_LENGTH = 20
+"""How many of the most recent jobs of a tool and input size to base predictions on."""
+
+MIN_OBSERVATIONS = 3
+"""How many jobs of a tool and input size must be seen before making predictions."""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    tool_id TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    ram REAL NOT NULL,
+    cores REAL NOT NULL,
+    recorded REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_tool ON jobs (tool_id, bucket, recorded);
+"""
+
+
+def resource_history_path() -> str:
+    """Return the default location of the resource usage history."""
+    return os.path.join(user_cache_dir(), "resource-history.sqlite")
+
+
+def input_size_bucket(job_order: CWLObjectType) -> int:
+    """
+    Classify a job by the total size of its input files.
+
+    Returns the number of bits needed for the total size in bytes, so that
+    jobs whose inputs differ in size by less than a factor of two usually
+    share a bucket.
+    """
+    total = 0
+
+    def add_size(file: CWLObjectType) -> None:
+        nonlocal total
+        size = file.get("size")
+        if not isinstance(size, int):
+            location = str(file.get("path") or file.get("location", ""))
+            if location.startswith("file://"):
+                location = urllib.parse.unquote(urllib.parse.urlsplit(location).path)
+            try:
+                size = os.path.getsize(location)
+            except OSError:
+                return
+        total += size
+
+    visit_class(job_order, ("File",), add_size)
+    return total.bit_length()
+
+
+class ResourceHistory:
+    """
+    A local database of the peak resource usage of finished jobs.
+
+    Jobs are grouped by tool ID and :py:func:`input_size_bucket`. Once enough
+    jobs of a group have been seen, the RAM and cores granted to the next
+    job of that group are capped at the most either resource was used by
+    the recent jobs, plus a safety margin. The ``ResourceRequirement``
+    minimums are always granted.
+    """
+
+    def __init__(self, path: str, margin: float = HISTORY_MARGIN) -> None:
+        """Use (and create if needed) the database at ``path``."""
+        self.path = path
+        self.margin = margin
+        self._lock = threading.Lock()
+        self._created = False
+
+    def _connect(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._created:
+                return sqlite3.connect(self.path, timeout=30)
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.executescript(_SCHEMA)
+            self._created = True
+            return connection
+
+    def record(self, tool_id: str, bucket: int, ram: float, cores: float) -> None:
+        """
+        Remember the peak usage of a finished job.
+
+        :param ram: peak memory use, in MiB
+        :param cores: average number of busy cores
+        """
+        try:
+            connection = self._connect()
+            try:
+                with connection:
+                    connection.execute(
+                        "INSERT INTO jobs VALUES (?, ?, ?, ?, ?)",
+                        (tool_id, bucket, ram, cores, time.time()),
+                    )
+            finally:
+                connection.close()
+        except sqlite3.Error as err:
+            _logger.warning("Could not update the resource history %s: %s", self.path, err)
+
+    def predict(self, tool_id: str, bucket: int) -> tuple[float, float] | None:
+        """Return the RAM (in MiB) and cores likely needed, if enough is known."""
+        try:
+            connection = self._connect()
+            try:
+                rows = connection.execute(
+                    "SELECT ram, cores FROM jobs WHERE tool_id = ? AND bucket = ? "
+                    "ORDER BY recorded DESC LIMIT ?",
+                    (tool_id, bucket, HISTORY_LENGTH),
+                ).fetchall()
+            finally:
+                connection.close()
+        except sqlite3.Error as err:
+            _logger.warning("Could not read the resource history %s: %s", self.path, err)
+            return None
+        if len(rows) < MIN_OBSERVATIONS:
+            return None
+        return (
+            math.ceil(max(ram for ram, _ in rows) * self.margin),
+            math.ceil(max(cores for _, cores in rows) * self.margin),
+        )
+
+    def adjust(
+        self, tool_id: str, job_order: CWLObjectType, request: dict[str, int | float]
+    ) -> None:
+        """Lower ``ramMax`` and ``coresMax`` of a resource request to the predicted usage."""
+        prediction = self.predict(tool_id, input_size_bucket(job_order))
+        if prediction is None:
+            return
+        for rsc, predicted in zip(("ram", "cores"), prediction):
+            limit = max(request[rsc + "Min"], min(request[rsc + "Max"], predicted))
+            if limit < request[rsc + "Max"]:
+                _logger.debug(
+                    "Limiting %s of %s to %s, based on previous runs", rsc, tool_id, limit
+                )
+                request[rsc + "Max"] = limit
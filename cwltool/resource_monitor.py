@@ -0,0 +1,384 @@
+"""Measure the resources used by running jobs."""
+
+import json
+import os
+import socket
+import subprocess  # nosec
+import threading
+import time
+from collections.abc import Iterable
+from typing import NamedTuple
+
+import psutil
+
+from .loghandler import _logger
+
+CGROUP_ROOTS = ("/sys/fs/cgroup", "/sys/fs/cgroup/unified")
+"""Where the cgroup v2 hierarchy may be mounted (the latter on hybrid hosts)."""
+
+MAX_SAMPLES = 3600
+"""Maximum length of the resource usage time series kept for a single job."""
+
+CIDFILE_POLL_INTERVAL = 0.05
+"""Seconds between checks for the container ID file written by the container engine."""
+
+
+class ResourceSample(NamedTuple):
+    """A single measurement of the resources used by a job."""
+
+    elapsed: float
+    """Seconds since the monitoring began."""
+    memory: int
+    """Memory in use, in bytes."""
+    cpu_time: float
+    """CPU time consumed so far, in seconds."""
+    read_bytes: int
+    """Bytes read from block devices so far."""
+    write_bytes: int
+    """Bytes written to block devices so far."""
+
+
+class ResourceUsage:
+    """The peak and time series of the resources used by a job."""
+
+    def __init__(self) -> None:
+        """Start an empty record of resource usage."""
+        self.started = time.monotonic()
+        self.samples: list[ResourceSample] = []
+        self.peak_memory: int | None = None
+        self.cpu_time = 0.0
+        self.read_bytes = 0
+        self.write_bytes = 0
+        self._stride = 1
+        self._pending = 0
+
+    def add(
+        self,
+        memory: int,
+        cpu_time: float = 0.0,
+        read_bytes: int = 0,
+        write_bytes: int = 0,
+        peak_memory: int | None = None,
+    ) -> None:
+        """
+        Record a measurement.
+
+        :param peak_memory: the highest memory use since the previous
+          measurement, if the source keeps track of it.
+
+        Once :py:data:`MAX_SAMPLES` are stored, every other sample is dropped
+        and only half as many are kept from then on, so that long running
+        jobs are covered from start to end with bounded memory.
+        """
+        peak = max(memory, peak_memory or 0)
+        if self.peak_memory is None or peak > self.peak_memory:
+            self.peak_memory = peak
+        self.cpu_time = max(self.cpu_time, cpu_time)
+        self.read_bytes = max(self.read_bytes, read_bytes)
+        self.write_bytes = max(self.write_bytes, write_bytes)
+        self._pending += 1
+        if self._pending < self._stride:
+            return
+        self._pending = 0
+        if len(self.samples) >= MAX_SAMPLES:
+            del self.samples[1::2]
+            self._stride *= 2
+        self.samples.append(
+            ResourceSample(
+                time.monotonic() - self.started, memory, cpu_time, read_bytes, write_bytes
+            )
+        )
+
+
+class CgroupStats:
+    """Read the resource usage of a cgroup v2 from its interface files."""
+
+    def __init__(self, path: str) -> None:
+        """Monitor the cgroup at ``path``."""
+        self.path = path
+
+    def _read(self, name: str) -> str:
+        with open(os.path.join(self.path, name)) as handle:
+            return handle.read()
+
+    def _read_keyed(self, name: str) -> dict[str, int]:
+        """Parse a flat keyed file such as ``cpu.stat``."""
+        values: dict[str, int] = {}
+        try:
+            for line in self._read(name).splitlines():
+                key, _, value = line.partition(" ")
+                if value.isdigit():
+                    values[key] = int(value)
+        except OSError:
+            pass
+        return values
+
+    def _read_io(self) -> tuple[int, int]:
+        """Sum the bytes read and written over all devices in ``io.stat``."""
+        read_bytes = write_bytes = 0
+        try:
+            for line in self._read("io.stat").splitlines():
+                for field in line.split()[1:]:
+                    key, _, value = field.partition("=")
+                    if key == "rbytes":
+                        read_bytes += int(value)
+                    elif key == "wbytes":
+                        write_bytes += int(value)
+        except (OSError, ValueError):
+            pass
+        return read_bytes, write_bytes
+
+    def sample(self, usage: ResourceUsage) -> bool:
+        """Add the current usage of the cgroup; return False if it no longer exists."""
+        try:
+            memory = int(self._read("memory.current"))
+        except (OSError, ValueError):
+            return False
+        try:
+            peak_memory: int | None = int(self._read("memory.peak"))
+        except (OSError, ValueError):
+            # memory.peak is only available since Linux 5.19
+            peak_memory = None
+        cpu_time = self._read_keyed("cpu.stat").get("usage_usec", 0) / 1e6
+        read_bytes, write_bytes = self._read_io()
+        usage.add(memory, cpu_time, read_bytes, write_bytes, peak_memory)
+        return True
+
+
+def _process_trees(roots: Iterable[int]) -> dict[int, list[psutil.Process]]:
+    """
+    Find the processes descending from each of ``roots``.
+
+    The whole process table is read once, for all the roots together.
+    """
+    procs: dict[int, psutil.Process] = {}
+    children: dict[int, list[psutil.Process]] = {}
+    for proc in psutil.process_iter(["ppid"]):
+        procs[proc.pid] = proc
+        ppid = proc.info["ppid"]
+        if ppid is not None:
+            children.setdefault(ppid, []).append(proc)
+    trees: dict[int, list[psutil.Process]] = {}
+    for root in roots:
+        if root in procs:
+            tree = [procs[root]]
+            index = 0
+            while index < len(tree):
+                pid = tree[index].pid
+                tree.extend(child for child in children.get(pid, []) if child.pid != root)
+                index += 1
+            trees[root] = tree
+    return trees
+
+
+def _sample_tree(tree: Iterable[psutil.Process], usage: ResourceUsage) -> None:
+    """Add the combined usage of a process tree."""
+    memory = read_bytes = write_bytes = 0
+    cpu_time = 0.0
+    found = False
+    for proc in tree:
+        try:
+            with proc.oneshot():
+                memory += proc.memory_info().rss
+                times = proc.cpu_times()
+                # includes the CPU time of descendants that have already exited
+                cpu_time += times.user + times.system + times.children_user + times.children_system
+                try:
+                    io = proc.io_counters()
+                    read_bytes += io.read_bytes
+                    write_bytes += io.write_bytes
+                except (psutil.AccessDenied, AttributeError):
+                    # no I/O accounting on this platform
+                    pass
+            found = True
+        except psutil.Error:
+            continue
+    if found:
+        usage.add(memory, cpu_time, read_bytes, write_bytes)
+
+
+class ResourceSampler:
+    """
+    Measure the resources used by all the running jobs, from a single thread.
+
+    Jobs are either process trees, identified by the PID of their root, or
+    cgroups. Every ``interval`` seconds the process table is read once for
+    all the process trees, and the interface files of each cgroup are read.
+    The thread stops when no jobs are left to watch.
+    """
+
+    def __init__(self, interval: float = 1.0) -> None:
+        """Prepare to sample every ``interval`` seconds."""
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._watches: dict[ResourceUsage, int | CgroupStats] = {}
+        self._thread: threading.Thread | None = None
+
+    def _watch(self, target: int | CgroupStats) -> ResourceUsage:
+        usage = ResourceUsage()
+        # right away, so that even the shortest jobs are measured once
+        self.sample([(usage, target)])
+        with self._cond:
+            self._watches[usage] = target
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="cwltool-resource-sampler", daemon=True
+                )
+                self._thread.start()
+        return usage
+
+    def watch_process(self, pid: int) -> ResourceUsage:
+        """Start measuring a process and all of its descendants."""
+        return self._watch(pid)
+
+    def watch_cgroup(self, path: str) -> ResourceUsage:
+        """Start measuring everything running in a cgroup v2."""
+        return self._watch(CgroupStats(path))
+
+    def unwatch(self, usage: ResourceUsage) -> None:
+        """Stop measuring; a cgroup that still exists is measured one last time."""
+        with self._cond:
+            target = self._watches.pop(usage, None)
+        if isinstance(target, CgroupStats):
+            target.sample(usage)
+
+    def sample(self, watches: Iterable[tuple[ResourceUsage, int | CgroupStats]]) -> None:
+        """Measure each of the given jobs once."""
+        watches = list(watches)
+        pids = [target for _, target in watches if isinstance(target, int)]
+        trees = _process_trees(pids) if pids else {}
+        for usage, target in watches:
+            if isinstance(target, CgroupStats):
+                target.sample(usage)
+            elif target in trees:
+                _sample_tree(trees[target], usage)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait(self.interval)
+                watches = list(self._watches.items())
+                if not watches:
+                    self._thread = None
+                    return
+            try:
+                self.sample(watches)
+            except Exception as err:
+                _logger.debug("Error while measuring resource usage: %s", err, exc_info=True)
+
+
+_SAMPLER = ResourceSampler()
+
+
+def resource_sampler(interval: float) -> ResourceSampler:
+    """Return the shared :py:class:`ResourceSampler`, set to sample every ``interval`` seconds."""
+    _SAMPLER.interval = max(interval, 0.01)
+    return _SAMPLER
+
+
+def _is_cgroup(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, "memory.current"))
+
+
+def process_cgroup(pid: int) -> str | None:
+    """Return the cgroup v2 directory of a process, if it has its own memory accounting."""
+    try:
+        with open(f"/proc/{pid}/cgroup") as handle:
+            lines = handle.read().splitlines()
+    except OSError:
+        return None
+    for line in lines:
+        if line.startswith("0::"):
+            for root in CGROUP_ROOTS:
+                path = root + line[3:].rstrip("/")
+                if _is_cgroup(path):
+                    return path
+    return None
+
+
+def container_cgroup(cid: str) -> str | None:
+    """
+    Return the cgroup v2 directory of a Docker or Podman container.
+
+    Covers the layouts created by the ``systemd`` and ``cgroupfs`` cgroup
+    drivers, for rootful and rootless engines.
+    """
+    uid = os.getuid()
+    candidates = (
+        f"system.slice/docker-{cid}.scope",
+        f"docker/{cid}",
+        f"machine.slice/libpod-{cid}.scope",
+        f"libpod_parent/libpod-{cid}",
+        f"user.slice/user-{uid}.slice/user@{uid}.service/user.slice/libpod-{cid}.scope",
+        f"user.slice/user-{uid}.slice/user@{uid}.service/user.slice/docker-{cid}.scope",
+    )
+    for root in CGROUP_ROOTS:
+        for candidate in candidates:
+            path = os.path.join(root, candidate)
+            if _is_cgroup(path):
+                return path
+    return None
+
+
+def _engine_socket(docker_exe: str) -> str | None:
+    """Return the path of the local API socket of a container engine."""
+    podman = "podman" in docker_exe
+    host = os.environ.get("CONTAINER_HOST" if podman else "DOCKER_HOST")
+    if host:
+        return host[len("unix://") :] if host.startswith("unix://") else None
+    if podman:
+        candidates = ["/run/podman/podman.sock"]
+        if "XDG_RUNTIME_DIR" in os.environ:
+            candidates.insert(0, os.path.join(os.environ["XDG_RUNTIME_DIR"], "podman/podman.sock"))
+    else:
+        candidates = ["/var/run/docker.sock"]
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def container_pid(docker_exe: str, cid: str) -> int | None:
+    """Ask the container engine, over its local socket, for the host PID of a container."""
+    path = _engine_socket(docker_exe)
+    if path is None:
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(5)
+            sock.connect(path)
+            sock.sendall(f"GET /containers/{cid}/json HTTP/1.0\r\nHost: localhost\r\n\r\n".encode())
+            chunks = []
+            while chunk := sock.recv(65536):
+                chunks.append(chunk)
+        header, _, body = b"".join(chunks).partition(b"\r\n\r\n")
+        if header.split(b" ", 2)[1:2] != [b"200"]:
+            _logger.debug("%s API: %s", docker_exe, header.split(b"\r\n", 1)[0].decode())
+            return None
+        pid = json.loads(body)["State"]["Pid"]
+    except (OSError, ValueError, KeyError, TypeError) as err:
+        _logger.debug("Could not query the %s API at %s: %s", docker_exe, path, err)
+        return None
+    return pid if isinstance(pid, int) and pid > 0 else None
+
+
+def wait_for_cidfile(cidfile: str, process: "subprocess.Popen[str]") -> str | None:
+    """
+    Wait for the container engine to write the container ID.
+
+    Return ``None`` if the process ended first; this returns as soon as
+    either happens so that short jobs are not delayed.
+    """
+    while True:
+        try:
+            with open(cidfile) as handle:
+                cid = handle.readline().strip()
+        except OSError:
+            cid = ""
+        if cid:
+            return cid
+        try:
+            process.wait(timeout=CIDFILE_POLL_INTERVAL)
+        except subprocess.TimeoutExpired:
+            continue
+        return None
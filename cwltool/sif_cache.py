@@ -0,0 +1,172 @@
+"""
+A cache of Singularity images named after the digest of their content.
+
+Images pulled by digest can be shared by any number of cwltool processes,
+on one host or over a shared filesystem: an image is built once, under a
+:py:func:`~cwltool.image_cache.host_image_lock`, into a temporary name that
+is renamed into place when complete, so that a partially written image is
+never used. The least recently used images are removed when the cache
+grows beyond ``$CWL_SINGULARITY_CACHE_MAX_SIZE``.
+"""
+
+import os
+import re
+import shutil
+import subprocess  # nosec
+import tempfile
+import time
+from collections.abc import Callable
+from typing import ContextManager
+
+from .image_cache import host_image_lock
+from .loghandler import _logger
+from .utils import disk_usage
+
+SANDBOX_GRACE = 60 * 60
+"""Seconds since their last use before sandboxes may be evicted, as jobs may still run in them."""
+
+_DIGEST = re.compile(r"^sha256:[0-9a-f]{64}$")
+_SIZE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$", re.IGNORECASE)
+
+
+def parse_size(size: str) -> int:
+    """Parse a size in bytes, optionally with a K, M, G or T (binary) suffix."""
+    match = _SIZE.match(size)
+    if not match:
+        raise ValueError(f"Invalid size {size!r}")
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** " KMGT".index(unit.upper() or " "))
+
+
+def cache_size_limit() -> int | None:
+    """Return the maximum size of the image cache, from ``$CWL_SINGULARITY_CACHE_MAX_SIZE``."""
+    limit = os.environ.get("CWL_SINGULARITY_CACHE_MAX_SIZE")
+    if not limit:
+        return None
+    try:
+        return parse_size(limit)
+    except ValueError:
+        _logger.warning("Ignoring invalid CWL_SINGULARITY_CACHE_MAX_SIZE %r", limit)
+        return None
+
+
+def split_digest(reference: str) -> tuple[str, str | None]:
+    """Split a Docker image reference into the repository and the pinned digest, if any."""
+    name, _, digest = reference.partition("@")
+    if ":" in name.rsplit("/", 1)[-1]:
+        name = name.rsplit(":", 1)[0]
+    return name, digest if _DIGEST.match(digest) else None
+
+
+def resolve_image_digest(reference: str) -> str | None:
+    """
+    Find the digest of the image that a Docker image reference currently points to.
+
+    Digests pinned in the reference are used as is; otherwise ``skopeo``
+    is asked, if installed. Returns ``None`` if the digest is not known.
+    """
+    reference = reference.removeprefix("docker://")
+    _, digest = split_digest(reference)
+    if digest or not shutil.which("skopeo"):
+        return digest
+    result = subprocess.run(  # nosec
+        ["skopeo", "inspect", "--format", "{{.Digest}}", "docker://" + reference],
+        capture_output=True,
+        text=True,
+    )
+    digest = result.stdout.strip()
+    if result.returncode != 0 or not _DIGEST.match(digest):
+        _logger.debug("Could not resolve the digest of %s: %s", reference, result.stderr)
+        return None
+    return digest
+
+
+class SifCache:
+    """Singularity images and sandboxes in ``root``, by image digest."""
+
+    def __init__(self, root: str, max_size: int | None = None) -> None:
+        """Use the cache in ``root``, evicting images once it holds more than ``max_size`` bytes."""
+        self.root = os.path.abspath(root)
+        self.max_size = max_size
+
+    def _path(self, kind: str, digest: str) -> str:
+        name = digest.replace(":", "-")
+        return os.path.join(self.root, kind, name + ".sif" if kind == "sif" else name)
+
+    def _lock(self, path: str) -> ContextManager[None]:
+        return host_image_lock(os.path.join(self.root, "locks"), os.path.relpath(path, self.root))
+
+    def _get(self, kind: str, digest: str, build: Callable[[str], object]) -> str:
+        path = self._path(kind, digest)
+        with self._lock(path):
+            if os.path.exists(path):
+                os.utime(path)
+                return path
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            build_dir = tempfile.mkdtemp(prefix=".build-", dir=os.path.dirname(path))
+            try:
+                partial = os.path.join(build_dir, os.path.basename(path))
+                build(partial)
+                os.replace(partial, path)
+            finally:
+                shutil.rmtree(build_dir, ignore_errors=True)
+        self.evict(keep=path)
+        return path
+
+    def image(self, digest: str, pull: Callable[[str], object]) -> str:
+        """
+        Return the path of the image file with ``digest``.
+
+        :param pull: writes the image to the path it is given, if not cached
+        """
+        return self._get("sif", digest, pull)
+
+    def sandbox(self, digest: str, image: str) -> str:
+        """Return a sandbox directory unpacked once from ``image``, to share read-only."""
+        return self._get(
+            "sandbox",
+            digest,
+            lambda path: subprocess.check_call(  # nosec
+                ["singularity", "build", "--sandbox", path, image], stdout=subprocess.DEVNULL
+            ),
+        )
+
+    def evict(self, keep: str | None = None) -> None:
+        """Remove the least recently used images until the cache fits in its maximum size."""
+        if self.max_size is None:
+            return
+        entries = []
+        for kind in ("sif", "sandbox"):
+            directory = os.path.join(self.root, kind)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if name.startswith(".build-"):
+                    continue
+                try:
+                    used = os.stat(path).st_mtime
+                except OSError:
+                    continue
+                size = disk_usage(path) if kind == "sandbox" else os.path.getsize(path)
+                entries.append((used, kind, path, size))
+        total = sum(size for *_, size in entries)
+        for used, kind, path, size in sorted(entries):
+            if total <= self.max_size:
+                break
+            if path == keep or kind == "sandbox" and time.time() - used < SANDBOX_GRACE:
+                continue
+            with self._lock(path):
+                try:
+                    if os.stat(path).st_mtime != used:
+                        continue  # used in the meantime
+                    _logger.info("Removing %s from the Singularity image cache", path)
+                    # Jobs already running from an image file keep it open, so
+                    # they are not affected when it is removed.
+                    if kind == "sandbox":
+                        shutil.rmtree(path)
+                    else:
+                        os.unlink(path)
+                except OSError:
+                    continue
+            total -= size
@@ -9,6 +9,7 @@ import os.path
 import re
 import shutil
 import sys
+import tempfile
 import threading
 from collections.abc import Callable, MutableMapping
 from subprocess import check_call, check_output, run  # nosec
@@ -26,9 +27,17 @@ from .builder import Builder
 from .context import RuntimeContext
 from .docker import DockerCommandLineJob
 from .errors import WorkflowException
+from .image_cache import (
+    IMAGE_FIELDS,
+    SingleFlight,
+    image_identity,
+    lookup_image,
+    record_image,
+)
 from .job import ContainerCommandLineJob
 from .loghandler import _logger
 from .pathmapper import MapperEnt, PathMapper
+from .sif_cache import SifCache, cache_size_limit, resolve_image_digest, split_digest
 from .singularity_utils import singularity_supports_userns
 from .utils import CWLObjectType, create_tmp_dir, ensure_non_writable, ensure_writable
 
@@ -44,6 +53,7 @@ _SINGULARITY_FLAVOR: str = ""
 
 _IMAGES: dict[str, str] = {}
 _IMAGES_LOCK = threading.Lock()
+_ACQUISITIONS: SingleFlight[tuple[bool, dict[str, str]]] = SingleFlight()
 
 
 def get_version() -> tuple[Version, str]:
@@ -59,7 +69,7 @@ def get_version() -> tuple[Version, str]:
     global _SINGULARITY_VERSION  # pylint: disable=global-statement
     global _SINGULARITY_FLAVOR  # pylint: disable=global-statement
     if _SINGULARITY_VERSION is None:
-        version_output = check_output(["singularity", "--version"], text=True).strip()  # nosec
+        version_output = _get_version_output()
 
         version_match = re.match(r"(.+) version ([0-9\.]+)", version_output)
         if version_match is None:
@@ -73,6 +83,29 @@ def get_version() -> tuple[Version, str]:
     return (_SINGULARITY_VERSION, _SINGULARITY_FLAVOR)
 
 
+def _get_version_output() -> str:
+    """
+    Run 'singularity --version', or reuse the output from a recent cwltool run.
+
+    The output is remembered in the image registry for as long as the
+    singularity executable is not replaced.
+    """
+    reference = None
+    if executable := shutil.which("singularity"):
+        try:
+            executable = os.path.realpath(executable)
+            reference = f"{executable}@{os.stat(executable).st_mtime_ns}"
+        except OSError:
+            pass
+    if reference and (record := lookup_image("singularity-version", reference)):
+        if "version" in record:
+            return record["version"]
+    version_output = check_output(["singularity", "--version"], text=True).strip()  # nosec
+    if reference:
+        record_image("singularity-version", reference, {"version": version_output})
+    return version_output
+
+
 def is_apptainer_1_or_newer() -> bool:
     """
     Check if apptainer singularity distribution is version 1.0 or higher.
@@ -154,6 +187,14 @@ def is_version_3_10_or_newer() -> bool:
     return version >= Version("3.10")
 
 
+def _registry_reference(docker_requirement: dict[str, str], sandbox_base_path: str | None) -> str:
+    """Identify a DockerRequirement in the image registry."""
+    return json_dumps(
+        [docker_requirement, sandbox_base_path, os.environ.get("CWL_SINGULARITY_CACHE")],
+        sort_keys=True,
+    )
+
+
 def _normalize_image_id(string: str) -> str:
     if ":" not in string:
         string += "_latest"
@@ -190,6 +231,36 @@ def _inspect_singularity_sandbox_image(path: str) -> bool:
     return False
 
 
+def _cacheable_digest(docker_pull: str, pull_image: bool) -> str | None:
+    """Return the digest of a Docker image to keep in the ``$CWL_SINGULARITY_CACHE``, if known."""
+    if "CWL_SINGULARITY_CACHE" not in os.environ or not pull_image:
+        return None
+    if not is_version_3_or_newer() or re.match(r"[a-z]*://", docker_pull.removeprefix("docker://")):
+        return None
+    return resolve_image_digest(docker_pull)
+
+
+def _pull_by_digest(docker_pull: str, digest: str) -> str:
+    """
+    Pull a Docker image into the cache by digest, unless already there.
+
+    Returns the path to the image file, or with ``$CWL_SINGULARITY_SANDBOX``
+    set, to a sandbox directory unpacked from it.
+    """
+    cache = SifCache(os.environ["CWL_SINGULARITY_CACHE"], cache_size_limit())
+    repository, _ = split_digest(docker_pull.removeprefix("docker://"))
+
+    def pull(path: str) -> None:
+        cmd = ["singularity", "pull", "--force", "--name", path, f"docker://{repository}@{digest}"]
+        _logger.info(str(cmd))
+        check_call(cmd, stdout=sys.stderr)  # nosec
+
+    image = cache.image(digest, pull)
+    if os.environ.get("CWL_SINGULARITY_SANDBOX"):
+        return cache.sandbox(digest, image)
+    return image
+
+
 class SingularityCommandLineJob(ContainerCommandLineJob):
     def __init__(
         self,
@@ -218,14 +289,12 @@ class SingularityCommandLineJob(ContainerCommandLineJob):
         provided dockerRequirement with the specific dockerImageId to the full
         path of the local image, if found. Likewise the
         dockerRequirement['dockerPull'] is updated to a docker:// URI if needed.
-        """
-        found = False
-
-        candidates = []
-
-        cache_folder = None
-        debug = _logger.isEnabledFor(logging.DEBUG)
 
+        Concurrent requests for the same image, from this or other cwltool
+        processes sharing the image cache, wait for a single pull/build
+        instead of each running their own, whatever the other fields of
+        their DockerRequirement.
+        """
         with _IMAGES_LOCK:
             if "dockerImageId" in dockerRequirement:
                 d_image_id = dockerRequirement["dockerImageId"]
@@ -240,6 +309,60 @@ class SingularityCommandLineJob(ContainerCommandLineJob):
                         )
                     )
 
+        if not force_pull and (
+            record := lookup_image(
+                "singularity", _registry_reference(dockerRequirement, sandbox_base_path)
+            )
+        ):
+            if "requirement" in record and os.path.exists(record.get("path", "")):
+                with _IMAGES_LOCK:
+                    if "dockerImageId" in dockerRequirement:
+                        _IMAGES[dockerRequirement["dockerImageId"]] = record["path"]
+                    dockerRequirement.clear()
+                    dockerRequirement |= record["requirement"]
+                    _IMAGES[record["path"]] = record["path"]
+                return True
+
+        found, docker_req = _ACQUISITIONS.run(
+            json_dumps([image_identity(dockerRequirement), sandbox_base_path]),
+            lambda: SingularityCommandLineJob._acquire_image(
+                dockerRequirement,
+                pull_image,
+                tmp_outdir_prefix,
+                force_pull,
+                sandbox_base_path,
+            ),
+            os.environ.get("CWL_SINGULARITY_CACHE"),
+        )
+        if found:
+            with _IMAGES_LOCK:
+                if "dockerImageId" in dockerRequirement:
+                    _IMAGES[dockerRequirement["dockerImageId"]] = docker_req["dockerImageId"]
+                # the result may be shared with requirements that only
+                # have the same image fields
+                dockerRequirement |= {
+                    field: docker_req[field] for field in IMAGE_FIELDS if field in docker_req
+                }
+                if "dockerImageId" in docker_req:
+                    _IMAGES[docker_req["dockerImageId"]] = docker_req["dockerImageId"]
+        return found
+
+    @staticmethod
+    def _acquire_image(
+        dockerRequirement: dict[str, str],
+        pull_image: bool,
+        tmp_outdir_prefix: str,
+        force_pull: bool,
+        sandbox_base_path: str | None,
+    ) -> tuple[bool, dict[str, str]]:
+        """Pull, build, or find the image; return the success and the updated requirement."""
+        found = from_cache = False
+
+        candidates = []
+
+        cache_folder = None
+        debug = _logger.isEnabledFor(logging.DEBUG)
+
         docker_req = copy.deepcopy(dockerRequirement)  # thread safety
         if "CWL_SINGULARITY_CACHE" in os.environ:
             cache_folder = os.environ["CWL_SINGULARITY_CACHE"]
@@ -278,31 +401,39 @@ class SingularityCommandLineJob(ContainerCommandLineJob):
             if os.path.exists(image_name):
                 found = True
             if found is False:
-                dockerfile_path = os.path.join(absolute_path, "Dockerfile")
-                singularityfile_path = dockerfile_path + ".def"
-                with open(dockerfile_path, "w") as dfile:
-                    dfile.write(docker_req["dockerFile"])
-
-                docker_recipe = DockerParser(dockerfile_path).parse()
-                docker_recipe["spython-base"].entrypoint = ""
-                singularityfile = SingularityWriter(docker_recipe).convert()
-                with open(singularityfile_path, "w") as file:
-                    file.write(singularityfile)
-
-                # if you do not set APPTAINER_TMPDIR will crash
-                # WARNING: 'nodev' mount option set on /tmp, it could be a
-                #          source of failure during build process
-                # FATAL:   Unable to create build: 'noexec' mount option set on
-                #          /tmp, temporary root filesystem won't be usable at this location
-                os.environ["APPTAINER_TMPDIR"] = absolute_path
-                singularity_options = ["--fakeroot"] if not shutil.which("proot") else []
-                Client.build(
-                    recipe=singularityfile_path,
-                    build_folder=absolute_path,
-                    image=image_name,
-                    sudo=False,
-                    options=singularity_options,
-                )
+                # build in a directory of our own, and move the image into
+                # place once complete, as the cache may be shared
+                build_dir = tempfile.mkdtemp(prefix=".build-", dir=absolute_path)
+                try:
+                    dockerfile_path = os.path.join(build_dir, "Dockerfile")
+                    singularityfile_path = dockerfile_path + ".def"
+                    with open(dockerfile_path, "w") as dfile:
+                        dfile.write(docker_req["dockerFile"])
+
+                    docker_recipe = DockerParser(dockerfile_path).parse()
+                    docker_recipe["spython-base"].entrypoint = ""
+                    singularityfile = SingularityWriter(docker_recipe).convert()
+                    with open(singularityfile_path, "w") as file:
+                        file.write(singularityfile)
+
+                    # if you do not set APPTAINER_TMPDIR will crash
+                    # WARNING: 'nodev' mount option set on /tmp, it could be a
+                    #          source of failure during build process
+                    # FATAL:   Unable to create build: 'noexec' mount option set on
+                    #          /tmp, temporary root filesystem won't be usable at this location
+                    os.environ["APPTAINER_TMPDIR"] = absolute_path
+                    singularity_options = ["--fakeroot"] if not shutil.which("proot") else []
+                    partial_image = os.path.join(build_dir, os.path.basename(image_name))
+                    Client.build(
+                        recipe=singularityfile_path,
+                        build_folder=build_dir,
+                        image=partial_image,
+                        sudo=False,
+                        options=singularity_options,
+                    )
+                    os.replace(partial_image, image_name)
+                finally:
+                    shutil.rmtree(build_dir, ignore_errors=True)
                 found = True
         elif "dockerImageId" not in docker_req and "dockerPull" in docker_req:
             # looking for local singularity sandbox image and handle it as a local image
@@ -316,6 +447,9 @@ class SingularityCommandLineJob(ContainerCommandLineJob):
                     sandbox_image_path,
                 )
                 found = True
+            elif (digest := _cacheable_digest(docker_req["dockerPull"], pull_image)) is not None:
+                docker_req["dockerImageId"] = _pull_by_digest(docker_req["dockerPull"], digest)
+                found = from_cache = True
             else:
                 match = re.search(pattern=r"([a-z]*://)", string=docker_req["dockerPull"])
                 img_name = _normalize_image_id(docker_req["dockerPull"])
@@ -367,7 +501,7 @@ class SingularityCommandLineJob(ContainerCommandLineJob):
                                 )
                                 docker_req["dockerImageId"] = path
                                 found = True
-        if (force_pull or not found) and pull_image:
+        if ((force_pull and not from_cache) or not found) and pull_image:
             cmd: list[str] = []
             if "dockerPull" in docker_req:
                 if image_base_path:
@@ -438,14 +572,13 @@ class SingularityCommandLineJob(ContainerCommandLineJob):
                     "Singularity runtime for Docker containers."
                 )
         if found:
-            with _IMAGES_LOCK:
-                if "dockerImageId" in dockerRequirement:
-                    _IMAGES[dockerRequirement["dockerImageId"]] = docker_req["dockerImageId"]
-                dockerRequirement.clear()
-                dockerRequirement |= docker_req
-                if "dockerImageId" in docker_req:
-                    _IMAGES[docker_req["dockerImageId"]] = docker_req["dockerImageId"]
-        return found
+            image_path = os.path.abspath(docker_req["dockerImageId"])
+            record_image(
+                "singularity",
+                _registry_reference(dockerRequirement, sandbox_base_path),
+                {"path": image_path, "requirement": dict(docker_req, dockerImageId=image_path)},
+            )
+        return found, docker_req
 
     def get_from_requirements(
         self,
@@ -0,0 +1,216 @@
+"""
+Time the phases of a run: loading, evaluating, staging, running, collecting.
+
+Timing is off unless enabled, by ``--timing`` or ``--trace-file``, or by
+calling :py:func:`enable`. Each phase is a span, timed with::
+
+    with span("stage_files", step):
+        ...
+
+Spans are summed per step and phase, for :py:func:`format_timing_report`.
+When tracing, every span is also kept, to be written as Chrome trace events
+by :py:func:`write_chrome_trace` and opened in Perfetto or ``chrome://tracing``.
+
+A span without a step belongs to the step of the span it is nested in, on
+the same thread. A span nested in a span of the same phase, such as a
+recursive :py:meth:`~cwltool.builder.Builder.do_eval`, is not timed again.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+from collections.abc import Iterable
+from contextvars import ContextVar, Token
+from typing import Any, NamedTuple
+
+from .loghandler import _logger
+
+WORKFLOW = "(workflow)"
+"""How spans outside of any step are reported."""
+
+
+class SpanEvent(NamedTuple):
+    """A single span, kept when tracing."""
+
+    name: str
+    step: str | None
+    start: int
+    """Start time, in nanoseconds since timing was enabled."""
+    duration: int
+    """In nanoseconds."""
+    thread: int
+    """Native ID of the thread the span ran on."""
+
+
+class PhaseTiming:
+    """The spans of one phase of one step, summed."""
+
+    def __init__(self, step: str | None, name: str, first: int = 0) -> None:
+        """Start with no spans."""
+        self.step = step
+        self.name = name
+        self.first = first
+        """When the first span started, in nanoseconds."""
+        self.count = 0
+        self.total = 0
+        """In nanoseconds."""
+        self.longest = 0
+        """In nanoseconds."""
+
+
+class Timings:
+    """The spans timed since timing was enabled."""
+
+    def __init__(self, trace: bool = False) -> None:
+        """Start timing, keeping every span if ``trace``."""
+        self.started = time.perf_counter_ns()
+        self.phases: dict[tuple[str | None, str], PhaseTiming] = {}
+        self.events: list[SpanEvent] | None = [] if trace else None
+        self.threads: dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, step: str | None, start: int, end: int) -> None:
+        """Include a span, timed with :py:func:`time.perf_counter_ns`."""
+        duration = end - start
+        with self._lock:
+            phase = self.phases.get((step, name))
+            if phase is None:
+                phase = self.phases[(step, name)] = PhaseTiming(step, name, start)
+            phase.first = min(phase.first, start)
+            phase.count += 1
+            phase.total += duration
+            phase.longest = max(phase.longest, duration)
+            if self.events is not None:
+                thread = threading.current_thread()
+                native_id = thread.native_id or 0
+                self.threads.setdefault(native_id, thread.name)
+                self.events.append(SpanEvent(name, step, start - self.started, duration, native_id))
+
+    def summary(self) -> list[PhaseTiming]:
+        """The phases timed, grouped by step, in the order they started."""
+        with self._lock:
+            phases = sorted(self.phases.values(), key=lambda phase: phase.first)
+        steps: dict[str | None, list[PhaseTiming]] = {}
+        for phase in phases:
+            steps.setdefault(phase.step, []).append(phase)
+        return [phase for step_phases in steps.values() for phase in step_phases]
+
+
+_timings: Timings | None = None
+_current: ContextVar[tuple[str, str | None] | None] = ContextVar("_current", default=None)
+_DISABLED: contextlib.nullcontext[None] = contextlib.nullcontext()
+
+
+class _Span:
+    def __init__(self, timings: Timings, name: str, step: str | None) -> None:
+        self.timings = timings
+        self.name = name
+        self.step = step
+        self.start = 0
+        self.token: Token[tuple[str, str | None] | None] | None = None
+
+    def __enter__(self) -> None:
+        self.token = _current.set((self.name, self.step))
+        self.start = time.perf_counter_ns()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        end = time.perf_counter_ns()
+        if self.token is not None:
+            _current.reset(self.token)
+        self.timings.add(self.name, self.step, self.start, end)
+
+
+def span(name: str, step: str | None = None) -> contextlib.AbstractContextManager[None]:
+    """Time the ``name`` phase of ``step``, if timing is enabled."""
+    timings = _timings
+    if timings is None:
+        return _DISABLED
+    current = _current.get()
+    if current is not None:
+        if current[0] == name:
+            return _DISABLED
+        if step is None:
+            step = current[1]
+    return _Span(timings, name, step)
+
+
+def enable(trace: bool = False) -> Timings:
+    """Start timing spans, keeping each of them if ``trace``."""
+    global _timings
+    _timings = Timings(trace)
+    return _timings
+
+
+def disable() -> Timings | None:
+    """Stop timing spans, returning those timed so far."""
+    global _timings
+    timings, _timings = _timings, None
+    return timings
+
+
+def format_timing_report(phases: Iterable[PhaseTiming]) -> str:
+    """
+    Tabulate the time spent in each phase, per step.
+
+    Times include those of the phases nested within, such as the
+    ``do_eval`` of expressions in ``collect_output_ports``.
+    """
+    header = ("step", "phase", "calls", "total s", "mean ms", "max ms")
+    rows = [header]
+    for phase in phases:
+        rows.append(
+            (
+                phase.step or WORKFLOW,
+                phase.name,
+                str(phase.count),
+                f"{phase.total / 1e9:.3f}",
+                f"{phase.total / phase.count / 1e6:.2f}",
+                f"{phase.longest / 1e6:.2f}",
+            )
+        )
+    widths = [max(len(row[column]) for row in rows) for column in range(len(header))]
+    return "\n".join(
+        "  ".join(
+            cell.ljust(width) if column < 2 else cell.rjust(width)
+            for column, (cell, width) in enumerate(zip(row, widths))
+        ).rstrip()
+        for row in rows
+    )
+
+
+def write_chrome_trace(timings: Timings, path: str) -> None:
+    """Write the spans as Chrome trace events, in JSON."""
+    pid = os.getpid()
+    events: list[dict[str, Any]] = [
+        {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "cwltool"}}
+    ]
+    for native_id, thread_name in sorted(timings.threads.items()):
+        events.append(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": native_id,
+                "args": {"name": thread_name},
+            }
+        )
+    for event in timings.events or []:
+        events.append(
+            {
+                "name": event.name,
+                "cat": "cwltool",
+                "ph": "X",
+                "ts": event.start / 1000,
+                "dur": event.duration / 1000,
+                "pid": pid,
+                "tid": event.thread,
+                "args": {"step": event.step or WORKFLOW},
+            }
+        )
+    try:
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, handle)
+    except OSError as err:
+        _logger.warning("Could not write the trace to %s: %s", path, err)
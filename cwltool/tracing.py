@@ -0,0 +1,243 @@
+"""
+Trace workflows, steps, scatter elements and jobs as OpenTelemetry spans.
+
+Tracing is off unless :py:attr:`~cwltool.context.RuntimeContext.tracer` is
+set, as by ``--otlp-trace-file``. The spans are then exported offline, in
+the OTLP JSON format of the OpenTelemetry Collector's file exporter: one
+``ExportTraceServiceRequest`` per line, which the Collector's ``otlpjsonfile``
+receiver, among others, can forward to any tracing backend.
+
+To correlate a run with the system running it, such as a batch job traced
+by the cluster, set ``TRACEPARENT`` to a W3C trace context: the spans of
+the run then belong to that trace, under that parent span.
+"""
+
+import importlib.metadata
+import json
+import os
+import re
+import socket
+import threading
+import time
+from collections.abc import Callable, Mapping
+from typing import IO, Any, TypeVar
+
+from .loghandler import _logger
+
+AttributeValue = str | bool | int | float
+"""The types of span attribute values."""
+
+_Outputs = TypeVar("_Outputs")
+
+BATCH_SIZE = 64
+"""Number of ended spans exported together, on one line."""
+
+_TRACEPARENT_RE = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+# OTLP enumerations
+_SPAN_KIND_INTERNAL = 1
+_STATUS_CODE_OK = 1
+_STATUS_CODE_ERROR = 2
+
+
+def _new_id(size: int) -> str:
+    return os.urandom(size).hex()
+
+
+class Span:
+    """An operation of a run, from :py:meth:`Tracer.start_span` until :py:meth:`end`."""
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        trace_id: str,
+        parent_id: str | None,
+        attributes: Mapping[str, AttributeValue] | None = None,
+    ) -> None:
+        """Start the span."""
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.attributes: dict[str, AttributeValue] = dict(attributes or {})
+        self.start_time = time.time_ns()
+        self.end_time: int | None = None
+        self.status: str | None = None
+
+    def set_attribute(self, key: str, value: AttributeValue | None) -> None:
+        """Describe the operation, ignoring unknown values."""
+        if value is not None:
+            self.attributes[key] = value
+
+    def end(self, status: str = "success") -> None:
+        """End the span, with the CWL process status of the operation, exporting it once."""
+        if self.end_time is not None:
+            return
+        self.end_time = time.time_ns()
+        self.status = status
+        self.tracer.export(self)
+
+
+class OTLPFileExporter:
+    """Append spans to a file, as OTLP JSON lines."""
+
+    def __init__(self, path: str) -> None:
+        """Open ``path`` for appending."""
+        self.path = path
+        self._file: IO[str] | None = open(path, "a", encoding="utf-8")
+        self._version = _version()
+        self._resource = {
+            "attributes": _encode_attributes(
+                {
+                    "service.name": "cwltool",
+                    "service.version": self._version,
+                    "host.name": socket.gethostname(),
+                    "process.pid": os.getpid(),
+                }
+            )
+        }
+
+    def export(self, spans: list[Span]) -> None:
+        """Write one line holding all of ``spans``."""
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": self._resource,
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "cwltool", "version": self._version},
+                            "spans": [_encode_span(span) for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        if self._file is None:
+            return
+        try:
+            self._file.write(json.dumps(request, separators=(",", ":")) + "\n")
+            self._file.flush()
+        except OSError as err:
+            _logger.warning("Could not write trace spans to %s: %s", self.path, err)
+
+    def close(self) -> None:
+        """Close the file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class Tracer:
+    """Start spans, and export them in batches once ended."""
+
+    def __init__(self, exporter: OTLPFileExporter, traceparent: str | None = None) -> None:
+        """Trace a new run, or continue the W3C ``traceparent`` given, if valid."""
+        self.exporter = exporter
+        self.trace_id = _new_id(16)
+        self.parent_id: str | None = None
+        if traceparent and (match := _TRACEPARENT_RE.match(traceparent.strip())):
+            self.trace_id, self.parent_id = match.group(1), match.group(2)
+        self._ended: list[Span] = []
+        self._lock = threading.Lock()
+
+    def start_span(
+        self,
+        name: str,
+        parent: Span | None,
+        attributes: Mapping[str, AttributeValue] | None = None,
+    ) -> Span:
+        """Start a span, child of ``parent`` or else of the run."""
+        parent_id = parent.span_id if parent is not None else self.parent_id
+        return Span(self, name, self.trace_id, parent_id, attributes)
+
+    def export(self, span: Span) -> None:
+        """Queue an ended span, exporting the queue once full."""
+        with self._lock:
+            self._ended.append(span)
+            if len(self._ended) < BATCH_SIZE:
+                return
+            spans, self._ended = self._ended, []
+            self.exporter.export(spans)
+
+    def shutdown(self) -> None:
+        """Export the spans queued, and close the exporter."""
+        with self._lock:
+            spans, self._ended = self._ended, []
+            if spans:
+                self.exporter.export(spans)
+            self.exporter.close()
+
+
+def start_span(
+    tracer: Tracer | None,
+    name: str,
+    parent: Span | None,
+    attributes: Mapping[str, AttributeValue | None],
+) -> Span | None:
+    """Start a span if tracing, leaving out the attributes of unknown value."""
+    if tracer is None:
+        return None
+    return tracer.start_span(
+        name, parent, {key: value for key, value in attributes.items() if value is not None}
+    )
+
+
+def open_tracer(path: str) -> Tracer:
+    """Trace to an OTLP JSON lines file, continuing any trace in ``TRACEPARENT``."""
+    return Tracer(OTLPFileExporter(path), os.environ.get("TRACEPARENT"))
+
+
+def _version() -> str:
+    try:
+        return importlib.metadata.version("cwltool")
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _encode_value(value: AttributeValue) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _encode_attributes(attributes: Mapping[str, AttributeValue]) -> list[dict[str, Any]]:
+    return [{"key": key, "value": _encode_value(value)} for key, value in attributes.items()]
+
+
+def _encode_span(span: Span) -> dict[str, Any]:
+    encoded: dict[str, Any] = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": _SPAN_KIND_INTERNAL,
+        "startTimeUnixNano": str(span.start_time),
+        "endTimeUnixNano": str(span.end_time),
+        "attributes": _encode_attributes({**span.attributes, "cwl.status": span.status or ""}),
+    }
+    if span.parent_id is not None:
+        encoded["parentSpanId"] = span.parent_id
+    if span.status in ("success", "skipped"):
+        encoded["status"] = {"code": _STATUS_CODE_OK}
+    else:
+        encoded["status"] = {"code": _STATUS_CODE_ERROR, "message": span.status}
+    return encoded
+
+
+def traced_callback(
+    span: Span | None, callback: Callable[[_Outputs, str], None]
+) -> Callable[[_Outputs, str], None]:
+    """Wrap an output callback to end ``span`` with the status of the outputs, if tracing."""
+    if span is None:
+        return callback
+
+    def end_and_callback(outputs: _Outputs, processStatus: str) -> None:
+        span.end(processStatus)
+        callback(outputs, processStatus)
+
+    return end_and_callback
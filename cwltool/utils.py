@@ -1,6 +1,7 @@
 """Shared functions and other definitions."""
 
 import collections
+import copy
 
 try:
     import fcntl
@@ -50,6 +51,7 @@ import requests
 from cachecontrol import CacheControl
 from cachecontrol.caches import FileCache
 from mypy_extensions import mypyc_attr
+from ruamel.yaml.comments import CommentedMap, CommentedSeq
 from schema_salad.exceptions import ValidationException
 
 if TYPE_CHECKING:
@@ -201,6 +203,49 @@ def bytes2str_in_dicts(
     return inp
 
 
+_IMMUTABLE_LEAVES = frozenset((str, int, float, bool, type(None)))
+
+
+def copy_cwl_object(value: Any, memo: dict[int, Any] | None = None) -> Any:
+    """
+    Deep copy a CWL job order, input object, or other JSON-like document.
+
+    Equivalent to :py:func:`copy.deepcopy` (aliasing and ruamel.yaml
+    line/column information are preserved) but the common container and
+    scalar types are handled directly instead of through the generic
+    deepcopy dispatch, which dominates the cost of copying job orders with
+    many File objects.  Scalars are shared rather than copied.
+    """
+    if memo is None:
+        memo = {}
+    value_type = type(value)
+    if value_type in _IMMUTABLE_LEAVES:
+        return value
+    if value_type is dict or value_type is CommentedMap:
+        found = memo.get(id(value))
+        if found is not None:
+            return found
+        new_map = value_type()
+        memo[id(value)] = new_map
+        for key, item in value.items():
+            new_map[key] = item if type(item) in _IMMUTABLE_LEAVES else copy_cwl_object(item, memo)
+        if value_type is CommentedMap:
+            value.copy_attributes(new_map, memo=memo)
+        return new_map
+    if value_type is list or value_type is CommentedSeq:
+        found = memo.get(id(value))
+        if found is not None:
+            return found
+        new_seq = value_type()
+        memo[id(value)] = new_seq
+        for item in value:
+            new_seq.append(item if type(item) in _IMMUTABLE_LEAVES else copy_cwl_object(item, memo))
+        if value_type is CommentedSeq:
+            value.copy_attributes(new_seq, memo=memo)
+        return new_seq
+    return copy.deepcopy(value, memo)
+
+
 def visit_class(rec: Any, cls: Iterable[Any], op: Callable[..., Any]) -> None:
     """Apply a function to with "class" in cls."""
     if isinstance(rec, MutableMapping):
@@ -317,25 +362,33 @@ def trim_listing(obj: dict[str, Any]) -> None:
         del obj["listing"]
 
 
-def downloadHttpFile(httpurl: str) -> tuple[str, datetime | None]:
+def user_cache_dir() -> str:
     """
-    Download a remote file, possibly using a locally cached copy.
+    Return the per-user cache directory for cwltool.
 
-    Returns a tuple:
-    - the local path for the downloaded file
-    - the Last-Modified timestamp if received from the remote server.
+    This is ``$XDG_CACHE_HOME/cwltool`` if set, otherwise ``$HOME/.cache/cwltool``.
+    The directory is not created.
     """
-    cache_session = None
     if "XDG_CACHE_HOME" in os.environ:
         directory = os.environ["XDG_CACHE_HOME"]
     elif "HOME" in os.environ:
         directory = os.path.join(os.environ["HOME"], ".cache")
     else:
         directory = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(directory, "cwltool")
 
+
+def downloadHttpFile(httpurl: str) -> tuple[str, datetime | None]:
+    """
+    Download a remote file, possibly using a locally cached copy.
+
+    Returns a tuple:
+    - the local path for the downloaded file
+    - the Last-Modified timestamp if received from the remote server.
+    """
     cache_session = CacheControl(
         requests.Session(),
-        cache=FileCache(os.path.join(directory, "cwltool")),
+        cache=FileCache(user_cache_dir()),
     )
 
     r = cache_session.get(httpurl, stream=True)
@@ -400,6 +453,42 @@ def ensure_non_writable(path: str) -> None:
         os.chmod(path, mode & ~stat.S_IWUSR & ~stat.S_IWGRP & ~stat.S_IWOTH)
 
 
+FICLONE = 0x40049409
+"""The Linux ``ioctl`` to share the blocks of a file with another (a reflink)."""
+
+
+def link_file(source: str, destination: str) -> bool:
+    """Reflink, or else hard link, a file; return whether either worked."""
+    try:
+        import fcntl  # not on Windows
+
+        with open(source, "rb") as src, open(destination, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except (ImportError, OSError):
+        if os.path.exists(destination):
+            os.unlink(destination)
+    try:
+        os.link(source, destination)
+        return True
+    except OSError:
+        return False
+
+
+def disk_usage(path: str) -> int:
+    """Return the total size of the regular files under ``path``, not following symlinks."""
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                file_stat = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            if stat.S_ISREG(file_stat.st_mode):
+                total += file_stat.st_size
+    return total
+
+
 def normalizeFilesDirs(
     job: None | (
         MutableSequence[MutableMapping[str, Any]] | MutableMapping[str, Any] | DirectoryType
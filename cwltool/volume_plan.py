@@ -0,0 +1,153 @@
+"""
+Stage many input files into a software container with few bind mounts.
+
+By default, every staged input gets a bind mount of its own, so a job with
+thousands of inputs has a command line too long for the operating system,
+or at least a slow container startup. Above :py:data:`MOUNT_BATCH_THRESHOLD`
+inputs, :py:func:`plan_volumes` instead
+
+- mounts whole directories, read-only, where the inputs staged into a
+  directory are exactly the contents of a directory on the host, with the
+  same names; and otherwise
+- generates a staging directory of reflinks or hard links to the input
+  files, mounted read-only over the container staging directory.
+
+Either way, only the inputs themselves are visible in the container. Input
+files that cannot be linked, such as those on another file system than the
+temporary directory, and input directories not mounted as a whole, are
+mounted one by one as usual.
+"""
+
+import os
+from collections.abc import Iterable
+
+from .pathmapper import MapperEnt
+from .utils import create_tmp_dir, link_file
+
+MOUNT_BATCH_THRESHOLD = 256
+"""Number of inputs above which they are staged with as few mounts as possible."""
+
+_FILE_TYPES = ("File", "WritableFile", "CreateFile", "CreateWritableFile")
+
+
+class VolumePlan:
+    """How to bind mount the inputs of a job that are staged under ``stagedir``."""
+
+    def __init__(self, stagedir: str) -> None:
+        """Start with nothing planned."""
+        self.stagedir = stagedir
+        self.directories: list[tuple[str, str]] = []
+        """Host directories to mount as a whole, with their target."""
+        self.links: dict[str, str] = {}
+        """Input files to link into the staging directory: target to host path."""
+        self.targets: set[str] = set()
+        """The targets of the inputs that are taken care of by this plan."""
+
+    @property
+    def mounts(self) -> int:
+        """The number of mounts needed for the planned inputs."""
+        return len(self.directories) + (1 if self.links else 0)
+
+    def create_link_tree(self, tmpdir_prefix: str, others: Iterable[MapperEnt]) -> str | None:
+        """
+        Generate the staging directory of linked input files, if any are planned.
+
+        The files that cannot be linked are left out of the plan, to be
+        mounted on their own, and get a mount point instead.
+
+        :param others: the other staged entries, whose mount points are
+                       created in the staging directory
+        :returns: the host path of the staging directory
+        """
+        if not self.links:
+            return None
+        tree = create_tmp_dir(tmpdir_prefix)
+
+        def host_path(target: str) -> str:
+            return os.path.join(tree, os.path.relpath(target, self.stagedir))
+
+        mountpoints = [(target, False) for _, target in self.directories]
+        for target, source in list(self.links.items()):
+            link = host_path(target)
+            os.makedirs(os.path.dirname(link), exist_ok=True)
+            if not link_file(source, link):
+                del self.links[target]
+                self.targets.discard(target)
+                mountpoints.append((target, True))
+        mountpoints.extend(
+            (entry.target, entry.type in _FILE_TYPES)
+            for entry in others
+            if entry.target.startswith(self.stagedir + "/")
+        )
+        for target, is_file in mountpoints:
+            mountpoint = host_path(target)
+            if is_file:
+                os.makedirs(os.path.dirname(mountpoint), exist_ok=True)
+                open(mountpoint, "a").close()
+            else:
+                os.makedirs(mountpoint, exist_ok=True)
+        return tree
+
+
+def _is_planned(entry: MapperEnt, stagedir: str) -> bool:
+    return (
+        bool(entry.staged)
+        and entry.type in ("File", "Directory")
+        and not entry.resolved.startswith("_:")
+        and entry.target.startswith(stagedir + "/")
+    )
+
+
+def plan_volumes(
+    entries: Iterable[MapperEnt], stagedir: str, threshold: int = MOUNT_BATCH_THRESHOLD
+) -> VolumePlan | None:
+    """
+    Plan the mounts of the read-only inputs staged under ``stagedir``.
+
+    Returns ``None`` if there are no more than ``threshold`` of them, to be
+    mounted one by one.
+    """
+    staged = [entry for entry in entries if entry.staged]
+    planned = [entry for entry in staged if _is_planned(entry, stagedir)]
+    if len(planned) <= threshold:
+        return None
+    plan = VolumePlan(stagedir)
+
+    descendants: dict[str, int] = {}
+    for entry in staged:
+        directory = os.path.dirname(entry.target)
+        while directory.startswith(stagedir + "/"):
+            descendants[directory] = descendants.get(directory, 0) + 1
+            directory = os.path.dirname(directory)
+    groups: dict[tuple[str, str], set[str]] = {}
+    for entry in planned:
+        source_dir, name = os.path.split(entry.resolved)
+        target_dir, target_name = os.path.split(entry.target)
+        if name == target_name:
+            groups.setdefault((source_dir, target_dir), set()).add(name)
+    listings: dict[str, set[str]] = {}
+    for (source_dir, target_dir), names in groups.items():
+        if descendants.get(target_dir) != len(names):
+            continue
+        if source_dir not in listings:
+            try:
+                listings[source_dir] = set(os.listdir(source_dir))
+            except OSError:
+                listings[source_dir] = set()
+        if listings[source_dir] == names:
+            plan.directories.append((source_dir, target_dir))
+            plan.targets.update(os.path.join(target_dir, name) for name in names)
+
+    staged_targets = {entry.target for entry in staged}
+    for entry in planned:
+        if entry.type != "File" or entry.target in plan.targets:
+            continue
+        directory = os.path.dirname(entry.target)
+        while directory.startswith(stagedir + "/") and directory not in staged_targets:
+            directory = os.path.dirname(directory)
+        if directory in staged_targets:
+            # a file staged into a directory input is mounted over it
+            continue
+        plan.links[entry.target] = entry.resolved
+    plan.targets.update(plan.links)
+    return plan
@@ -4,23 +4,23 @@ import functools
 import logging
 import random
 from collections.abc import Callable, Mapping, MutableMapping, MutableSequence
-from typing import cast
+from typing import TYPE_CHECKING, cast
 from uuid import UUID
 
 from mypy_extensions import mypyc_attr
 from ruamel.yaml.comments import CommentedMap
 from schema_salad.exceptions import ValidationException
 from schema_salad.sourceline import SourceLine, indent
+from schema_salad.utils import json_dumps
 
 from . import command_line_tool, context, procgenerator
 from .checker import circular_dependency_checker, loop_checker, static_checker
 from .context import LoadingContext, RuntimeContext, getdefault
-from .cwlprov.provenance_profile import ProvenanceProfile
-from .cwlprov.writablebagfile import create_job
 from .errors import WorkflowException
 from .load_tool import load_tool
 from .loghandler import _logger
 from .process import Process, get_overrides, shortname
+from .timing import span
 from .utils import (
     CWLObjectType,
     JobsGeneratorType,
@@ -30,6 +30,9 @@ from .utils import (
 )
 from .workflow_job import WorkflowJob
 
+if TYPE_CHECKING:
+    from .cwlprov.provenance_profile import ProvenanceProfile
+
 
 def default_make_tool(toolpath_object: CommentedMap, loadingContext: LoadingContext) -> Process:
     """Instantiate the given CWL Process."""
@@ -57,6 +60,33 @@ def default_make_tool(toolpath_object: CommentedMap, loadingContext: LoadingCont
 context.default_make_tool = default_make_tool
 
 
+def load_shared_tool(run: str, loadingContext: LoadingContext) -> Process:
+    """
+    Load the tool referenced by a step, reusing it for identical steps.
+
+    Steps which reference the same document and give it the same
+    requirements, hints and overrides get the same :py:class:`Process`
+    object from :py:attr:`LoadingContext.process_cache`, so the cost of
+    constructing tools scales with the number of distinct tools rather
+    than the number of steps.
+    """
+    if loadingContext.process_cache is None:
+        return load_tool(run, loadingContext)
+    key = json_dumps(
+        [
+            run,
+            loadingContext.requirements,
+            loadingContext.hints,
+            loadingContext.overrides_list,
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    if key not in loadingContext.process_cache:
+        loadingContext.process_cache[key] = load_tool(run, loadingContext)
+    return loadingContext.process_cache[key]
+
+
 @mypyc_attr(serializable=True)
 class Workflow(Process):
     def __init__(
@@ -66,7 +96,7 @@ class Workflow(Process):
     ) -> None:
         """Initialize this Workflow."""
         super().__init__(toolpath_object, loadingContext)
-        self.provenance_object: ProvenanceProfile | None = None
+        self.provenance_object: "ProvenanceProfile | None" = None
         if loadingContext.research_obj is not None:
             run_uuid: UUID | None = None
             is_main = not loadingContext.prov_obj  # Not yet set
@@ -89,6 +119,10 @@ class Workflow(Process):
         loadingContext = loadingContext.copy()
         loadingContext.requirements = self.requirements
         loadingContext.hints = self.hints
+        if loadingContext.process_cache is None and loadingContext.research_obj is None:
+            # Shared by all the (nested) steps of this workflow; not used with
+            # provenance as each Workflow instance records its own run.
+            loadingContext.process_cache = {}
 
         self.steps: list[WorkflowStep] = []
         validation_errors = []
@@ -138,7 +172,7 @@ class Workflow(Process):
         toolpath_object: CommentedMap,
         pos: int,
         loadingContext: LoadingContext,
-        parentworkflowProv: ProvenanceProfile | None = None,
+        parentworkflowProv: "ProvenanceProfile | None" = None,
     ) -> "WorkflowStep":
         return WorkflowStep(toolpath_object, pos, loadingContext, parentworkflowProv)
 
@@ -148,13 +182,18 @@ class Workflow(Process):
         output_callbacks: OutputCallbackType,
         runtimeContext: RuntimeContext,
     ) -> JobsGeneratorType:
-        builder = self._init_job(job_order, runtimeContext)
+        with span("_init_job", runtimeContext.name or shortname(self.tool["id"])):
+            builder = self._init_job(job_order, runtimeContext)
 
         if runtimeContext.research_obj is not None:
             if runtimeContext.toplevel:
                 # Record primary-job.json
+                from .cwlprov.writablebagfile import create_job
+
                 runtimeContext.research_obj.fsaccess = runtimeContext.make_fs_access("")
-                create_job(runtimeContext.research_obj, builder.job)
+                runtimeContext.research_obj.record(
+                    create_job, runtimeContext.research_obj, builder.job
+                )
 
         job = WorkflowJob(self, runtimeContext)
         yield job
@@ -188,7 +227,7 @@ class WorkflowStep(Process):
         toolpath_object: CommentedMap,
         pos: int,
         loadingContext: LoadingContext,
-        parentworkflowProv: ProvenanceProfile | None = None,
+        parentworkflowProv: "ProvenanceProfile | None" = None,
     ) -> None:
         """Initialize this WorkflowStep."""
         debug = loadingContext.debug
@@ -230,7 +269,7 @@ class WorkflowStep(Process):
                 )
             else:
                 loadingContext.metadata = {}
-                self.embedded_tool = load_tool(toolpath_object["run"], loadingContext)
+                self.embedded_tool = load_shared_tool(toolpath_object["run"], loadingContext)
         except ValidationException as vexc:
             if loadingContext.debug:
                 _logger.exception("Validation exception")
@@ -386,7 +425,7 @@ class WorkflowStep(Process):
                     oparam["type"] = {"type": "array", "items": oparam["type"]}
             self.tool["inputs"] = inputparms
             self.tool["outputs"] = outputparms
-        self.prov_obj: ProvenanceProfile | None = None
+        self.prov_obj: "ProvenanceProfile | None" = None
         if loadingContext.research_obj is not None:
             self.prov_obj = parentworkflowProv
             if self.embedded_tool.tool["class"] == "Workflow":
@@ -424,7 +463,8 @@ class WorkflowStep(Process):
         ):
             self.embedded_tool.parent_wf = self.prov_obj
             process_name = self.tool["id"].split("#")[1]
-            self.prov_obj.start_process(
+            runtimeContext.research_obj.record(
+                self.prov_obj.start_process,
                 process_name,
                 datetime.datetime.now(),
                 self.embedded_tool.provenance_object.workflow_run_uri,
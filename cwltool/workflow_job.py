@@ -17,6 +17,7 @@ from .errors import WorkflowException
 from .loghandler import _logger
 from .process import shortname, uniquename
 from .stdfsaccess import StdFsAccess
+from .tracing import Span, start_span, traced_callback
 from .utils import (
     CWLObjectType,
     CWLOutputType,
@@ -29,6 +30,7 @@ from .utils import (
     WorkflowStateItem,
     adjustDirObjs,
     aslist,
+    copy_cwl_object,
     get_listing,
 )
 
@@ -130,6 +132,38 @@ class ReceiveScatterOutput:
             self.output_callback(self.dest, self.processStatus)
 
 
+def scatter_element_job(
+    process: WorkflowJobStep,
+    joborder: CWLObjectType,
+    output_callback: OutputCallbackType,
+    index: int,
+    runtimeContext: RuntimeContext,
+) -> JobsGeneratorType:
+    """Make the jobs of the element ``index`` of a scatter, traced as a span of its own."""
+    if runtimeContext.tracer is None:
+        return process.job(joborder, output_callback, runtimeContext)
+    return _traced_scatter_element_job(process, joborder, output_callback, index, runtimeContext)
+
+
+def _traced_scatter_element_job(
+    process: WorkflowJobStep,
+    joborder: CWLObjectType,
+    output_callback: OutputCallbackType,
+    index: int,
+    runtimeContext: RuntimeContext,
+) -> JobsGeneratorType:
+    # started once the element is due, not when the scatter is set up
+    element_span = start_span(
+        runtimeContext.tracer,
+        "scatter element",
+        runtimeContext.trace_span,
+        {"cwl.step.id": process.id, "cwl.scatter.index": index},
+    )
+    runtimeContext = runtimeContext.copy()
+    runtimeContext.trace_span = element_span
+    yield from process.job(joborder, traced_callback(element_span, output_callback), runtimeContext)
+
+
 def parallel_steps(
     steps: list[JobsGeneratorType | None],
     rc: ReceiveScatterOutput,
@@ -192,7 +226,9 @@ def nested_crossproduct_scatter(
                 sjob = runtimeContext.postScatterEval(sjob)
             curriedcallback = functools.partial(rc.receive_scatter_output, index)
             if sjob is not None:
-                steps.append(process.job(sjob, curriedcallback, runtimeContext))
+                steps.append(
+                    scatter_element_job(process, sjob, curriedcallback, index, runtimeContext)
+                )
             else:
                 curriedcallback({}, "skipped")
                 steps.append(None)
@@ -264,7 +300,9 @@ def _flat_crossproduct_scatter(
                 sjob = runtimeContext.postScatterEval(sjob)
             curriedcallback = functools.partial(callback.receive_scatter_output, put)
             if sjob is not None:
-                steps.append(process.job(sjob, curriedcallback, runtimeContext))
+                steps.append(
+                    scatter_element_job(process, sjob, curriedcallback, put, runtimeContext)
+                )
             else:
                 curriedcallback({}, "skipped")
                 steps.append(None)
@@ -314,7 +352,9 @@ def dotproduct_scatter(
             sjobo = runtimeContext.postScatterEval(sjobo)
         curriedcallback = functools.partial(rc.receive_scatter_output, index)
         if sjobo is not None:
-            steps.append(process.job(sjobo, curriedcallback, runtimeContext))
+            steps.append(
+                scatter_element_job(process, sjobo, curriedcallback, index, runtimeContext)
+            )
         else:
             curriedcallback({}, "skipped")
             steps.append(None)
@@ -368,7 +408,7 @@ def match_types(
         or sinktype == "Any"
     ):
         # simply assign the value from state to input
-        inputobj[iid] = copy.deepcopy(src.value)
+        inputobj[iid] = copy_cwl_object(src.value)
         return True
     return False
 
@@ -525,17 +565,13 @@ class WorkflowJob:
             and self.parent_wf
             and self.prov_obj.workflow_run_uri != self.parent_wf.workflow_run_uri
         ):
-            process_run_id: str | None = None
-            self.prov_obj.generate_output_prov(wo or {}, process_run_id, self.name)
-            self.prov_obj.document.wasEndedBy(
-                self.prov_obj.workflow_run_uri,
-                None,
-                self.prov_obj.engine_uuid,
+            self.prov_obj.research_object.record(
+                self.prov_obj.record_nested_end,
+                self.parent_wf,
+                wo or {},
+                self.name,
                 datetime.datetime.now(),
             )
-            prov_ids = self.prov_obj.finalize_prov_profile(self.name)
-            # Tell parent to associate our provenance files with our wf run
-            self.parent_wf.activity_has_provenance(self.prov_obj.workflow_run_uri, prov_ids)
 
         _logger.info("[%s] completed %s", self.name, self.processStatus)
         if _logger.isEnabledFor(logging.DEBUG):
@@ -596,6 +632,7 @@ class WorkflowJob:
         if step.submitted:
             return
 
+        step_span: Span | None = None
         inputparms = step.tool["inputs"]
         outputparms = step.tool["outputs"]
 
@@ -613,8 +650,28 @@ class WorkflowJob:
 
             _logger.info("[%s] starting %s", self.name, step.name)
 
-            callback = functools.partial(
-                self.receive_output, step, outputparms, final_output_callback
+            step_span = start_span(
+                runtimeContext.tracer,
+                "step",
+                runtimeContext.trace_span,
+                {
+                    "cwl.step.id": step.id,
+                    "cwl.process.id": step.step.embedded_tool.tool["id"],
+                    "cwl.process.class": step.step.embedded_tool.tool["class"],
+                    "cwl.scatter.method": (
+                        step.tool.get("scatterMethod", "dotproduct")
+                        if "scatter" in step.tool
+                        else None
+                    ),
+                },
+            )
+            if step_span is not None:
+                runtimeContext = runtimeContext.copy()
+                runtimeContext.trace_span = step_span
+
+            callback = traced_callback(
+                step_span,
+                functools.partial(self.receive_output, step, outputparms, final_output_callback),
             )
 
             valueFrom = {i["id"]: i["valueFrom"] for i in step.tool["inputs"] if "valueFrom" in i}
@@ -757,11 +814,15 @@ class WorkflowJob:
 
             yield from jobs
         except WorkflowException:
+            if step_span is not None:
+                step_span.end("permanentFail")
             raise
         except Exception:
             _logger.exception("Unhandled exception")
             self.processStatus = "permanentFail"
             step.completed = True
+            if step_span is not None:
+                step_span.end("permanentFail")
 
     def run(
         self,
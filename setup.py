@@ -171,6 +171,7 @@ setup(
             "galaxy-util <25.2",
             "pillow",  # workaround for https://github.com/galaxyproject/galaxy/pull/20525
         ],
+        "zstd": ["zstandard"],
     },
     python_requires=">=3.10, <3.15",
     use_scm_version=True,
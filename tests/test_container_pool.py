@@ -0,0 +1,165 @@
+"""Tests for running jobs in reused software containers."""
+
+from pathlib import Path
+
+import pytest
+
+from cwltool.container_pool import (
+    HOST_ROOT,
+    ContainerPool,
+    Mount,
+    mount_roots,
+    plan_warm_job,
+    warm_container,
+)
+from cwltool.docker import DockerCommandLineJob
+from cwltool.errors import WorkflowException
+
+FAKE_DOCKER = """#!/bin/sh
+echo "$@" >> "{log}"
+case "$1" in
+    run) echo "cid$(wc -l < "{log}" | tr -d ' ')" ;;
+    exec) [ -e "{fail}" ] && echo "no shell" >&2 && exit 1 ;;
+esac
+exit 0
+"""
+
+
+def docker_run(*mounts: tuple[str, str, bool], options: tuple[str, ...] = ()) -> list[str]:
+    runtime = ["docker", "run", "-i"]
+    for source, target, writable in mounts:
+        DockerCommandLineJob.append_volume(runtime, source, target, writable, skip_mkdirs=True)
+    runtime.extend(
+        [
+            "--workdir=/out",
+            "--read-only=true",
+            "--net=none",
+            "--user=1000:1000",
+            "--rm",
+            "--cidfile=/tmp/x.cid",
+            "--env=HOME=/out",
+            *options,
+            "debian:stable",
+        ]
+    )
+    return runtime
+
+
+@pytest.fixture
+def fake_docker(tmp_path: Path) -> Path:
+    docker = tmp_path / "docker"
+    docker.write_text(FAKE_DOCKER.format(log=tmp_path / "docker.log", fail=tmp_path / "fail"))
+    docker.chmod(0o755)
+    return docker
+
+
+def test_plan_warm_job() -> None:
+    """Options are split between the container and each job."""
+    job = plan_warm_job(
+        docker_run(
+            ("/scratch/out123", "/out", True),
+            ("/scratch/tmp456", "/tmp", True),
+            ("/data/a.txt", "/var/lib/cwl/stg1/a.txt", False),
+        )
+    )
+    assert job is not None
+    assert job.image == "debian:stable"
+    assert job.container_options == ("--net=none", "--user=1000:1000")
+    assert job.exec_options == ("--workdir=/out", "--user=1000:1000", "--env=HOME=/out")
+    assert job.mounts[2] == Mount("/data/a.txt", "/var/lib/cwl/stg1/a.txt", False)
+    assert job.roots == (
+        Mount("/data", HOST_ROOT + "/data", False),
+        Mount("/scratch", HOST_ROOT + "/scratch", True),
+    )
+
+    other = plan_warm_job(
+        docker_run(
+            ("/scratch/out789", "/out", True),
+            ("/scratch/tmp012", "/tmp", True),
+            ("/data/b.txt", "/var/lib/cwl/stg2/b.txt", False),
+        )
+    )
+    assert other is not None and other.key == job.key
+    limited = plan_warm_job(docker_run(("/scratch/out", "/out", True), options=("--memory=100m",)))
+    assert limited is not None and limited.key != job.key
+
+
+def test_plan_warm_job_fallback() -> None:
+    """Jobs staging files into another mount, or mounting from /, are not planned."""
+    assert (
+        plan_warm_job(
+            docker_run(("/scratch/out", "/out", True), ("/data/a.txt", "/out/a.txt", False))
+        )
+        is None
+    )
+    assert plan_warm_job(docker_run(("/data", "/var/lib/cwl/data", False))) is None
+    assert plan_warm_job(["singularity", "exec", "image.sif"]) is None
+
+
+def test_mount_roots() -> None:
+    """Nested directories are only mounted again to make them writable."""
+    assert mount_roots(
+        (
+            Mount("/a/b/c.txt", "/x", False),
+            Mount("/a/d/e/f.txt", "/y", False),
+            Mount("/a/d.txt", "/z", False),
+            Mount("/a/g/h", "/w", True),
+        )
+    ) == (
+        Mount("/a", HOST_ROOT + "/a", False),
+        Mount("/a/g", HOST_ROOT + "/a/g", True),
+    )
+
+
+def test_warm_container_reuse(tmp_path: Path, fake_docker: Path) -> None:
+    """Jobs take turns in a container, which is removed on shutdown."""
+    pool = ContainerPool()
+    first = plan_warm_job(
+        docker_run(("/scratch/out1", "/out", True), ("/data/a.txt", "/var/lib/cwl/stg1/a", False))
+    )
+    second = plan_warm_job(
+        docker_run(("/scratch/out2", "/out", True), ("/data/b.txt", "/var/lib/cwl/stg2/b", False))
+    )
+    assert first is not None and second is not None
+    first = first._replace(docker_exe=str(fake_docker))
+    second = second._replace(docker_exe=str(fake_docker))
+
+    container = pool.acquire(first)
+    container.link(first.mounts)
+    pool.release(first, container)
+    assert pool.acquire(second) is container
+    container.link(second.mounts)
+    pool.shutdown()
+
+    log = (tmp_path / "docker.log").read_text().splitlines()
+    assert log[0].startswith("run -d --rm --net=none --user=1000:1000 --mount=")
+    assert log[0].endswith("--entrypoint=tail debian:stable -f /dev/null")
+    assert log[1].startswith("exec --user=0 cid1 /bin/sh -c")
+    assert log[1].endswith(
+        f"{HOST_ROOT}/scratch/out1 /out {HOST_ROOT}/data/a.txt /var/lib/cwl/stg1/a"
+    )
+    assert log[2].endswith(
+        f" /var/lib/cwl/stg1/a {HOST_ROOT}/scratch/out2 /out {HOST_ROOT}/data/b.txt "
+        "/var/lib/cwl/stg2/b"
+    )
+    assert log[3] == "rm --force cid1"
+
+
+def test_warm_container_failure(
+    tmp_path: Path, fake_docker: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """A container that cannot be prepared for a job is not reused."""
+    from cwltool import container_pool
+
+    monkeypatch.setattr(container_pool, "_POOL", ContainerPool())
+    job = plan_warm_job(docker_run(("/scratch/out", "/out", True)))
+    assert job is not None
+    job = job._replace(docker_exe=str(fake_docker))
+    with warm_container(job) as runtime:
+        assert runtime == [str(fake_docker), "exec", "-i", *job.exec_options, "cid1"]
+    (tmp_path / "fail").touch()
+    with pytest.raises(WorkflowException, match="no shell"):
+        with warm_container(job):
+            pass
+    log = (tmp_path / "docker.log").read_text().splitlines()
+    assert log[-1] == "rm --force cid1"
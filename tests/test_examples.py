@@ -29,7 +29,7 @@ from cwltool.context import RuntimeContext
 from cwltool.errors import WorkflowException
 from cwltool.main import main
 from cwltool.process import CWL_IANA
-from cwltool.utils import CWLObjectType, dedup
+from cwltool.utils import CWLObjectType, copy_cwl_object, dedup
 
 from .util import get_data, get_main_output, needs_docker, working_directory
 
@@ -621,6 +621,53 @@ def test_dedupe() -> None:
     assert dedup(not_deduped) == expected
 
 
+def test_copy_cwl_object() -> None:
+    """copy_cwl_object behaves like copy.deepcopy for job orders."""
+    shared = {"class": "File", "location": "file:///example/a"}
+    job = CommentedMap(
+        [
+            ("first", shared),
+            ("second", shared),
+            ("many", CommentedSeq([{"class": "File", "location": "file:///example/b"}])),
+            ("count", 3),
+        ]
+    )
+    job.lc.add_kv_line_col("first", [1, 2, 1, 9])
+
+    result = copy_cwl_object(job)
+
+    assert result == job
+    assert isinstance(result, CommentedMap)
+    assert isinstance(result["many"], CommentedSeq)
+    assert result.lc.data == job.lc.data
+    assert result["first"] is not shared
+    assert result["first"] is result["second"]
+    result["many"][0]["size"] = 1
+    assert "size" not in job["many"][0]
+
+
+def test_large_array_scatter(tmp_path: Path) -> None:
+    """Each scatter job gets its own copy of a large, shared File array."""
+    reads = []
+    for i in range(300):
+        bam = tmp_path / f"sample{i}.bam"
+        bam.touch()
+        (tmp_path / f"sample{i}.bam.bai").touch()
+        reads.append({"class": "File", "location": bam.as_uri()})
+    runtime_context = RuntimeContext()
+    runtime_context.outdir = str(tmp_path / "out")
+    factory = cwltool.factory.Factory(runtime_context=runtime_context)
+    scatter = factory.make(get_data("tests/wf/scatter-large-array.cwl"))
+
+    result = scatter(samples=list(range(10)), reads=reads)
+
+    assert isinstance(result, dict)
+    assert len(result["listings"]) == 10
+    for listing in result["listings"]:
+        assert listing["size"] > 0
+    assert "path" not in reads[0]
+
+
 record = {
     "fields": [
         {
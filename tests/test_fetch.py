@@ -1,11 +1,13 @@
 import os
+import threading
+import time
 from pathlib import Path
 from typing import Any
 from urllib.parse import urljoin, urlsplit
 
 import pytest
 import requests
-from schema_salad.fetcher import Fetcher
+from schema_salad.fetcher import DefaultFetcher, Fetcher
 from schema_salad.utils import CacheType
 
 from cwltool.context import LoadingContext
@@ -86,3 +88,100 @@ def test_resolve_local(path: str, expected_path: str) -> None:
         resolved = resolve_local(None, path)
         assert resolved
         assert resolved == expected
+
+
+class ConcurrencyRecordingFetcher(DefaultFetcher):
+    """Fetcher that records how many documents are being fetched at the same time."""
+
+    lock = threading.Lock()
+    active = 0
+    max_active = 0
+    fetched: list[str] = []
+
+    def fetch_text(self, url: str, content_types: list[str] | None = None) -> str:
+        cls = ConcurrencyRecordingFetcher
+        with cls.lock:
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+            cls.fetched.append(url)
+        try:
+            time.sleep(0.1)
+            return super().fetch_text(url, content_types)
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+
+def _write_wide_workflow(directory: Path, name: str, width: int, run: str) -> None:
+    steps = "\n".join(
+        f"  step{index}:\n    run: {run.format(index=index)}\n    in: {{inp: inp}}\n    out: [out]"
+        for index in range(width)
+    )
+    (directory / name).write_text(
+        "cwlVersion: v1.2\nclass: Workflow\n"
+        "requirements: {SubworkflowFeatureRequirement: {}}\n"
+        "inputs:\n  inp: string\n"
+        "outputs:\n  out:\n    type: string\n    outputSource: step0/out\n"
+        f"steps:\n{steps}\n"
+    )
+
+
+def test_prefetch_run_documents(tmp_path: Path) -> None:
+    """The documents referenced by "run" are fetched concurrently, including nested ones."""
+    echo = Path(get_data("tests/echo.cwl")).read_text().replace("v1.0", "v1.2")
+    for index in range(6):
+        (tmp_path / f"tool{index}.cwl").write_text(echo)
+    _write_wide_workflow(tmp_path, "sub.cwl", 3, "tool{index}.cwl")
+    _write_wide_workflow(tmp_path, "main.cwl", 4, "sub.cwl")
+    (tmp_path / "main.cwl").write_text(
+        (tmp_path / "main.cwl").read_text().replace("run: sub.cwl", "run: tool5.cwl", 1)
+    )
+    ConcurrencyRecordingFetcher.fetched = []
+    ConcurrencyRecordingFetcher.max_active = 0
+
+    tool = load_tool(
+        str(tmp_path / "main.cwl"),
+        LoadingContext(
+            {
+                "construct_tool_object": default_make_tool,
+                "fetcher_constructor": ConcurrencyRecordingFetcher,
+            }
+        ),
+    )
+
+    assert len(tool.tool["steps"]) == 4
+    assert ConcurrencyRecordingFetcher.max_active > 1
+    fetched = ConcurrencyRecordingFetcher.fetched
+    assert {Path(urlsplit(url).path).name for url in fetched} == {
+        "main.cwl",
+        "sub.cwl",
+        "tool0.cwl",
+        "tool1.cwl",
+        "tool2.cwl",
+        "tool5.cwl",
+    }
+    assert len(fetched) == len(set(fetched))
+
+
+def test_prefetch_run_documents_disabled(tmp_path: Path) -> None:
+    """With prefetch_workers <= 1 the documents are fetched one at a time."""
+    echo = Path(get_data("tests/echo.cwl")).read_text().replace("v1.0", "v1.2")
+    for index in range(3):
+        (tmp_path / f"tool{index}.cwl").write_text(echo)
+    _write_wide_workflow(tmp_path, "main.cwl", 3, "tool{index}.cwl")
+    ConcurrencyRecordingFetcher.fetched = []
+    ConcurrencyRecordingFetcher.max_active = 0
+
+    load_tool(
+        str(tmp_path / "main.cwl"),
+        LoadingContext(
+            {
+                "construct_tool_object": default_make_tool,
+                "fetcher_constructor": ConcurrencyRecordingFetcher,
+                "prefetch_workers": 0,
+            }
+        ),
+    )
+
+    assert ConcurrencyRecordingFetcher.max_active == 1
+    assert len(ConcurrencyRecordingFetcher.fetched) == 4
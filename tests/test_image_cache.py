@@ -0,0 +1,229 @@
+"""Tests for coordinating container image acquisition."""
+
+import fcntl
+import json
+import logging
+import socket
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+import cwltool.docker
+from cwltool.image_cache import (
+    SingleFlight,
+    host_image_lock,
+    image_identity,
+    image_registry_path,
+    lookup_image,
+    record_image,
+)
+
+
+def _wait_for_followers(caplog: pytest.LogCaptureFixture, count: int) -> None:
+    deadline = time.monotonic() + 10
+    while sum("Waiting for concurrent" in r.message for r in caplog.records) < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_single_flight_shares_result(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    """Concurrent acquisitions of the same image run only once."""
+    calls: list[str] = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def acquire() -> bool:
+        calls.append("pull")
+        started.set()
+        assert release.wait(10)
+        return True
+
+    caplog.set_level(logging.DEBUG, logger="cwltool")
+    flight: SingleFlight[bool] = SingleFlight()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        leader = pool.submit(flight.run, "debian:stable-slim", acquire, str(tmp_path))
+        assert started.wait(10)
+        followers = [
+            pool.submit(flight.run, "debian:stable-slim", acquire, str(tmp_path)) for _ in range(7)
+        ]
+        _wait_for_followers(caplog, 7)
+        release.set()
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert results == [True] * 8
+    assert calls == ["pull"]
+
+
+def test_single_flight_separate_images(tmp_path: Path) -> None:
+    """Different images are acquired independently, and again once finished."""
+    flight: SingleFlight[str] = SingleFlight()
+    assert flight.run("a", lambda: "a", str(tmp_path)) == "a"
+    assert flight.run("b", lambda: "b", str(tmp_path)) == "b"
+    assert flight.run("a", lambda: "again", str(tmp_path)) == "again"
+
+
+def test_single_flight_shares_exception(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    """A failed acquisition is reported to every waiting job."""
+    started = threading.Event()
+    release = threading.Event()
+
+    def acquire() -> bool:
+        started.set()
+        assert release.wait(10)
+        raise RuntimeError("pull failed")
+
+    caplog.set_level(logging.DEBUG, logger="cwltool")
+    flight: SingleFlight[bool] = SingleFlight()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.run, "img", acquire, str(tmp_path))
+        assert started.wait(10)
+        follower = pool.submit(flight.run, "img", acquire, str(tmp_path))
+        _wait_for_followers(caplog, 1)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError, match="pull failed"):
+                future.result()
+
+
+def test_host_image_lock(tmp_path: Path) -> None:
+    """Other processes can't take the image lock while an acquisition holds it."""
+    with host_image_lock(str(tmp_path), "img"):
+        (lock_path,) = tmp_path.glob("*.lock")
+        with open(lock_path, "a") as other:
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(other.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    with open(lock_path, "a") as other:
+        fcntl.flock(other.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+@pytest.fixture
+def image_registry(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Use an empty image registry."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.delenv("CWLTOOL_IMAGE_CACHE_TTL", raising=False)
+    return Path(image_registry_path())
+
+
+def test_image_registry(image_registry: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Images are remembered, keyed by engine and reference, until they expire."""
+    assert lookup_image("docker", "alpine:3") is None
+    record_image("docker", "alpine:3", {"digest": "sha256:1234"})
+    record_image("podman", "debian:12", {})
+
+    record = lookup_image("docker", "alpine:3")
+    assert record is not None
+    assert record["digest"] == "sha256:1234"
+    assert lookup_image("podman", "alpine:3") is None
+
+    monkeypatch.setenv("CWLTOOL_IMAGE_CACHE_TTL", "0.001")
+    time.sleep(0.01)
+    assert lookup_image("docker", "alpine:3") is None
+    record_image("docker", "busybox", {})
+    assert len(json.loads(image_registry.read_text())) == 1
+
+
+def test_image_registry_per_host(image_registry: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Images seen on another host, or by another daemon, are not trusted."""
+    monkeypatch.delenv("DOCKER_HOST", raising=False)
+    monkeypatch.delenv("CONTAINER_HOST", raising=False)
+    monkeypatch.setattr(socket, "gethostname", lambda: "node-a")
+    record_image("docker", "alpine:3", {})
+    assert lookup_image("docker", "alpine:3") is not None
+    monkeypatch.setenv("DOCKER_HOST", "tcp://builder:2376")
+    assert lookup_image("docker", "alpine:3") is None
+    monkeypatch.delenv("DOCKER_HOST")
+    monkeypatch.setattr(socket, "gethostname", lambda: "node-b")
+    assert lookup_image("docker", "alpine:3") is None
+
+
+def test_image_registry_disabled(image_registry: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """CWLTOOL_IMAGE_CACHE_TTL=0 turns off the image registry."""
+    monkeypatch.setenv("CWLTOOL_IMAGE_CACHE_TTL", "0")
+    record_image("docker", "alpine:3", {})
+    assert lookup_image("docker", "alpine:3") is None
+    assert not image_registry.exists()
+
+
+def test_image_registry_corrupt(image_registry: Path) -> None:
+    """An unreadable registry is ignored and replaced."""
+    image_registry.parent.mkdir(parents=True)
+    image_registry.write_text("{not json")
+    assert lookup_image("docker", "alpine:3") is None
+    record_image("docker", "alpine:3", {})
+    assert lookup_image("docker", "alpine:3") is not None
+
+
+def test_docker_get_image_registry(image_registry: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A recently seen image is not inspected again by the next cwltool run."""
+    inspected: list[list[str]] = []
+
+    def inspect(cmd: list[str]) -> bytes:
+        inspected.append(cmd)
+        return b'[{"Id": "sha256:abcd"}]'
+
+    monkeypatch.setattr(subprocess, "check_output", inspect)
+    monkeypatch.setattr(cwltool.docker, "_IMAGES", set())
+    assert cwltool.docker.get_image("docker", {"dockerPull": "alpine:3"}, True, False, "")
+    assert inspected == [["docker", "inspect", "alpine:3"]]
+    record = lookup_image("docker", "alpine:3")
+    assert record is not None
+    assert record["digest"] == "sha256:abcd"
+
+    # a new cwltool process
+    monkeypatch.setattr(cwltool.docker, "_IMAGES", set())
+    assert cwltool.docker.get_image("docker", {"dockerPull": "alpine:3"}, True, False, "")
+    assert len(inspected) == 1
+    # podman has its own image store
+    monkeypatch.setattr(cwltool.docker, "_IMAGES", set())
+    assert cwltool.docker.get_image("podman", {"dockerPull": "alpine:3"}, True, False, "")
+    assert inspected == [["docker", "inspect", "alpine:3"], ["podman", "inspect", "alpine:3"]]
+
+
+def test_image_identity() -> None:
+    """Only the fields naming the image identify it."""
+    assert image_identity(
+        {"class": "DockerRequirement", "dockerPull": "alpine:3", "dockerOutputDirectory": "/out"}
+    ) == image_identity({"dockerPull": "alpine:3"})
+    assert image_identity({"dockerPull": "alpine:3"}) != image_identity({"dockerLoad": "alpine:3"})
+    assert image_identity({"dockerFile": "FROM alpine:3"}) != image_identity(
+        {"dockerFile": "FROM alpine:latest"}
+    )
+
+
+def test_docker_get_image_shared(
+    image_registry: Path, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Tools needing the same image wait for a single acquisition, whatever their other fields."""
+    inspected: list[list[str]] = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def inspect(cmd: list[str]) -> bytes:
+        inspected.append(cmd)
+        started.set()
+        assert release.wait(10)
+        return b'[{"Id": "sha256:abcd"}]'
+
+    caplog.set_level(logging.DEBUG, logger="cwltool")
+    monkeypatch.setattr(subprocess, "check_output", inspect)
+    monkeypatch.setattr(cwltool.docker, "_IMAGES", set())
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(
+            cwltool.docker.get_image, "docker", {"dockerPull": "alpine:3"}, True, False, ""
+        )
+        assert started.wait(10)
+        requirement = {
+            "class": "DockerRequirement",
+            "dockerPull": "alpine:3",
+            "dockerOutputDirectory": "/out",
+        }
+        second = pool.submit(cwltool.docker.get_image, "docker", requirement, True, False, "")
+        _wait_for_followers(caplog, 1)
+        release.set()
+        assert first.result() and second.result()
+    assert inspected == [["docker", "inspect", "alpine:3"]]
+    assert requirement["dockerOutputDirectory"] == "/out"
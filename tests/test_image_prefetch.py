@@ -0,0 +1,153 @@
+"""Tests for ahead-of-time software container image acquisition."""
+
+import json
+import logging
+import shutil
+import subprocess
+import threading
+import time
+from io import StringIO
+from pathlib import Path
+
+import pytest
+
+import cwltool.docker
+import cwltool.image_prefetch
+from cwltool.context import RuntimeContext
+from cwltool.image_prefetch import ImagePrefetcher, container_requirements
+from cwltool.load_tool import load_tool
+from cwltool.main import main
+from cwltool.workflow import Workflow
+
+TOOL = {
+    "class": "CommandLineTool",
+    "inputs": [],
+    "outputs": [],
+    "baseCommand": "true",
+}
+
+
+def _write_workflow(tmp_path: Path) -> Path:
+    """Three steps: two with the same DockerRequirement, one without."""
+    alpine = dict(TOOL, hints=[{"class": "DockerRequirement", "dockerPull": "alpine:3"}])
+    bare = dict(TOOL)
+    workflow = {
+        "cwlVersion": "v1.2",
+        "class": "Workflow",
+        "inputs": [],
+        "outputs": [],
+        "steps": {
+            "one": {"run": alpine, "in": [], "out": []},
+            "two": {"run": alpine, "in": [], "out": []},
+            "three": {"run": bare, "in": [], "out": []},
+        },
+    }
+    path = tmp_path / "wf.cwl"
+    path.write_text(json.dumps(workflow))
+    return path
+
+
+def test_container_requirements(tmp_path: Path) -> None:
+    """Each distinct image of the workflow is listed once."""
+    tool = load_tool(str(_write_workflow(tmp_path)))
+    runtime_context = RuntimeContext()
+    assert container_requirements(tool, runtime_context) == [
+        {"class": "DockerRequirement", "dockerPull": "alpine:3"}
+    ]
+
+    runtime_context.find_default_container = lambda _tool: "debian:stable-slim"
+    requirements = container_requirements(tool, runtime_context)
+    assert sorted(r["dockerPull"] for r in requirements) == ["alpine:3", "debian:stable-slim"]
+
+
+def test_prefetcher_reports_failures(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A failed image fetch is logged and reported by wait()."""
+    tool = load_tool(str(_write_workflow(tmp_path)))
+
+    def fail(requirement: dict[str, str], runtime_context: RuntimeContext) -> bool:
+        raise RuntimeError("no network")
+
+    monkeypatch.setattr(cwltool.image_prefetch, "acquire_image", fail)
+    assert not ImagePrefetcher(tool, RuntimeContext()).wait()
+
+
+def test_prefetch_images_only(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """--prefetch-images-only fetches every image and runs nothing."""
+    fetched: list[dict[str, str]] = []
+
+    def record(requirement: dict[str, str], runtime_context: RuntimeContext) -> bool:
+        fetched.append(requirement)
+        return True
+
+    monkeypatch.setattr(cwltool.image_prefetch, "acquire_image", record)
+    stdout = StringIO()
+    assert (
+        main(
+            [
+                "--prefetch-images-only",
+                "--default-container",
+                "debian:stable-slim",
+                "--outdir",
+                str(tmp_path / "out"),
+                str(_write_workflow(tmp_path)),
+            ],
+            stdout=stdout,
+        )
+        == 0
+    )
+    assert sorted(r["dockerPull"] for r in fetched) == ["alpine:3", "debian:stable-slim"]
+    assert stdout.getvalue().split() == ["alpine:3", "debian:stable-slim"]
+    assert not (tmp_path / "out").exists()
+
+
+def test_prefetch_images_no_container(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Nothing is fetched when containers are disabled."""
+    monkeypatch.setattr(cwltool.image_prefetch, "acquire_image", pytest.fail)
+    stdout = StringIO()
+    args = ["--prefetch-images-only", "--no-container", str(_write_workflow(tmp_path))]
+    assert main(args, stdout=stdout) == 0
+    assert stdout.getvalue().strip() == ""
+
+
+def test_job_waits_for_prefetch(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    """A job starting while its image is being prefetched waits for that prefetch."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setattr(shutil, "which", lambda _cmd: "/usr/bin/docker")
+    monkeypatch.setattr(cwltool.docker, "_IMAGES", set())
+    inspected: list[list[str]] = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def inspect(cmd: list[str]) -> bytes:
+        inspected.append(cmd)
+        started.set()
+        assert release.wait(10)
+        return b'[{"Id": "sha256:abcd"}]'
+
+    monkeypatch.setattr(subprocess, "check_output", inspect)
+    caplog.set_level(logging.DEBUG, logger="cwltool")
+    tool = load_tool(str(_write_workflow(tmp_path)))
+    prefetcher = ImagePrefetcher(tool, RuntimeContext())
+    assert started.wait(10)
+
+    # as DockerCommandLineJob.get_from_requirements does, with the tool's own requirement
+    assert isinstance(tool, Workflow)
+    docker_req = next(
+        requirement
+        for step in tool.steps
+        if (requirement := step.embedded_tool.get_requirement("DockerRequirement")[0])
+    )
+    job = threading.Thread(
+        target=cwltool.docker.get_image, args=("docker", docker_req, True, False, "")
+    )
+    job.start()
+    deadline = time.monotonic() + 10
+    while not any("Waiting for concurrent" in r.message for r in caplog.records):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    release.set()
+    job.join()
+    assert prefetcher.wait()
+    assert inspected == [["docker", "inspect", "alpine:3"]]
@@ -0,0 +1,112 @@
+"""Tests for the per-job resource usage report."""
+
+import logging
+from pathlib import Path
+
+import pytest
+
+from cwltool.job_metrics import (
+    JobMetrics,
+    format_resource_report,
+    load_job_metrics,
+    summarize_job_metrics,
+)
+from cwltool.main import main
+from cwltool.utils import disk_usage
+
+from .util import get_data
+
+
+def test_metrics_file(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    """Every job of a workflow is recorded, and summarized per tool."""
+    metrics_file = tmp_path / "metrics.jsonl"
+    caplog.set_level(logging.INFO, logger="cwltool")
+    args = [
+        "--outdir",
+        str(tmp_path / "out"),
+        "--metrics-file",
+        str(metrics_file),
+        get_data("tests/wf/scatter-wf4.cwl"),
+        get_data("tests/wf/scatter-job2.json"),
+    ]
+    assert main(args) == 0
+
+    records = list(load_job_metrics(str(metrics_file)))
+    assert len(records) == 2
+    for record in records:
+        assert record["status"] == "success"
+        assert record["tool_id"].endswith("scatter-wf4.cwl#echo")
+        assert record["wall_time"] > 0
+        assert record["staging_time"] >= 0
+        assert record["collection_time"] >= 0
+        assert record["outdir_bytes"] > 0
+        assert record["resources"]["cores"] == 1
+        assert "peak_memory" in record
+    assert "Resources used per tool" in caplog.text
+    assert "scatter-wf4.cwl#echo" in caplog.text
+
+
+def test_resource_report() -> None:
+    """Peak usage is compared with the allocation of each tool."""
+    records: list[JobMetrics] = [
+        {
+            "tool_id": "#bwa",
+            "status": "success",
+            "wall_time": 10,
+            "cpu_time": 35,
+            "peak_memory": 1000 * 2**20,
+            "resources": {"cores": 8, "ram": 16384},
+        },
+        {
+            "tool_id": "#bwa",
+            "status": "success",
+            "wall_time": 10,
+            "cpu_time": 20,
+            "peak_memory": 500 * 2**20,
+            "resources": {"cores": 8, "ram": 16384},
+        },
+        {"tool_id": "#bwa", "status": "permanentFail", "peak_memory": 20000 * 2**20},
+        {"tool_id": "#sort", "status": "permanentFail"},
+    ]
+    bwa, sort = summarize_job_metrics(records)
+    assert (bwa.jobs, bwa.failed) == (2, 1)
+    assert bwa.suggested_ram == 1200
+    assert bwa.cores_used == 3.5
+    assert bwa.suggested_cores == 4
+    assert (sort.jobs, sort.failed) == (0, 1)
+
+    report = format_resource_report([bwa, sort]).splitlines()
+    assert report[0].split() == [
+        "tool",
+        "jobs",
+        "ram",
+        "MiB",
+        "peak",
+        "MiB",
+        "ramMin?",
+        "cores",
+        "used",
+        "coresMin?",
+    ]
+    assert report[1].split() == ["#bwa", "2", "(1", "failed)", "16384", "1000", "1200"] + [
+        "8",
+        "3.50",
+        "4",
+    ]
+    assert report[2].split() == ["#sort", "0", "(1", "failed)"]
+
+
+def test_load_job_metrics_skips_invalid(tmp_path: Path) -> None:
+    """Truncated or foreign lines in the metrics file are ignored."""
+    metrics_file = tmp_path / "metrics.jsonl"
+    metrics_file.write_text('{"name": "a"}\n[1, 2]\n{"name": "b"')
+    assert [record["name"] for record in load_job_metrics(str(metrics_file))] == ["a"]
+
+
+def test_disk_usage(tmp_path: Path) -> None:
+    """Only regular files count, not the symlinks to staged inputs."""
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "output.txt").write_text("x" * 100)
+    (tmp_path / "input.txt").symlink_to(get_data("tests/wf/hello.txt"))
+    assert disk_usage(str(tmp_path)) == 100
+    assert disk_usage(str(tmp_path / "missing")) == 0
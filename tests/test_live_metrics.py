@@ -0,0 +1,114 @@
+"""Tests for the live metrics of the runs in progress."""
+
+import urllib.request
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from cwltool import live_metrics
+from cwltool.executors import MultithreadedJobExecutor
+from cwltool.main import main
+
+from .util import get_data
+
+
+@pytest.fixture
+def metrics() -> Iterator[live_metrics.LiveMetrics]:
+    """Count, for the duration of the test."""
+    yield live_metrics.enable()
+    live_metrics.disable()
+
+
+def test_disabled() -> None:
+    """Nothing is timed unless metrics are enabled."""
+    live_metrics.disable()
+    assert live_metrics.current() is None
+    assert live_metrics.evaluation("$(inputs.x)") is live_metrics._DISABLED
+
+
+def test_render(metrics: live_metrics.LiveMetrics) -> None:
+    """Counters, the histogram of evaluation times, and the executor's gauges are rendered."""
+    executor = MultithreadedJobExecutor(max_parallel=4)
+    executor.max_ram = 2048
+    metrics.executor = executor
+    metrics.job_started(100)
+    metrics.job_started(20)
+    metrics.job_completed("success")
+    metrics.cache_lookup(hit=False)
+    metrics.evaluated(0.002)
+    metrics.evaluated(10.0)
+    with live_metrics.evaluation("plain string"):
+        pass
+    with live_metrics.evaluation("$(inputs.x)"):
+        pass
+
+    lines = metrics.render().splitlines()
+    assert "# TYPE cwltool_jobs_running gauge" in lines
+    assert "cwltool_jobs_running 1" in lines
+    assert 'cwltool_jobs_completed_total{status="success"} 1' in lines
+    assert "cwltool_cache_hits_total 0" in lines
+    assert "cwltool_cache_misses_total 1" in lines
+    assert "cwltool_staged_bytes_total 120" in lines
+    assert 'cwltool_expression_evaluation_seconds_bucket{le="0.001"} 1' in lines
+    assert 'cwltool_expression_evaluation_seconds_bucket{le="0.005"} 2' in lines
+    assert 'cwltool_expression_evaluation_seconds_bucket{le="5"} 2' in lines
+    assert 'cwltool_expression_evaluation_seconds_bucket{le="+Inf"} 3' in lines
+    assert "cwltool_expression_evaluation_seconds_count 3" in lines
+    assert "cwltool_jobs_pending 0" in lines
+    assert "cwltool_max_cores 4" in lines
+    assert "cwltool_allocated_ram_mebibytes 0" in lines
+    assert "cwltool_max_ram_mebibytes 2048" in lines
+
+
+def test_server(metrics: live_metrics.LiveMetrics) -> None:
+    """The metrics are served on /metrics, of any free port."""
+    metrics.cache_lookup(hit=True)
+    server = live_metrics.MetricsServer(0)
+    try:
+        url = f"http://127.0.0.1:{server.server.server_port}/metrics"
+        with urllib.request.urlopen(url) as response:  # nosec
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert "cwltool_cache_hits_total 1" in response.read().decode("utf-8").splitlines()
+    finally:
+        server.close()
+
+
+def test_metrics_textfile(tmp_path: Path) -> None:
+    """The metrics of a run are written to the textfile, at the latest when it ends."""
+    textfile = tmp_path / "cwltool.prom"
+    args = [
+        "--parallel",
+        "--outdir",
+        str(tmp_path / "out"),
+        "--metrics-textfile",
+        str(textfile),
+        get_data("tests/wf/scatter-wf4.cwl"),
+        get_data("tests/wf/scatter-job2.json"),
+    ]
+    assert main(args) == 0
+    assert live_metrics.current() is None
+
+    lines = textfile.read_text().splitlines()
+    assert 'cwltool_jobs_completed_total{status="success"} 2' in lines
+    assert "cwltool_jobs_running 0" in lines
+    assert "cwltool_allocated_cores 0" in lines
+    assert not list(tmp_path.glob("*.partial"))
+
+
+def test_job_setup_failure(tmp_path: Path) -> None:
+    """A job failing before it runs, here without any GPU, is no longer counted as running."""
+    textfile = tmp_path / "cwltool.prom"
+    args = [
+        "--enable-ext",
+        "--no-container",
+        "--outdir",
+        str(tmp_path / "out"),
+        "--metrics-textfile",
+        str(textfile),
+        get_data("tests/wf/nvidia-smi.cwl"),
+    ]
+    assert main(args) != 0
+    lines = textfile.read_text().splitlines()
+    assert "cwltool_jobs_running 0" in lines
+    assert 'cwltool_jobs_completed_total{status="permanentFail"} 1' in lines
@@ -7,13 +7,16 @@ from pathlib import Path
 import pytest
 from schema_salad.exceptions import ValidationException
 
+from cwltool import process
 from cwltool.context import LoadingContext, RuntimeContext
 from cwltool.errors import WorkflowException
 from cwltool.load_tool import load_tool
 from cwltool.loghandler import _logger, configure_logging
-from cwltool.process import use_custom_schema, use_standard_schema
+from cwltool.main import main
+from cwltool.process import shortname, use_custom_schema, use_standard_schema
 from cwltool.update import INTERNAL_VERSION
 from cwltool.utils import CWLObjectType
+from cwltool.workflow import Workflow
 
 from .util import get_data
 
@@ -168,3 +171,92 @@ def test_load_badhints_nodict() -> None:
         match=r".*tests\/wf\/hello-workflow-badhints2\.cwl:41:5:\s*'hints'\s*entries\s*must\s*be\s*dictionaries:\s*<class\s*'int'>\s*42\.",
     ):
         load_tool(uri, loadingContext)
+
+
+def test_compiled_schema_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A compiled schema is written to the user cache and reused by later processes."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.delenv("CWLTOOL_NO_SCHEMA_CACHE", raising=False)
+    monkeypatch.setattr(process, "SCHEMA_CACHE", {})
+    schema = process.get_schema("v1.2")
+    compiled = list((tmp_path / "cwltool" / "schemas").glob("v1.2-*.pickle"))
+    assert len(compiled) == 1
+
+    # simulate a new process: nothing in memory, so it must come from the pickle
+    monkeypatch.setattr(process, "SCHEMA_CACHE", {})
+    monkeypatch.setattr(
+        process, "load_schema", lambda *args, **kwargs: pytest.fail("schema was recompiled")
+    )
+    reloaded = process.get_schema("v1.2")
+    assert reloaded is not schema
+    assert set(reloaded[1].names) == set(schema[1].names)  # type: ignore[union-attr]
+    assert "https://w3id.org/cwl/cwl#File" in reloaded[3].idx
+
+
+def test_compiled_schema_cache_custom(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Using a custom schema compiles and caches a different schema."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.delenv("CWLTOOL_NO_SCHEMA_CACHE", raising=False)
+    monkeypatch.setattr(process, "SCHEMA_CACHE", {})
+    monkeypatch.setattr(process, "custom_schemas", {})
+    process.get_schema("v1.2")
+    with open(get_data("extensions-v1.2.yml")) as res:
+        use_custom_schema("v1.2", "http://commonwl.org/cwltool", res.read())
+    custom = process.get_schema("v1.2")
+    assert "org.commonwl.cwltool.CUDARequirement" in custom[1].names  # type: ignore
+    assert len(list((tmp_path / "cwltool" / "schemas").glob("v1.2-*.pickle"))) == 2
+
+    use_standard_schema("v1.2")
+    standard = process.get_schema("v1.2")
+    assert "org.commonwl.cwltool.CUDARequirement" not in standard[1].names  # type: ignore
+
+
+def test_compiled_schema_cache_disabled(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """CWLTOOL_NO_SCHEMA_CACHE disables the on-disk schema cache."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.setenv("CWLTOOL_NO_SCHEMA_CACHE", "1")
+    monkeypatch.setattr(process, "SCHEMA_CACHE", {})
+    process.get_schema("v1.2")
+    assert not (tmp_path / "cwltool" / "schemas").exists()
+
+
+def test_shared_step_tools(tmp_path: Path) -> None:
+    """Steps running the same tool with the same requirements share one Process."""
+    echo = Path(get_data("tests/echo.cwl")).read_text().replace("v1.0", "v1.2")
+    (tmp_path / "echo.cwl").write_text(echo)
+    (tmp_path / "wf.cwl").write_text("""
+cwlVersion: v1.2
+class: Workflow
+inputs:
+  inp: string
+outputs:
+  out1: {type: string, outputSource: step1/out}
+  out2: {type: string, outputSource: step2/out}
+  out3: {type: string, outputSource: step3/out}
+steps:
+  step1:
+    run: echo.cwl
+    in: {inp: inp}
+    out: [out]
+  step2:
+    run: echo.cwl
+    in: {inp: inp}
+    out: [out]
+  step3:
+    run: echo.cwl
+    requirements:
+      EnvVarRequirement:
+        envDef: {TEST: "1"}
+    in: {inp: inp}
+    out: [out]
+""")
+    tool = load_tool(str(tmp_path / "wf.cwl"), LoadingContext())
+    assert isinstance(tool, Workflow)
+    steps = {shortname(step.id): step.embedded_tool for step in tool.steps}
+    assert steps["step1"] is steps["step2"]
+    assert steps["step1"] is not steps["step3"]
+    assert steps["step3"].get_requirement("EnvVarRequirement")[0]
+    assert not steps["step1"].get_requirement("EnvVarRequirement")[0]
+
+    out = tmp_path / "out"
+    assert main(["--outdir", str(out), str(tmp_path / "wf.cwl"), "--inp", "hello"]) == 0
@@ -1,5 +1,8 @@
 """Tests for various command line options."""
 
+import subprocess
+import sys
+
 import pytest
 
 from cwltool.utils import versionstring
@@ -14,6 +17,59 @@ def test_version() -> None:
     assert versionstring() in stdout
 
 
+# How much longer than importing schema_salad.schema (which cwltool always needs)
+# importing cwltool.main may take. Measuring relative to a dependency keeps the
+# check independent of the speed and load of the machine; it is deliberately
+# generous so it only catches large regressions, such as a heavy optional
+# dependency being imported unconditionally again.
+IMPORT_TIME_BUDGET = 4
+
+# Optional subsystems that must only be imported when their options are used.
+LAZY_MODULES = (
+    "bagit",
+    "cwltool.cwlprov.provenance_profile",
+    "cwltool.cwlprov.ro",
+    "cwltool.cwlprov.writablebagfile",
+    "cwltool.cwlrdf",
+    "cwltool.cwlviewer",
+    "cwltool.pack",
+    "cwltool.singularity",
+    "cwltool.subgraph",
+    "cwltool.udocker",
+    "http.server",
+    "prov.model",
+    "pydot",
+    "spython",
+)
+
+
+def _cumulative_import_times(args: list[str]) -> dict[str, int]:
+    """Run Python with "-X importtime" and return the cumulative import time of each module."""
+    result = subprocess.run(  # nosec
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumul, module = line[len("import time:") :].split("|")
+        if cumul.strip().isdigit():
+            cumulative[module.strip()] = int(cumul)
+    return cumulative
+
+
+def test_version_import_time() -> None:
+    """--version does not import optional subsystems and stays within the import budget."""
+    baseline = _cumulative_import_times(["-c", "import schema_salad.schema"])
+    cumulative = _cumulative_import_times(["-m", "cwltool", "--version"])
+    assert "cwltool.main" in cumulative
+    assert not [module for module in LAZY_MODULES if module in cumulative]
+    assert cumulative["cwltool.main"] < IMPORT_TIME_BUDGET * baseline["schema_salad.schema"]
+
+
 def test_print_supported_versions() -> None:
     """Test --print-supported-versions."""
     return_code, stdout, stderr = get_main_output(["--print-supported-versions"])
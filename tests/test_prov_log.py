@@ -0,0 +1,132 @@
+"""Tests for the append-only log of PROV records."""
+
+import datetime
+import io
+import json
+from pathlib import Path
+
+import pytest
+from prov.identifier import Namespace
+from prov.model import PROV, PROV_TYPE, ProvDocument
+from rdflib.graph import ConjunctiveGraph
+
+import cwltool.cwlprov.prov_log
+from cwltool.cwlprov.prov_log import ProvLog, serialize_prov_log
+
+EX = Namespace("ex", "http://example.com/")
+
+
+def new_document(namespaces: ProvDocument | None = None) -> ProvDocument:
+    if namespaces is not None:
+        return ProvDocument(namespaces=namespaces.namespaces)
+    document = ProvDocument()
+    document.add_namespace(EX)
+    document.add_namespace("id", "urn:uuid:")
+    return document
+
+
+@pytest.fixture
+def logged(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> tuple[ProvLog, ProvDocument]:
+    """Log a few events, returning the log and the same records in one document."""
+    monkeypatch.setattr(cwltool.cwlprov.prov_log, "CHUNK_SIZE", 2)
+    prov_log = ProvLog(str(tmp_path / "run.ndjson"))
+    whole = new_document()
+    window = new_document()
+    run = "urn:uuid:8e5bc4ad-bd22-4cf1-8d06-3e8b5f1e1d0c"
+    for document in (whole, window):
+        document.activity(run, None, None, {PROV_TYPE: PROV["Activity"]})
+    prov_log.append(window)
+    for number in range(3):
+        window = new_document(window)
+        for document in (whole, window):
+            document.entity(f"ex:input{number}", {"ex:size": number})
+            document.used(run, f"ex:input{number}", datetime.datetime(2024, 1, 1, 0, number))
+        prov_log.append(window)
+    window = new_document(window)
+    for document in (whole, window):
+        document.bundle(EX["folder"]).entity("ex:input0", {"ex:name": "a.txt"})
+    prov_log.append(window)
+
+    window = new_document(window)
+    for document in (whole, window):
+        for record in prov_log.get_record(document, run):
+            record.add_attributes({"ex:peakMemory": 1024})
+    prov_log.append(window)
+    prov_log.close()
+    return prov_log, whole
+
+
+def test_log_lines(logged: tuple[ProvLog, ProvDocument]) -> None:
+    """Each line holds only new records, and namespaces once."""
+    prov_log, _ = logged
+    lines = [json.loads(line) for line in Path(prov_log.path).read_text().splitlines()]
+    assert len(lines) == 6
+    assert "prefix" in lines[0]
+    assert all("prefix" not in line for line in lines[1:])
+    assert lines[-1] == {
+        "activity": {
+            "id:8e5bc4ad-bd22-4cf1-8d06-3e8b5f1e1d0c": {
+                "ex:peakMemory": {"$": 1024, "type": "xsd:int"}
+            }
+        }
+    }
+    used = [identifier for line in lines for identifier in line.get("used", {})]
+    assert used == ["_:id1", "_:id2", "_:id3"]
+
+
+def test_unknown_record(tmp_path: Path) -> None:
+    """Identifiers neither pending nor logged have no records."""
+    prov_log = ProvLog(str(tmp_path / "run.ndjson"))
+    assert (
+        prov_log.get_record(new_document(), "urn:uuid:0b2d8ad8-5d65-4d4c-a2c3-5b3f6e4fd1a2") == []
+    )
+
+
+@pytest.mark.parametrize("prov_format", ["json", "xml"])
+def test_serialize(logged: tuple[ProvLog, ProvDocument], prov_format: str) -> None:
+    """Logs converted in chunks hold the same records as the whole document."""
+    prov_log, whole = logged
+    stream = io.StringIO()
+    serialize_prov_log(prov_log.path, stream, prov_format)
+    converted = ProvDocument.deserialize(content=stream.getvalue(), format=prov_format)
+    assert converted.unified() == whole.unified()
+
+
+def test_serialize_provn(logged: tuple[ProvLog, ProvDocument]) -> None:
+    """Bundles follow all the other records in PROV-N."""
+    prov_log, _ = logged
+    stream = io.StringIO()
+    serialize_prov_log(prov_log.path, stream, "provn")
+    provn = stream.getvalue()
+    assert provn.startswith("document\n  prefix ex <http://example.com/>")
+    assert provn.endswith("endBundle\nendDocument")
+    assert provn.index("bundle ex:folder") > provn.rindex("activity(")
+    assert provn.count("used(") == 3
+
+
+@pytest.mark.parametrize(
+    "rdf_format,parse_format", [("turtle", "turtle"), ("ntriples", "nt"), ("json-ld", "json-ld")]
+)
+def test_serialize_rdf(
+    logged: tuple[ProvLog, ProvDocument], rdf_format: str, parse_format: str
+) -> None:
+    """Chunks of RDF are combined into one graph."""
+    prov_log, whole = logged
+    stream = io.StringIO()
+    serialize_prov_log(prov_log.path, stream, "rdf", rdf_format=rdf_format)
+    converted = ConjunctiveGraph()
+    converted.parse(data=stream.getvalue(), format=parse_format)
+    expected = ConjunctiveGraph()
+    expected.parse(data=str(whole.serialize(format="rdf", rdf_format="nt")), format="nt")
+    # the same statements, about different blank nodes
+    assert sorted(map(str, converted.predicates())) == sorted(map(str, expected.predicates()))
+
+
+def test_incomplete_log(logged: tuple[ProvLog, ProvDocument]) -> None:
+    """A line cut short by a crash is ignored."""
+    prov_log, _ = logged
+    with open(prov_log.path, "a") as log:
+        log.write('{"entity":{"ex:cut')
+    stream = io.StringIO()
+    serialize_prov_log(prov_log.path, stream, "json")
+    assert "ex:input2" in json.loads(stream.getvalue())["entity"]
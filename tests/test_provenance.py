@@ -1,8 +1,11 @@
+import hashlib
 import json
 import os
 import pickle
+import shutil
 import sys
 import urllib
+import zipfile
 from collections.abc import Generator
 from pathlib import Path
 from typing import IO, Any, cast
@@ -20,6 +23,7 @@ from cwltool.cwlprov.ro import ResearchObject
 from cwltool.cwlprov.writablebagfile import close_ro, write_bag_file
 from cwltool.main import main
 from cwltool.stdfsaccess import StdFsAccess
+from cwltool.utils import CWLObjectType
 
 from .util import get_data, needs_docker, working_directory
 
@@ -274,6 +278,31 @@ def test_no_data_files(tmp_path: Path, with_orcid: bool) -> None:
     check_bagit(folder)
 
 
+def test_zip_archive(tmp_path: Path) -> None:
+    """The research object is saved as a ZIP archive of the bag."""
+    archive = tmp_path / "hello.zip"
+    tmp_dir = tmp_path / "cwltool-run"
+    tmp_dir.mkdir()
+    with working_directory(tmp_dir):
+        status = main(
+            [
+                "--enable-user-provenance",
+                "--enable-host-provenance",
+                "--provenance",
+                str(archive),
+                get_data("tests/wf/hello_single_tool.cwl"),
+                "--message",
+                "Hello tool",
+            ]
+        )
+    assert status == 0
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["cwltool-run", "hello.zip"]
+    with zipfile.ZipFile(archive) as zipped:
+        assert zipped.testzip() is None
+        zipped.extractall(tmp_path)
+    check_provenance(tmp_path / "hello", single_tool=True)
+
+
 def check_output_object(base_path: Path) -> None:
     output_obj = base_path / "workflow" / "primary-output.json"
     compare_checksum = "sha1$b9214658cc453331b62c2282b772a5c063dbd284"
@@ -719,6 +748,7 @@ def test_writable_string(research_object: ResearchObject) -> None:
     with write_bag_file(research_object, "file.txt") as fh:
         assert fh.writable()
         fh.write("Hello\n")
+    research_object.flush()
 
     sha1 = os.path.join(research_object.folder, "tagmanifest-sha1.txt")
     assert os.path.isfile(sha1)
@@ -764,6 +794,8 @@ def test_data(research_object: ResearchObject) -> None:
         assert fh.writable()
         fh.write("Hello\n")
 
+    research_object.flush()
+
     # Because this is under data/ it should add to manifest
     # rather than tagmanifest
     sha1 = os.path.join(research_object.folder, "manifest-sha1.txt")
@@ -773,6 +805,33 @@ def test_data(research_object: ResearchObject) -> None:
         assert stripped_sha.endswith("data/file.txt")
 
 
+def test_manifests_kept_open(research_object: ResearchObject, tmp_path: Path) -> None:
+    """Manifest lines are buffered in one open file per manifest, with all checksums."""
+    tag_file = Path(research_object.folder) / "metadata" / "notes.txt"
+    tag_file.write_text("Hello\n")
+    research_object.add_tagfile(str(tag_file))
+    with write_bag_file(research_object, "metadata/more.txt") as fh:
+        fh.write("Hello\n")
+    assert sorted(research_object._manifests) == [
+        "tagmanifest-sha1.txt",
+        "tagmanifest-sha256.txt",
+        "tagmanifest-sha512.txt",
+    ]
+    research_object.flush()
+    sha512 = Path(research_object.folder, "tagmanifest-sha512.txt").read_text().splitlines()
+    assert [line.split()[1] for line in sha512] == ["metadata/notes.txt", "metadata/more.txt"]
+    assert sha512[0].split()[0] == hashlib.sha512(b"Hello\n").hexdigest()
+
+    source = tmp_path / "data.txt"
+    source.write_text("Hello\n")
+    with source.open("rb") as fh:
+        rel_path = research_object.add_data_file(fh)
+    research_object.flush()
+    manifest = Path(research_object.folder, "manifest-sha1.txt").read_text()
+    sha1 = hashlib.sha1(b"Hello\n").hexdigest()  # nosec
+    assert manifest == f"{sha1}  {rel_path}\n"
+
+
 def test_not_seekable(research_object: ResearchObject) -> None:
     with write_bag_file(research_object, "file.txt") as fh:
         assert not fh.seekable()
@@ -880,3 +939,146 @@ def test_research_object() -> None:
 def test_research_object_picklability(research_object: ResearchObject) -> None:
     """Research object may need to be pickled (for Toil)."""
     assert pickle.dumps(research_object) is not None
+
+
+def test_resource_usage(tmp_path: Path) -> None:
+    """The resources used by each step are recorded on its process run."""
+    folder = cwltool(
+        tmp_path,
+        "--no-container",
+        get_data("tests/wf/hello-workflow.cwl"),
+        "--usermessage",
+        "Hello workflow",
+    )
+    provn = (folder / "metadata" / "provenance" / "primary.cwlprov.provn").read_text()
+    assert "cwlprov:peakMemory=" in provn
+    assert "cwlprov:cpuTime=" in provn
+
+
+@pytest.mark.parametrize("data_mode", ["reference", "link"])
+def test_provenance_data_mode(tmp_path: Path, data_mode: str) -> None:
+    """Input data is linked or listed in fetch.txt, while temporary files are copied."""
+    folder = cwltool(
+        tmp_path,
+        "--no-container",
+        "--provenance-data",
+        data_mode,
+        get_data("tests/wf/revsort.cwl"),
+        get_data("tests/wf/revsort-job.json"),
+    )
+    check_output_object(folder)
+    # whale.txt, the input
+    whale = folder / "data" / "32" / "327fc7aedf4f6b69a42a7c8b808dc5a7aff61376"
+    # the reversed and sorted outputs of the steps
+    for output in (
+        "97/97fe1b50b4582cebc7d853796ebd62e3e163aa3f",
+        "b9/b9214658cc453331b62c2282b772a5c063dbd284",
+    ):
+        assert (folder / "data" / output).is_file()
+    bag = bagit.Bag(str(folder))
+    fetched = {path: (url, size) for url, size, path in bag.fetch_entries()}
+    if data_mode == "link":
+        # the input is on the same filesystem as the RO, in this test
+        assert not fetched
+        assert whale.stat().st_nlink > 1
+        check_bagit(folder)
+        return
+
+    assert not whale.exists()
+    assert fetched == {
+        str(whale.relative_to(folder)): (Path(get_data("tests/wf/whale.txt")).as_uri(), "1111")
+    }
+    manifest = json.loads((folder / "metadata" / "manifest.json").read_text())
+    retrieved = [agg["retrievedFrom"] for agg in manifest["aggregates"] if "retrievedFrom" in agg]
+    assert retrieved == [Path(get_data("tests/wf/whale.txt")).as_uri()]
+
+    # once fetched, the bag is complete
+    whale.parent.mkdir()
+    shutil.copy(get_data("tests/wf/whale.txt"), whale)
+    check_bagit(folder)
+
+
+def test_revsort_workflow_in_background(tmp_path: Path) -> None:
+    """Provenance recorded in the background is as complete as when recorded as the workflow runs."""
+    folder = cwltool(
+        tmp_path,
+        "--no-container",
+        "--provenance-workers",
+        "2",
+        get_data("tests/wf/revsort.cwl"),
+        get_data("tests/wf/revsort-job.json"),
+    )
+    check_output_object(folder)
+    check_provenance(folder)
+
+
+def test_declare_once(research_object: ResearchObject, tmp_path: Path) -> None:
+    """The same file with secondaryFiles, or directory, is one entity however often used."""
+    (tmp_path / "ref").mkdir()
+    for name, content in (("ref.fa", "ACGT"), ("ref.fa.fai", "ref\t4"), ("notes.txt", "hg")):
+        (tmp_path / "ref" / name).write_text(content)
+    profile = research_object.initialize_provenance("", False, False, "", research_object.fsaccess)
+
+    def file(name: str, **fields: Any) -> CWLObjectType:
+        path = tmp_path / "ref" / name
+        checksum = hashlib.sha1(path.read_bytes()).hexdigest()  # nosec
+        return {
+            "class": "File",
+            "location": path.as_uri(),
+            "basename": name,
+            "checksum": f"sha1${checksum}",
+            **fields,
+        }
+
+    def reference() -> CWLObjectType:
+        return file("ref.fa", secondaryFiles=[file("ref.fa.fai")])
+
+    first, second = reference(), reference()
+    entity = profile.declare_artefact(first)
+    assert profile.declare_artefact(second).identifier == entity.identifier
+    assert first["@id"] == second["@id"]
+    assert (
+        cast(list[CWLObjectType], first["secondaryFiles"])[0]["@id"]
+        == cast(list[CWLObjectType], second["secondaryFiles"])[0]["@id"]
+    )
+    renamed = reference()
+    renamed["basename"] = "genome.fa"
+    assert profile.declare_artefact(renamed).identifier != entity.identifier
+
+    def folder(**fields: Any) -> CWLObjectType:
+        return {
+            "class": "Directory",
+            "location": (tmp_path / "ref").as_uri(),
+            "basename": "ref",
+            **fields,
+        }
+
+    # only the directories listed with checksums are known to be the same
+    unlisted = profile.declare_directory(folder())
+    assert profile.declare_directory(folder()).identifier != unlisted.identifier
+    listed = profile.declare_directory(folder(listing=[reference(), file("notes.txt")]))
+    assert profile.declare_directory(
+        folder(listing=[file("notes.txt"), reference()])
+    ).identifier == (listed.identifier)
+
+    profile._flush()
+    research_object.flush()
+    lines = Path(profile.prov_log.path).read_text().splitlines()
+    basenames = [
+        attributes["cwlprov:basename"]
+        for line in lines
+        for records in json.loads(line).get("entity", {}).values()
+        for attributes in (records if isinstance(records, list) else [records])
+        if "cwlprov:basename" in attributes
+    ]
+    # the directory listed on its own has ref.fa without its secondaryFiles
+    assert sorted(basenames) == [
+        "genome.fa",
+        "notes.txt",
+        "ref",
+        "ref",
+        "ref",
+        "ref.fa",
+        "ref.fa",
+        "ref.fa.fai",
+    ]
@@ -0,0 +1,85 @@
+"""Tests for recording provenance in the background."""
+
+import threading
+from collections.abc import Generator
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from cwltool.cwlprov.ro import ResearchObject
+from cwltool.cwlprov.writablebagfile import close_ro
+from cwltool.stdfsaccess import StdFsAccess
+
+
+@pytest.fixture
+def research_object(tmp_path: Path) -> Generator[ResearchObject, None, None]:
+    re_ob = ResearchObject(
+        StdFsAccess(str(tmp_path / "ro")), temp_prefix_ro=str(tmp_path / "tmp"), workers=2
+    )
+    yield re_ob
+    close_ro(re_ob)
+
+
+def test_events_in_order(research_object: ResearchObject) -> None:
+    """Events are applied in order, off the thread recording them."""
+    applied: list[tuple[int, str]] = []
+    release = threading.Event()
+
+    def event(number: int) -> None:
+        release.wait()
+        applied.append((number, threading.current_thread().name))
+
+    for number in range(10):
+        research_object.record(event, number)
+    assert applied == []
+    release.set()
+    research_object.flush()
+    assert [number for number, _ in applied] == list(range(10))
+    assert {name for _, name in applied} == {"cwltool-provenance-recorder"}
+
+
+def test_objects_copied(research_object: ResearchObject) -> None:
+    """Events get copies of CWL objects, with the same ``@id`` as the originals."""
+    seen: list[Any] = []
+    outputs: dict[str, Any] = {
+        "record": {"file": {"class": "File", "location": "_:literal", "contents": "x"}},
+        "number": 1,
+    }
+    research_object.record(seen.append, outputs)
+    outputs["number"] = 2
+    research_object.flush()
+    assert seen[0] is not outputs
+    assert seen[0]["number"] == 1
+    assert seen[0]["record"]["@id"] == outputs["record"]["@id"]
+    assert seen[0]["record"]["file"]["@id"] == outputs["record"]["file"]["@id"]
+    assert "@id" not in outputs
+
+
+def test_data_files_prefetched(research_object: ResearchObject, tmp_path: Path) -> None:
+    """The files of an event are added to the research object concurrently, once."""
+    data = tmp_path / "data.txt"
+    data.write_text("Hello")
+    file = {"class": "File", "location": data.as_uri()}
+    research_object.record(lambda outputs: None, {"out": file})
+    research_object.flush()
+    assert research_object.has_data_file("f7ff9e8b7bb2e09b70935a5d785e0cc5d9d0abf0")
+    assert research_object.recorder is not None
+    rel_path = research_object.recorder.data_file(file["location"], research_object.fsaccess)
+    assert rel_path == "data/f7/f7ff9e8b7bb2e09b70935a5d785e0cc5d9d0abf0"
+
+
+def test_failed_event(research_object: ResearchObject) -> None:
+    """An error stops recording, and is raised to the workflow."""
+    applied: list[int] = []
+
+    def fail() -> None:
+        raise ValueError("broken")
+
+    research_object.record(fail)
+    research_object.record(applied.append, 1)
+    with pytest.raises(ValueError):
+        research_object.flush()
+    assert applied == []
+    with pytest.raises(ValueError):
+        research_object.record(applied.append, 2)
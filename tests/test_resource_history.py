@@ -0,0 +1,84 @@
+"""Tests for adapting resource allocations to the usage of previous runs."""
+
+import json
+from io import StringIO
+from pathlib import Path
+
+from cwltool.main import main
+from cwltool.resource_history import ResourceHistory, input_size_bucket
+
+TOOL = {
+    "cwlVersion": "v1.2",
+    "class": "CommandLineTool",
+    "requirements": [{"class": "ResourceRequirement", "ramMin": 100, "ramMax": 1000}],
+    "inputs": [],
+    "outputs": {"ram": {"type": "stdout"}},
+    "baseCommand": "echo",
+    "arguments": ["$(runtime.ram)"],
+}
+
+
+def test_input_size_bucket(tmp_path: Path) -> None:
+    """Jobs are classified by the order of magnitude of their total input size."""
+    data = tmp_path / "data.bin"
+    data.write_bytes(b"x" * 1000)
+    assert input_size_bucket({"n": 1}) == 0
+    assert input_size_bucket({"a": {"class": "File", "size": 1000}}) == 10
+    assert input_size_bucket({"a": {"class": "File", "location": data.as_uri()}}) == 10
+    assert (
+        input_size_bucket(
+            {"a": [{"class": "File", "size": 1000}, {"class": "File", "path": str(data)}]}
+        )
+        == 11
+    )
+
+
+def test_predict(tmp_path: Path) -> None:
+    """Predictions need a few observations, and include a safety margin."""
+    history = ResourceHistory(str(tmp_path / "history" / "db.sqlite"))
+    for ram in (100, 300):
+        history.record("#tool", 10, ram, 0.5)
+    assert history.predict("#tool", 10) is None
+    history.record("#tool", 10, 200, 1.5)
+    assert history.predict("#tool", 10) == (375, 2)
+    assert history.predict("#tool", 11) is None
+    assert history.predict("#other", 10) is None
+
+
+def test_adjust(tmp_path: Path) -> None:
+    """Only the maximums are lowered, never below the minimums."""
+    history = ResourceHistory(str(tmp_path / "db.sqlite"))
+    for _ in range(3):
+        history.record("#tool", 0, 400, 1)
+    request: dict[str, int | float] = {"ramMin": 256, "ramMax": 8192, "coresMin": 2, "coresMax": 8}
+    history.adjust("#tool", {}, request)
+    assert request == {"ramMin": 256, "ramMax": 500, "coresMin": 2, "coresMax": 2}
+
+    request = {"ramMin": 1024, "ramMax": 1024, "coresMin": 1, "coresMax": 1}
+    history.adjust("#tool", {}, request)
+    assert request == {"ramMin": 1024, "ramMax": 1024, "coresMin": 1, "coresMax": 1}
+
+
+def test_adaptive_resources(tmp_path: Path) -> None:
+    """With --parallel, later jobs of a tool get what earlier ones used."""
+    tool = tmp_path / "tool.cwl"
+    tool.write_text(json.dumps(TOOL))
+    history = tmp_path / "history.sqlite"
+
+    def allocated_ram() -> int:
+        stdout = StringIO()
+        args = [
+            "--parallel",
+            "--adaptive-resources",
+            "--resource-history",
+            str(history),
+            "--outdir",
+            str(tmp_path / "out"),
+            str(tool),
+        ]
+        assert main(args, stdout=stdout) == 0
+        with open(json.loads(stdout.getvalue())["ram"]["path"]) as ram:
+            return int(ram.read())
+
+    assert [allocated_ram() for _ in range(3)] == [1000, 1000, 1000]
+    assert allocated_ram() == 100
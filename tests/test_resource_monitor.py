@@ -0,0 +1,234 @@
+"""Tests for measuring the resources used by jobs."""
+
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import psutil
+import pytest
+from schema_salad.avro import schema
+
+import cwltool.job
+import cwltool.resource_monitor
+from cwltool.builder import Builder
+from cwltool.command_line_tool import CommandLineTool
+from cwltool.docker import DockerCommandLineJob
+from cwltool.resource_monitor import (
+    CgroupStats,
+    ResourceSampler,
+    ResourceUsage,
+    container_cgroup,
+    process_cgroup,
+    wait_for_cidfile,
+)
+from cwltool.stdfsaccess import StdFsAccess
+from cwltool.update import INTERNAL_VERSION
+
+CID = "0123456789abcdef"
+
+
+def _write_cgroup(path: Path, memory: int, peak: int | None = None) -> Path:
+    path.mkdir(parents=True, exist_ok=True)
+    (path / "cgroup.procs").write_text("")
+    (path / "memory.current").write_text(f"{memory}\n")
+    if peak is not None:
+        (path / "memory.peak").write_text(f"{peak}\n")
+    (path / "cpu.stat").write_text("usage_usec 2500000\nuser_usec 2000000\nsystem_usec 500000\n")
+    (path / "io.stat").write_text(
+        "8:0 rbytes=1024 wbytes=4096 rios=1 wios=2 dbytes=0 dios=0\n"
+        "8:16 rbytes=1024 wbytes=0 rios=1 wios=0 dbytes=0 dios=0\n"
+    )
+    return path
+
+
+def test_cgroup_stats(tmp_path: Path) -> None:
+    """Memory, CPU time, and I/O are read from the cgroup v2 interface files."""
+    cgroup = _write_cgroup(tmp_path / "job", 2**20, peak=3 * 2**20)
+    usage = ResourceUsage()
+    assert CgroupStats(str(cgroup)).sample(usage)
+    assert usage.peak_memory == 3 * 2**20
+    assert usage.cpu_time == 2.5
+    assert (usage.read_bytes, usage.write_bytes) == (2048, 4096)
+    assert [sample.memory for sample in usage.samples] == [2**20]
+
+    (cgroup / "memory.peak").unlink()
+    (cgroup / "memory.current").write_text(f"{4 * 2**20}\n")
+    assert CgroupStats(str(cgroup)).sample(usage)
+    assert usage.peak_memory == 4 * 2**20
+
+    assert not CgroupStats(str(tmp_path / "gone")).sample(usage)
+    assert len(usage.samples) == 2
+
+
+def test_resource_usage_thinning(monkeypatch: pytest.MonkeyPatch) -> None:
+    """The time series of long running jobs is thinned out instead of growing."""
+    monkeypatch.setattr(cwltool.resource_monitor, "MAX_SAMPLES", 10)
+    usage = ResourceUsage()
+    for memory in range(100):
+        usage.add(memory)
+    assert len(usage.samples) <= 10
+    assert usage.samples[0].memory == 0
+    assert usage.samples[-1].memory > 80
+    assert usage.peak_memory == 99
+
+
+CHILD_SCRIPT = """
+import subprocess, sys, time
+data = bytearray(32 * 2**20)
+child = subprocess.Popen(
+    [sys.executable, "-c", "import time; data = bytearray(32 * 2**20); time.sleep(30)"]
+)
+sys.stdout.write("ready\\n")
+sys.stdout.flush()
+child.wait()
+"""
+
+
+def test_sampler_process_tree() -> None:
+    """The memory of every process in a job's process tree is added up."""
+    sampler = ResourceSampler(interval=0.05)
+    job = subprocess.Popen([sys.executable, "-c", CHILD_SCRIPT], stdout=subprocess.PIPE, text=True)
+    try:
+        assert job.stdout is not None
+        assert job.stdout.readline() == "ready\n"
+        usage = sampler.watch_process(job.pid)
+        deadline = time.monotonic() + 10
+        while (usage.peak_memory or 0) < 64 * 2**20:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        assert usage.cpu_time > 0
+    finally:
+        for child in psutil.Process(job.pid).children(recursive=True):
+            child.kill()
+        job.wait()
+    sampler.unwatch(usage)
+
+
+def test_sampler_single_thread() -> None:
+    """All jobs are measured by one thread, which stops once they are all done."""
+    sampler = ResourceSampler(interval=0.05)
+    jobs = [
+        subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"]) for _ in range(5)
+    ]
+    try:
+        usages = [sampler.watch_process(job.pid) for job in jobs]
+        samplers = [t for t in threading.enumerate() if t.name == "cwltool-resource-sampler"]
+        assert len(samplers) == 1
+        deadline = time.monotonic() + 10
+        while not all(len(usage.samples) > 2 for usage in usages):
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+    finally:
+        for job in jobs:
+            job.kill()
+            job.wait()
+    for usage in usages:
+        assert usage.peak_memory
+        sampler.unwatch(usage)
+    samplers[0].join(10)
+    assert not samplers[0].is_alive()
+
+
+def test_container_cgroup(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The cgroups of both Docker and Podman containers are found."""
+    monkeypatch.setattr(cwltool.resource_monitor, "CGROUP_ROOTS", (str(tmp_path),))
+    assert container_cgroup(CID) is None
+    docker = _write_cgroup(tmp_path / "system.slice" / f"docker-{CID}.scope", 0)
+    assert container_cgroup(CID) == str(docker)
+    podman = _write_cgroup(tmp_path / "machine.slice" / "libpod-fedcba9876543210.scope", 0)
+    assert container_cgroup("fedcba9876543210") == str(podman)
+
+
+def test_process_cgroup(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The cgroup of a process is looked up in /proc."""
+    with open("/proc/self/cgroup") as handle:
+        lines = handle.read().splitlines()
+    unified = [line[3:] for line in lines if line.startswith("0::")]
+    if not unified:
+        pytest.skip("no cgroup v2 on this host")
+    monkeypatch.setattr(cwltool.resource_monitor, "CGROUP_ROOTS", (str(tmp_path),))
+    assert process_cgroup(os.getpid()) is None
+    expected = _write_cgroup(Path(str(tmp_path) + unified[0].rstrip("/")), 0)
+    assert process_cgroup(os.getpid()) == str(expected)
+
+
+def test_wait_for_cidfile(tmp_path: Path) -> None:
+    """The container ID is read as soon as it is written, without waiting for the job."""
+    cidfile = tmp_path / "container.cid"
+    finished = subprocess.Popen(["true"], text=True)
+    assert wait_for_cidfile(str(cidfile), finished) is None
+
+    running = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"], text=True)
+    try:
+        threading.Timer(0.1, cidfile.write_text, [CID]).start()
+        assert wait_for_cidfile(str(cidfile), running) == CID
+        assert running.poll() is None
+    finally:
+        running.kill()
+        running.wait()
+
+
+def _docker_job(tmp_path: Path) -> DockerCommandLineJob:
+    builder = Builder(
+        {},
+        [],
+        [],
+        {},
+        schema.Names(),
+        [],
+        [],
+        {},
+        None,
+        None,
+        StdFsAccess,
+        StdFsAccess(""),
+        None,
+        0.1,
+        False,
+        False,
+        False,
+        "no_listing",
+        str(tmp_path / "out"),
+        str(tmp_path / "tmp"),
+        str(tmp_path / "stage"),
+        INTERNAL_VERSION,
+        "docker",
+    )
+    return DockerCommandLineJob(builder, {}, CommandLineTool.make_path_mapper, [], [], "job")
+
+
+def test_docker_monitor(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Container usage is sampled from its cgroup until the job ends."""
+    monkeypatch.setattr(cwltool.resource_monitor, "CGROUP_ROOTS", (str(tmp_path / "cgroup"),))
+    _write_cgroup(tmp_path / "cgroup" / "docker" / CID, 2**20, peak=5 * 2**20)
+    cidfile = tmp_path / "container.cid"
+    cidfile.write_text(CID)
+    job = _docker_job(tmp_path)
+    process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(0.3)"], text=True)
+
+    caplog.set_level(logging.INFO, logger="cwltool")
+    job.docker_monitor(str(cidfile), "", True, "docker", process, interval=0.05)
+
+    assert process.returncode == 0
+    assert job.resource_usage is not None
+    assert job.resource_usage.peak_memory == 5 * 2**20
+    assert job.resource_usage.cpu_time == 2.5
+    assert len(job.resource_usage.samples) > 1
+    assert "[job job] Max memory used: 5MiB" in caplog.text
+    assert not cidfile.exists()
+
+
+def test_docker_monitor_fast_job(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A job that ends before its container ID is known is not waited on."""
+    monkeypatch.setattr(cwltool.job, "container_pid", pytest.fail)
+    job = _docker_job(tmp_path)
+    process = subprocess.Popen(["true"], text=True)
+    job.docker_monitor(str(tmp_path / "missing.cid"), "", True, "docker", process)
+    assert process.returncode == 0
+    assert job.resource_usage is None
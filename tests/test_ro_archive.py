@@ -0,0 +1,71 @@
+"""Tests for archiving research objects as they are written."""
+
+import tarfile
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from cwltool.cwlprov.archive import archive_format, open_archive
+
+
+@pytest.fixture
+def folder(tmp_path: Path) -> Path:
+    """A folder of files to archive, with an empty folder."""
+    folder = tmp_path / "ro"
+    (folder / "data" / "2a").mkdir(parents=True)
+    (folder / "data" / "2a" / "2aae6c35").write_text("hello\n" * 100000)
+    (folder / "snapshot").mkdir()
+    (folder / "bagit.txt").write_text("BagIt-Version: 0.97\n")
+    return folder
+
+
+def test_archive_format() -> None:
+    assert archive_format("out/ro.zip") == "zip"
+    assert archive_format("ro.TAR.ZST") == "tar.zst"
+    assert archive_format("ro.tzst") == "tar.zst"
+    assert archive_format("ro.tar.gz") is None
+    assert archive_format("provenance") is None
+
+
+def test_zip(folder: Path, tmp_path: Path) -> None:
+    """Members added early and at the end unpack into one folder named after the archive."""
+    archive = open_archive(str(tmp_path / "run.zip"), str(folder), threads=4)
+    archive.add("data/2a/2aae6c35")
+    archive.close()
+    assert not list(tmp_path.glob("*.partial"))
+    with zipfile.ZipFile(tmp_path / "run.zip") as zipped:
+        assert zipped.testzip() is None
+        assert sorted(zipped.namelist()) == [
+            "run/bagit.txt",
+            "run/data/2a/2aae6c35",
+            "run/snapshot/",
+        ]
+        info = zipped.getinfo("run/data/2a/2aae6c35")
+        assert info.compress_type == zipfile.ZIP_DEFLATED
+        assert info.compress_size < info.file_size
+        zipped.extractall(tmp_path / "unzipped")
+    assert (tmp_path / "unzipped" / "run" / "data" / "2a" / "2aae6c35").read_text() == (
+        "hello\n" * 100000
+    )
+    assert (tmp_path / "unzipped" / "run" / "snapshot").is_dir()
+
+
+def test_tar_zst(folder: Path, tmp_path: Path) -> None:
+    zstandard = pytest.importorskip("zstandard")
+    archive = open_archive(str(tmp_path / "run.tar.zst"), str(folder), threads=2)
+    archive.add("data/2a/2aae6c35")
+    archive.close()
+    with open(tmp_path / "run.tar.zst", "rb") as compressed:
+        with zstandard.ZstdDecompressor().stream_reader(compressed) as stream:
+            with tarfile.open(fileobj=stream, mode="r|") as tar:
+                names = sorted(member.name for member in tar)
+    assert names == ["run/bagit.txt", "run/data/2a/2aae6c35", "run/snapshot"]
+
+
+def test_abort(folder: Path, tmp_path: Path) -> None:
+    """An archive of a research object discarded is removed."""
+    archive = open_archive(str(tmp_path / "run.zip"), str(folder))
+    archive.add("data/2a/2aae6c35")
+    archive.abort()
+    assert list(tmp_path.iterdir()) == [folder]
@@ -0,0 +1,98 @@
+"""Tests for the digest addressed cache of Singularity images."""
+
+import os
+import threading
+from pathlib import Path
+
+import pytest
+
+from cwltool.sif_cache import (
+    SifCache,
+    cache_size_limit,
+    parse_size,
+    resolve_image_digest,
+    split_digest,
+)
+
+DIGEST = "sha256:" + "ab" * 32
+OTHER_DIGEST = "sha256:" + "cd" * 32
+
+
+def test_parse_size(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Sizes may have binary unit suffixes."""
+    assert parse_size("100") == 100
+    assert parse_size("1.5K") == 1536
+    assert parse_size("2GiB") == 2 * 2**30
+    with pytest.raises(ValueError):
+        parse_size("lots")
+    monkeypatch.setenv("CWL_SINGULARITY_CACHE_MAX_SIZE", "10M")
+    assert cache_size_limit() == 10 * 2**20
+    monkeypatch.setenv("CWL_SINGULARITY_CACHE_MAX_SIZE", "lots")
+    assert cache_size_limit() is None
+
+
+def test_split_digest() -> None:
+    """Tags are dropped, and pinned digests returned."""
+    assert split_digest("debian:stable-slim") == ("debian", None)
+    assert split_digest("localhost:5000/tools/bwa") == ("localhost:5000/tools/bwa", None)
+    assert split_digest(f"quay.io/biocontainers/bwa:0.7@{DIGEST}") == (
+        "quay.io/biocontainers/bwa",
+        DIGEST,
+    )
+
+
+def test_resolve_pinned_digest(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Pinned digests are used without asking a registry."""
+    monkeypatch.setenv("PATH", "")
+    assert resolve_image_digest(f"docker://debian@{DIGEST}") == DIGEST
+    assert resolve_image_digest("debian:stable-slim") is None
+
+
+def test_image_built_once(tmp_path: Path) -> None:
+    """Concurrent requests for an image build it once, and never expose a partial image."""
+    cache = SifCache(str(tmp_path))
+    builds: list[str] = []
+
+    def pull(path: str) -> None:
+        builds.append(path)
+        assert not os.path.exists(cache._path("sif", DIGEST))
+        Path(path).write_text("image")
+
+    paths: list[str] = []
+    threads = [
+        threading.Thread(target=lambda: paths.append(cache.image(DIGEST, pull))) for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+    assert paths == [str(tmp_path / "sif" / ("sha256-" + "ab" * 32 + ".sif"))] * 4
+    assert os.listdir(tmp_path / "sif") == [os.path.basename(paths[0])]
+
+
+def test_failed_build(tmp_path: Path) -> None:
+    """A failed build leaves nothing behind."""
+    cache = SifCache(str(tmp_path))
+
+    def pull(path: str) -> None:
+        Path(path).write_text("partial")
+        raise OSError("network down")
+
+    with pytest.raises(OSError):
+        cache.image(DIGEST, pull)
+    assert os.listdir(tmp_path / "sif") == []
+
+
+def test_eviction(tmp_path: Path) -> None:
+    """The least recently used images are removed, but never the one just added."""
+    cache = SifCache(str(tmp_path), max_size=150)
+    first = cache.image(DIGEST, lambda path: Path(path).write_bytes(b"x" * 100))
+    os.utime(first, (0, 0))
+    second = cache.image(OTHER_DIGEST, lambda path: Path(path).write_bytes(b"y" * 100))
+    assert not os.path.exists(first)
+    assert os.path.exists(second)
+
+    cache.max_size = 50
+    cache.evict(keep=second)
+    assert os.path.exists(second)
@@ -1,5 +1,9 @@
 """Test singularity{,-ce} & apptainer versions."""
 
+import os
+import shutil
+from pathlib import Path
+
 import pytest
 from packaging.version import Version
 
@@ -18,6 +22,7 @@ def reset_singularity_version_cache(monkeypatch: pytest.MonkeyPatch) -> None:
     """Reset the cache for testing."""
     monkeypatch.setattr(cwltool.singularity, "_SINGULARITY_VERSION", None)
     monkeypatch.setattr(cwltool.singularity, "_SINGULARITY_FLAVOR", "")
+    monkeypatch.setenv("CWLTOOL_IMAGE_CACHE_TTL", "0")
 
 
 def dummy_check_output(monkeypatch: pytest.MonkeyPatch, name: str, version: str) -> None:
@@ -134,3 +139,29 @@ def test_version_checks(monkeypatch: pytest.MonkeyPatch) -> None:
         assert is_version_3_or_newer()
         assert is_version_3_1_or_newer()
         assert is_version_3_4_or_newer()
+
+
+def test_get_version_registry(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """The version of an unchanged singularity executable is remembered across runs."""
+    executable = tmp_path / "singularity"
+    executable.write_text("#!/bin/sh\n")
+    executable.chmod(0o755)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setattr(shutil, "which", lambda cmd: str(executable))
+    dummy_check_output(monkeypatch, "apptainer", "1.1.3")
+    reset_singularity_version_cache(monkeypatch)
+    monkeypatch.delenv("CWLTOOL_IMAGE_CACHE_TTL")
+    assert get_version() == (Version("1.1.3"), "apptainer")
+
+    # another cwltool run
+    reset_singularity_version_cache(monkeypatch)
+    monkeypatch.delenv("CWLTOOL_IMAGE_CACHE_TTL")
+    dummy_check_output(monkeypatch, "singularity", "2.6")
+    assert get_version() == (Version("1.1.3"), "apptainer")
+
+    # an updated singularity
+    stat = executable.stat()
+    os.utime(executable, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    reset_singularity_version_cache(monkeypatch)
+    monkeypatch.delenv("CWLTOOL_IMAGE_CACHE_TTL")
+    assert get_version() == (Version("2.6"), "singularity")
@@ -0,0 +1,111 @@
+"""Tests for the timing of the phases of a run."""
+
+import json
+import logging
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from cwltool import timing
+from cwltool.main import main
+
+from .util import get_data
+
+
+@pytest.fixture
+def timings() -> Iterator[timing.Timings]:
+    """Time spans, and trace them, for the duration of the test."""
+    yield timing.enable(trace=True)
+    timing.disable()
+
+
+def test_disabled() -> None:
+    """Nothing is timed unless timing is enabled."""
+    assert timing.disable() is None
+    with timing.span("load_tool"):
+        pass
+    assert timing.enable().summary() == []
+    timing.disable()
+
+
+def test_nested_spans(timings: timing.Timings) -> None:
+    """Nested spans belong to the step of the outer span, and recursion is timed once."""
+    with timing.span("collect_output_ports", "sort"):
+        with timing.span("do_eval"):
+            with timing.span("do_eval"):
+                pass
+        with timing.span("do_eval", "other"):
+            pass
+    with timing.span("do_eval"):
+        pass
+    phases = [(phase.step, phase.name, phase.count) for phase in timings.summary()]
+    assert phases == [
+        ("sort", "collect_output_ports", 1),
+        ("sort", "do_eval", 1),
+        ("other", "do_eval", 1),
+        (None, "do_eval", 1),
+    ]
+    assert timings.events is not None and len(timings.events) == 4
+
+
+def test_threads(timings: timing.Timings) -> None:
+    """Spans on other threads are timed on their own."""
+
+    def job() -> None:
+        with timing.span("_job_popen"):
+            pass
+
+    with timing.span("_job_popen", "main"):
+        thread = threading.Thread(target=job, name="job")
+        thread.start()
+        thread.join()
+    assert [(phase.step, phase.count) for phase in timings.summary()] == [("main", 1), (None, 1)]
+    assert sorted(timings.threads.values()) == ["MainThread", "job"]
+
+
+def test_format_timing_report() -> None:
+    phase = timing.PhaseTiming("step1", "_job_popen")
+    phase.count, phase.total, phase.longest = 2, 3_000_000_000, 2_000_000_000
+    load = timing.PhaseTiming(None, "load_tool")
+    load.count, load.total, load.longest = 1, 250_000_000, 250_000_000
+    assert timing.format_timing_report([load, phase]).splitlines() == [
+        "step        phase       calls  total s  mean ms   max ms",
+        "(workflow)  load_tool       1    0.250   250.00   250.00",
+        "step1       _job_popen      2    3.000  1500.00  2000.00",
+    ]
+
+
+def test_trace_file(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    """Each phase of each step is summarized, and traced."""
+    trace_file = tmp_path / "trace.json"
+    caplog.set_level(logging.INFO, logger="cwltool")
+    args = [
+        "--outdir",
+        str(tmp_path / "out"),
+        "--timing",
+        "--trace-file",
+        str(trace_file),
+        get_data("tests/wf/scatter-wf4.cwl"),
+        get_data("tests/wf/scatter-job2.json"),
+    ]
+    assert main(args) == 0
+    assert timing.disable() is None
+
+    assert "Time spent per step and phase" in caplog.text
+    trace = json.loads(trace_file.read_text())
+    spans = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    phases = {(event["args"]["step"], event["name"]) for event in spans}
+    assert {
+        ("(workflow)", "load_tool"),
+        ("main", "_init_job"),
+        ("step1", "_init_job"),
+        ("step1", "do_eval"),
+        ("step1", "stage_files"),
+        ("step1", "_job_popen"),
+        ("step1", "collect_output_ports"),
+        ("(workflow)", "relocateOutputs"),
+    } <= phases
+    assert len([event for event in spans if event["name"] == "_job_popen"]) == 2
+    assert all(event["dur"] >= 0 and event["ts"] >= 0 for event in spans)
@@ -32,9 +32,10 @@ from .util import get_data, get_main_output, needs_docker, needs_singularity
 
 
 @pytest.fixture(autouse=True)
-def clear_singularity_image_cache() -> None:
+def clear_singularity_image_cache(monkeypatch: pytest.MonkeyPatch) -> None:
     with _IMAGES_LOCK:
         _IMAGES.clear()
+    monkeypatch.setenv("CWLTOOL_IMAGE_CACHE_TTL", "0")
 
 
 def test_docker_commandLineTool_job_tmpdir_prefix(tmp_path: Path) -> None:
@@ -0,0 +1,153 @@
+"""Tests for the OpenTelemetry spans of a run."""
+
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+import cwltool.tracing
+from cwltool.main import main
+from cwltool.tracing import OTLPFileExporter, Tracer
+
+from .util import get_data
+
+
+def load_spans(path: Path) -> list[dict[str, Any]]:
+    """Read the spans of an OTLP JSON lines file, with their attributes decoded."""
+    spans = []
+    for line in path.read_text().splitlines():
+        for resource_spans in json.loads(line)["resourceSpans"]:
+            for scope_spans in resource_spans["scopeSpans"]:
+                for span in scope_spans["spans"]:
+                    span["attributes"] = {
+                        attribute["key"]: next(iter(attribute["value"].values()))
+                        for attribute in span["attributes"]
+                    }
+                    spans.append(span)
+    return spans
+
+
+def test_batches(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Spans are exported once ended, in batches, and the rest at shutdown."""
+    monkeypatch.setattr(cwltool.tracing, "BATCH_SIZE", 2)
+    path = tmp_path / "spans.jsonl"
+    tracer = Tracer(OTLPFileExporter(str(path)))
+    parent = tracer.start_span("run", None, {"cwl.process.class": "Workflow"})
+    for index in range(3):
+        child = tracer.start_span("job", parent, {"cwl.scatter.index": index})
+        child.set_attribute("cwl.peak_memory", None)
+        child.end("permanentFail" if index == 2 else "success")
+    child.end("success")
+    assert len(path.read_text().splitlines()) == 1
+    parent.end()
+    tracer.shutdown()
+
+    assert len(path.read_text().splitlines()) == 2
+    spans = load_spans(path)
+    assert [span["name"] for span in spans] == ["job", "job", "job", "run"]
+    assert all(span["parentSpanId"] == parent.span_id for span in spans[:3])
+    assert "parentSpanId" not in spans[3]
+    assert {span["traceId"] for span in spans} == {tracer.trace_id}
+    assert spans[1]["attributes"] == {"cwl.scatter.index": "1", "cwl.status": "success"}
+    assert spans[2]["status"] == {"code": 2, "message": "permanentFail"}
+    assert spans[3]["status"] == {"code": 1}
+    assert int(spans[3]["startTimeUnixNano"]) <= int(spans[0]["startTimeUnixNano"])
+
+
+@pytest.mark.parametrize(
+    "traceparent,continued",
+    [
+        ("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01", True),
+        ("00-0af7651916cd43dd8448eb211c80319c-b7ad6b71692033-01", False),
+        (None, False),
+    ],
+)
+def test_traceparent(tmp_path: Path, traceparent: str | None, continued: bool) -> None:
+    """A valid W3C trace context is continued."""
+    tracer = Tracer(OTLPFileExporter(str(tmp_path / "spans.jsonl")), traceparent)
+    span = tracer.start_span("run", None)
+    tracer.shutdown()
+    if continued:
+        assert span.trace_id == "0af7651916cd43dd8448eb211c80319c"
+        assert span.parent_id == "b7ad6b7169203331"
+    else:
+        assert len(span.trace_id) == 32
+        assert span.parent_id is None
+
+
+def test_otlp_trace_file(tmp_path: Path) -> None:
+    """The run, its step, each scatter element and each job are nested spans."""
+    spans_file = tmp_path / "spans.jsonl"
+    args = [
+        "--outdir",
+        str(tmp_path / "out"),
+        "--otlp-trace-file",
+        str(spans_file),
+        get_data("tests/wf/scatter-wf4.cwl"),
+        get_data("tests/wf/scatter-job2.json"),
+    ]
+    assert main(args) == 0
+
+    spans = load_spans(spans_file)
+    by_name: dict[str, list[dict[str, Any]]] = {}
+    for span in spans:
+        by_name.setdefault(span["name"], []).append(span)
+    assert sorted(by_name) == ["job", "run", "scatter element", "step"]
+    (run,) = by_name["run"]
+    (step,) = by_name["step"]
+    assert run["attributes"]["cwl.process.class"] == "Workflow"
+    assert step["parentSpanId"] == run["spanId"]
+    assert step["attributes"]["cwl.step.id"].endswith("#main/step1")
+    elements = by_name["scatter element"]
+    assert sorted(element["attributes"]["cwl.scatter.index"] for element in elements) == [
+        "0",
+        "1",
+    ]
+    assert all(element["parentSpanId"] == step["spanId"] for element in elements)
+    assert sorted(job["parentSpanId"] for job in by_name["job"]) == sorted(
+        element["spanId"] for element in elements
+    )
+    for job in by_name["job"]:
+        assert job["attributes"]["process.exit_code"] == "0"
+        assert job["attributes"]["cwl.tool.id"].endswith("#echo")
+        assert "cwl.resources.cores" in job["attributes"]
+        assert "cwl.staged_bytes" in job["attributes"]
+    assert all(span["status"] == {"code": 1} for span in spans)
+
+
+def test_cache_hit(tmp_path: Path) -> None:
+    """Jobs with their outputs cached are marked as cache hits."""
+    spans_file = tmp_path / "spans.jsonl"
+    args = [
+        "--cachedir",
+        str(tmp_path / "cache"),
+        "--outdir",
+        str(tmp_path / "out"),
+        "--otlp-trace-file",
+        str(spans_file),
+        get_data("tests/echo.cwl"),
+        "--inp",
+        "hello",
+    ]
+    assert main(args) == 0
+    assert main(args) == 0
+    jobs = [span for span in load_spans(spans_file) if span["name"] == "job"]
+    assert [job["attributes"]["cwl.cache_hit"] for job in jobs] == [False, True]
+
+
+def test_job_setup_failure(tmp_path: Path) -> None:
+    """A job failing before it runs, here without any GPU, still ends its span."""
+    spans_file = tmp_path / "spans.jsonl"
+    args = [
+        "--enable-ext",
+        "--no-container",
+        "--outdir",
+        str(tmp_path / "out"),
+        "--otlp-trace-file",
+        str(spans_file),
+        get_data("tests/wf/nvidia-smi.cwl"),
+    ]
+    assert main(args) != 0
+    (job,) = [span for span in load_spans(spans_file) if span["name"] == "job"]
+    assert job["status"] == {"code": 2, "message": "permanentFail"}
@@ -0,0 +1,174 @@
+"""Tests for staging many inputs into a container with few bind mounts."""
+
+import os
+from pathlib import Path
+
+import pytest
+from schema_salad.avro import schema
+
+from cwltool import volume_plan
+from cwltool.builder import Builder
+from cwltool.command_line_tool import CommandLineTool
+from cwltool.context import RuntimeContext
+from cwltool.docker import DockerCommandLineJob
+from cwltool.pathmapper import MapperEnt, PathMapper
+from cwltool.stdfsaccess import StdFsAccess
+from cwltool.update import INTERNAL_VERSION
+from cwltool.volume_plan import MOUNT_BATCH_THRESHOLD, plan_volumes
+
+STAGEDIR = "/var/lib/cwl"
+
+
+def staged(resolved: Path | str, target: str, type: str = "File") -> MapperEnt:
+    return MapperEnt(str(resolved), f"{STAGEDIR}/{target}", type, True)
+
+
+def test_below_threshold(tmp_path: Path) -> None:
+    """Jobs with few inputs are mounted one by one, as before."""
+    entries = [staged(tmp_path / f"{i}.txt", f"stg{i}/{i}.txt") for i in range(3)]
+    assert plan_volumes(entries, STAGEDIR, threshold=3) is None
+    assert plan_volumes(entries, STAGEDIR, threshold=2) is not None
+
+
+def test_link_tree(tmp_path: Path) -> None:
+    """Input files are linked, not their directory, into a tree mounted over the staging directory."""
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "ref").mkdir()
+    (data / "private.txt").write_text("secret")
+    for i in range(5):
+        (data / f"{i}.txt").write_text(str(i))
+    entries = [staged(data / f"{i}.txt", f"stg{i}/{i}.txt") for i in range(5)]
+    entries.append(staged(data / "ref", "stgref/ref", "Directory"))
+    entries.append(staged("_:abc", "stgw/new.txt", "CreateFile"))
+    entries.append(MapperEnt(str(data / "0.txt"), "/elsewhere/0.txt", "File", True))
+    plan = plan_volumes(entries, STAGEDIR, threshold=1)
+    assert plan is not None
+    assert plan.directories == []
+    assert plan.mounts == 1
+    assert plan.targets == {entry.target for entry in entries[:5]}
+
+    tree = plan.create_link_tree(
+        str(tmp_path / "tree"), [entry for entry in entries if entry.target not in plan.targets]
+    )
+    assert tree is not None
+    linked = os.path.join(tree, "stg3", "3.txt")
+    assert not os.path.islink(linked)
+    assert Path(linked).read_text() == "3"
+    assert os.path.isdir(os.path.join(tree, "stgref", "ref"))
+    assert os.listdir(os.path.join(tree, "stgref", "ref")) == []
+    assert os.path.isfile(os.path.join(tree, "stgw", "new.txt"))
+    assert not os.path.exists(os.path.join(tree, "elsewhere"))
+    assert sorted(os.listdir(tree)) == sorted(
+        ["stg0", "stg1", "stg2", "stg3", "stg4", "stgref", "stgw"]
+    )
+
+
+def test_unlinkable_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """An input file that cannot be linked is left to be mounted on its own."""
+    for i in range(3):
+        (tmp_path / f"{i}.txt").write_text(str(i))
+    entries = [staged(tmp_path / f"{i}.txt", f"stg{i}/{i}.txt") for i in range(3)]
+    monkeypatch.setattr(
+        volume_plan, "link_file", lambda source, destination: not source.endswith("1.txt")
+    )
+    plan = plan_volumes(entries, STAGEDIR, threshold=0)
+    assert plan is not None
+    tree = plan.create_link_tree(str(tmp_path / "tree"), [])
+    assert tree is not None
+    assert plan.targets == {f"{STAGEDIR}/stg0/0.txt", f"{STAGEDIR}/stg2/2.txt"}
+    mountpoint = os.path.join(tree, "stg1", "1.txt")
+    assert os.path.isfile(mountpoint) and os.path.getsize(mountpoint) == 0
+
+
+def test_collapse_directories(tmp_path: Path) -> None:
+    """A directory is mounted as a whole if it holds exactly the inputs staged together."""
+    complete = tmp_path / "complete"
+    partial = tmp_path / "partial"
+    for directory in (complete, partial):
+        directory.mkdir()
+        for name in ("reads.bam", "reads.bam.bai"):
+            (directory / name).touch()
+    (partial / "other.txt").touch()
+    entries = [
+        staged(complete / "reads.bam", "stg1/reads.bam"),
+        staged(complete / "reads.bam.bai", "stg1/reads.bam.bai"),
+        staged(partial / "reads.bam", "stg2/reads.bam"),
+        staged(partial / "reads.bam.bai", "stg2/reads.bam.bai"),
+    ]
+    plan = plan_volumes(entries, STAGEDIR, threshold=0)
+    assert plan is not None
+    assert plan.directories == [(str(complete), f"{STAGEDIR}/stg1")]
+    assert sorted(plan.links) == [f"{STAGEDIR}/stg2/reads.bam", f"{STAGEDIR}/stg2/reads.bam.bai"]
+    assert plan.mounts == 2
+
+    tree = plan.create_link_tree(str(tmp_path / "tree"), [])
+    assert tree is not None
+    assert sorted(os.listdir(os.path.join(tree, "stg2"))) == ["reads.bam", "reads.bam.bai"]
+
+    entries.append(staged("_:xyz", "stg1/extra.txt", "CreateFile"))
+    plan = plan_volumes(entries, STAGEDIR, threshold=0)
+    assert plan is not None
+    assert plan.directories == []
+    assert len(plan.links) == 4
+
+
+def test_add_volumes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Many inputs of a container job are mounted as one tree, plus the files not linked."""
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "private.txt").write_text("secret")
+    count = MOUNT_BATCH_THRESHOLD + 10
+    for i in range(count):
+        (data / f"{i}.txt").write_text(str(i))
+    unlinkable = str(data / "7.txt")
+    monkeypatch.setattr(volume_plan, "link_file", lambda source, destination: source != unlinkable)
+
+    (tmp_path / "tmp").mkdir()
+    runtime_context = RuntimeContext({"tmpdir_prefix": str(tmp_path / "tmp" / "cwl")})
+    builder = Builder(
+        {},
+        [],
+        [],
+        {},
+        schema.Names(),
+        [],
+        [],
+        {},
+        None,
+        None,
+        StdFsAccess,
+        StdFsAccess(""),
+        None,
+        0.1,
+        False,
+        False,
+        False,
+        "no_listing",
+        runtime_context.get_outdir(),
+        runtime_context.get_tmpdir(),
+        STAGEDIR,
+        INTERNAL_VERSION,
+        "docker",
+    )
+    job = DockerCommandLineJob(builder, {}, CommandLineTool.make_path_mapper, [], [], "")
+    pathmapper = PathMapper([], str(tmp_path), STAGEDIR)
+    for i in range(count):
+        pathmapper.update(
+            f"file://{data}/{i}.txt",
+            str(data / f"{i}.txt"),
+            f"{STAGEDIR}/stg{i}/{i}.txt",
+            "File",
+            True,
+        )
+    runtime: list[str] = []
+    job.add_volumes(pathmapper, runtime, str(tmp_path / "tmp" / "cwl"), any_path_okay=True)
+
+    assert len(runtime) == 2
+    tree_mount, file_mount = runtime
+    assert tree_mount.startswith(f"--mount=type=bind,source={tmp_path}/tmp/cwl")
+    assert tree_mount.endswith(f",target={STAGEDIR},readonly")
+    assert file_mount == (
+        f"--mount=type=bind,source={unlinkable},target={STAGEDIR}/stg7/7.txt,readonly"
+    )
+    assert not any(f"source={data}," in arg for arg in runtime)